@@ -30,15 +30,17 @@ from .file import (File, Directory, Location, JSONFile, MakeDir, Copy,
                    FileTransaction, Touch)
 from .bundle import (Bundle, SortedBundle, ViewBundle, AndBundle,
                      BaseBundle, BundleDelegator, FunctionDelegator, LogicBundle,
-                     OrBundle, StoredBundle)
+                     OrBundle, StoredBundle, QueryBundle)
 #from .resource import LocalResource
 from .configuration import Configuration
 from .task import Task, PythonTask, DummyTask
+from .catalog import TrajectoryCatalog, TrajectoryEntry, CatalogBundle
 from .project import Project
+from .aio import AsyncProject
 from .scheduler import Scheduler
 from .model import Model
 from .generator import TaskGenerator
-from .worker import WorkerScheduler, Worker
+from .worker import WorkerScheduler, WorkerSlot, Worker
 from .logentry import LogEntry
 from .reducer import (ActionParser, BashParser, ChainedParser,
                       DictFilterParser, PrefixParser, StageParser, StrFilterParser,
@@ -0,0 +1,200 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+from __future__ import absolute_import
+
+import logging
+
+from .mongodb.aio import AsyncStorage, asyncio
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncProject(object):
+    """
+    Control a `Project` from an asyncio event loop
+
+    All DB operations of the project run on the thread of an
+    `AsyncStorage` and return futures. Instead of the `EventTriggerTimer`
+    thread, `run` schedules `Project.trigger` on the loop and `wait_until`
+    polls conditions without blocking it, so many conditions, workers and
+    task states can be watched at the same time.
+
+    Attributes
+    ----------
+    project : `Project`
+        the project to be controlled. It needs to be initialized
+    storage : `mongodb.aio.AsyncStorage`
+        the async access to the project storage. The stores are also
+        available as attributes, e.g. `AsyncProject.tasks`
+    interval : float
+        the default number of seconds between checks of a condition
+
+    Examples
+    --------
+    >>> async def main(project):  # doctest: +SKIP
+    ...     aproject = AsyncProject(project)
+    ...     await aproject.queue(engine.run(trajectory))
+    ...     await aproject.wait_until(trajectory.exists)
+    """
+
+    def __init__(self, project, loop=None, interval=5.0):
+        self.project = project
+        self.storage = AsyncStorage(project.storage, loop)
+        self.interval = interval
+        self._trigger_handle = None
+
+    @property
+    def loop(self):
+        return self.storage.loop
+
+    def __getattr__(self, item):
+        storage = self.__dict__.get('storage')
+        if storage is not None and item in storage.storage._stores:
+            return storage.store(item)
+
+        raise AttributeError(item)
+
+    def queue(self, *tasks, **kwargs):
+        """
+        Submit tasks to the project queue
+
+        Returns
+        -------
+        `asyncio.Future`
+        """
+        return self.storage.run(self.project.queue, *tasks, **kwargs)
+
+    def trigger(self):
+        """
+        Run a single :meth:`Project.trigger`
+
+        Returns
+        -------
+        `asyncio.Future`
+        """
+        return self.storage.run(self.project.trigger)
+
+    def wait_until(self, condition, interval=None):
+        """
+        Wait until a condition evaluates to true without blocking the loop
+
+        The condition is evaluated on the storage thread, since conditions
+        usually read sync variables from the DB.
+
+        Parameters
+        ----------
+        condition : callable
+            function that is called in regular intervals
+        interval : float or None
+            seconds between two checks. If None `AsyncProject.interval`
+            is used
+
+        Returns
+        -------
+        `asyncio.Future`
+            a future that is done once the condition is true
+        """
+        if interval is None:
+            interval = self.interval
+
+        loop = self.loop
+        result = loop.create_future()
+
+        def checked(check):
+            if result.done():
+                # cancelled while checking
+                return
+
+            if check.exception() is not None:
+                result.set_exception(check.exception())
+            elif check.result():
+                result.set_result(True)
+            else:
+                loop.call_later(interval, schedule)
+
+        def schedule():
+            if not result.done():
+                self.storage.run(
+                    lambda: bool(condition())).add_done_callback(checked)
+
+        schedule()
+
+        return result
+
+    def wait_for(self, conditions, interval=None):
+        """
+        Wait until all conditions are true
+
+        All conditions are waited for at the same time
+
+        Returns
+        -------
+        `asyncio.Future`
+        """
+        return asyncio.gather(*[
+            self.wait_until(c, interval) for c in conditions])
+
+    def run(self, interval=None):
+        """
+        Call :meth:`Project.trigger` in regular intervals from the loop
+
+        Parameters
+        ----------
+        interval : float or None
+            seconds between two triggers. If None `AsyncProject.interval`
+            is used
+        """
+        if interval is None:
+            interval = self.interval
+
+        if self._trigger_handle is not None:
+            return
+
+        def triggered(f):
+            if f.exception() is not None:
+                logger.error('Trigger failed: %s' % f.exception())
+
+            if self._trigger_handle is not None:
+                self._trigger_handle = self.loop.call_later(interval, trigger)
+
+        def trigger():
+            self.trigger().add_done_callback(triggered)
+
+        self._trigger_handle = self.loop.call_soon(trigger)
+
+    def stop(self):
+        """
+        Stop calling :meth:`Project.trigger`
+
+        """
+        if self._trigger_handle is not None:
+            self._trigger_handle.cancel()
+            self._trigger_handle = None
+
+    def close(self):
+        """
+        Stop triggering and shut down the storage thread
+
+        The project stays open
+        """
+        self.stop()
+        self.storage.close()
@@ -94,7 +94,13 @@ from __future__ import print_function, absolute_import
 
 import six
 import fnmatch
+import itertools
+import operator
 import random
+import re
+
+from .mongodb import StorableMixin
+from .mongodb.syncvar import sync_variables
 
 import logging
 logger = logging.getLogger(__name__)
@@ -160,7 +166,7 @@ class BaseBundle(object):
         '''
         if match:
             # This doesn't have to be string, but must match
-            hits = self.m(name_attr, value)
+            hits = self.m(name_attr, pattern)
         else:
             hits = filter(lambda x: getattr(x, name_attr).find(pattern) >= 0, filter(lambda x: isinstance(getattr(x,name_attr), str), self))
 
@@ -218,19 +224,58 @@ class BaseBundle(object):
         """
         return ViewBundle(self, lambda x: fnmatch.fnmatch(x.location, pattern))
 
-    def sorted(self, key):
+    def sorted(self, key, reverse=False):
         """
         Return a view bundle where all entries are sorted by a given key attribute
         Parameters
         ----------
-        key : function
-            a function to compute the key to be sorted by
+        key : function or str
+            a function to compute the key to be sorted by or the name of
+            the attribute to be sorted by
+        reverse : bool
+            if True the entries are sorted in descending order
         Returns
         -------
         `ViewBundle`
             the read-only bundle showing sorted entries
         """
-        return SortedBundle(self, key)
+        if isinstance(key, six.string_types):
+            key = operator.attrgetter(key)
+
+        return SortedBundle(self, key, reverse)
+
+    def top(self, k):
+        """
+        Return the first entries of the bundle
+
+        Parameters
+        ----------
+        k : int
+            the maximal number of entries
+
+        Returns
+        -------
+        list of object
+            the first `k` entries in the order of the bundle
+        """
+        return list(itertools.islice(self, k))
+
+    def sample(self, n):
+        """
+        Return distinct random entries
+
+        Parameters
+        ----------
+        n : int
+            the maximal number of entries
+
+        Returns
+        -------
+        list of object
+            at most `n` random entries of the bundle
+        """
+        objs = list(self)
+        return random.sample(objs, min(n, len(objs)))
 
     def v(self, fnc):
         """
@@ -401,12 +446,13 @@ class SortedBundle(BaseBundle):
     """
     Sorted view of a bundle
     """
-    def __init__(self, bundle, key):
+    def __init__(self, bundle, key, reverse=False):
         self.bundle = bundle
         self.key = key
+        self.reverse = reverse
 
     def __iter__(self):
-        return iter(sorted(self.bundle, key=self.key))
+        return iter(sorted(self.bundle, key=self.key, reverse=self.reverse))
 
     @property
     def first(self):
@@ -414,7 +460,16 @@ class SortedBundle(BaseBundle):
         object
             Return the first of the sorted elements
         """
-        return next(iter(self))
+        return next(iter(self), None)
+
+    @property
+    def last(self):
+        """
+        object
+            Return the last of the sorted elements
+        """
+        return next(iter(
+            sorted(self.bundle, key=self.key, reverse=not self.reverse)), None)
 
 
 class BundleDelegator(object):
@@ -554,4 +609,356 @@ class StoredBundle(Bundle):
         """
 
         if self._set is not None:
-            return [x for x in self._set if getattr(x, key) == value]
+            return list(self.m(key, value))
+
+    def c(self, cls):
+        """
+        Return a view bundle on all entries that are instances of a class
+
+        The class is matched in the DB, so only matching entries are loaded
+
+        Parameters
+        ----------
+        cls : `type`
+            a class to be filtered by
+
+        Returns
+        -------
+        `QueryBundle`
+            the read-only bundle showing filtered entries
+        """
+        return QueryBundle(self).c(cls)
+
+    def m(self, name_attr, value):
+        """
+        Return a view bundle on all entries with an attribute equal to value
+
+        Parameters
+        ----------
+        name_attr : `str`
+            An attribute name of the Bundle content class.
+        value : `object`
+            The value to match.
+
+        Returns
+        -------
+        `QueryBundle`
+            the read-only bundle showing filtered entries
+        """
+        return QueryBundle(self).m(name_attr, value)
+
+    def a(self, name_attr, pattern, match=False):
+        """
+        Return a view bundle on all entries with a string attribute
+        containing pattern
+
+        Parameters
+        ----------
+        name_attr : `str`
+            An attribute name of the Bundle content class.
+            The attribute value must be of type `str`.
+        pattern : `str`
+            The string pattern for matching.
+        match : `bool`
+            Only return Bundle elements who match pattern exactly
+
+        Returns
+        -------
+        `QueryBundle`
+            the read-only bundle showing filtered entries
+        """
+        return QueryBundle(self).a(name_attr, pattern, match)
+
+    def sorted(self, key, reverse=False):
+        """
+        Return a view bundle where all entries are sorted by a given key
+
+        Attribute names are sorted by the DB where possible
+
+        Parameters
+        ----------
+        key : function or str
+            a function to compute the key to be sorted by or the name of
+            the attribute to be sorted by
+        reverse : bool
+            if True the entries are sorted in descending order
+
+        Returns
+        -------
+        `QueryBundle` or `SortedBundle`
+            the read-only bundle showing sorted entries
+        """
+        return QueryBundle(self).sorted(key, reverse)
+
+    def top(self, k):
+        """
+        Return the first entries of the bundle, requested in a single query
+
+        Parameters
+        ----------
+        k : int
+            the maximal number of entries
+
+        Returns
+        -------
+        list of `StorableMixin`
+            the first `k` entries
+        """
+        if self._set is not None:
+            return QueryBundle(self).top(k)
+
+        return []
+
+    def sample(self, n):
+        """
+        Return distinct random entries picked by the DB
+
+        Parameters
+        ----------
+        n : int
+            the maximal number of entries
+
+        Returns
+        -------
+        list of `StorableMixin`
+            at most `n` random entries
+        """
+        if self._set is not None:
+            return QueryBundle(self).sample(n)
+
+        return []
+
+
+# the order of `first` and `last` if a bundle is not sorted
+_time_order = [('_time', 1), ('_saved', 1)]
+
+
+def _first_by_time(objs, reverse=False):
+    objs = sorted(objs, key=lambda x: x.__time__, reverse=reverse)
+    return objs[0] if objs else None
+
+
+# values that are stored unchanged in documents and can be queried
+_query_types = six.string_types + six.integer_types + (float, bool)
+
+_missing = object()
+
+
+def _field_condition(name_attr, cond):
+    # attributes are either stored in `_dict` or, like sync variables, names
+    # and `_find_by` fields, at the top level of a document. Documents with
+    # neither field also match and are tested in python
+    return {'$or': [
+        {name_attr: cond},
+        {'_dict.' + name_attr: cond},
+        {name_attr: {'$exists': False},
+         '_dict.' + name_attr: {'$exists': False}}]}
+
+
+class QueryBundle(BaseBundle):
+    """
+    A view on a `StoredBundle` where filters are evaluated by the DB
+
+    Each filter has a DB query condition and a python test. If the store
+    supports queries, the conditions are combined and only the ids of
+    matching documents are requested. Only these are loaded and, where the
+    condition is not exact, tested in python. Otherwise all entries of the
+    bundle are tested in python. Filters with functions like `v` are never
+    sent to the DB and return a `ViewBundle` on this bundle.
+
+    Sorting by an attribute, `first`, `last`, `top` and `sample` are done
+    by the DB as well, if the attribute is stored in the same field for all
+    classes that can be in the bundle. Attributes in `_dict` are only known
+    to be stored if they are listed in `_sort_by` of the class.
+
+    Parameters
+    ----------
+    bundle : `StoredBundle`
+        the stored bundle to be filtered
+    filters : list of tuple(dict or None, callable, bool)
+        the query condition, the python test and if the condition is exact
+    classes : list of tuple of `type`
+        the class filters, entries are instances of all of them
+    sort : list of tuple(str, int) or None
+        the fields and directions to sort the documents by
+    """
+
+    def __init__(self, bundle, filters=None, classes=None, sort=None):
+        super(QueryBundle, self).__init__()
+        self.bundle = bundle
+        self.filters = filters or []
+        self.classes = classes or []
+        self.sort = sort
+
+    def _filtered(self, condition, test, exact=False, classes=None):
+        return QueryBundle(
+            self.bundle, self.filters + [(condition, test, exact)],
+            self.classes + (classes or []), self.sort)
+
+    @property
+    def _exact(self):
+        return all(c is not None and exact for c, _, exact in self.filters)
+
+    @property
+    def _store(self):
+        store = self.bundle._set
+        if store is not None and getattr(store, 'queryable', False):
+            return store
+
+        return None
+
+    @property
+    def query(self):
+        """
+        dict : the DB query of all filters
+        """
+        conditions = [c for c, _, _ in self.filters if c is not None]
+        if not conditions:
+            return {}
+        elif len(conditions) == 1:
+            return conditions[0]
+        else:
+            return {'$and': conditions}
+
+    def _iter(self, sort=None, limit=0):
+        store = self._store
+        if store is None:
+            tests = [test for _, test, _ in self.filters]
+            objs = self.bundle
+        else:
+            tests = [
+                test for c, test, exact in self.filters
+                if c is None or not exact]
+            # the limit can only be applied by the DB if it finds exactly
+            # the entries of the bundle
+            objs = store.find(
+                self.query, sort=sort, limit=0 if tests else limit)
+
+        objs = (obj for obj in objs if all(test(obj) for test in tests))
+        if limit:
+            objs = itertools.islice(objs, limit)
+
+        return objs
+
+    def __iter__(self):
+        return self._iter(self.sort)
+
+    def __len__(self):
+        store = self._store
+        if store is not None and self._exact:
+            return store.count(self.query)
+
+        return super(QueryBundle, self).__len__()
+
+    def _sort_field(self, name_attr):
+        # the document field of an attribute if it is stored in the same
+        # field for all classes that can be in the bundle, otherwise None.
+        # Other attributes, like properties, are not in any field
+        store = self._store
+        if store is None:
+            return None
+
+        fields = set()
+        for cls in StorableMixin.objects().values():
+            if issubclass(cls, store.content_class) and all(
+                    issubclass(cls, c) for c in self.classes):
+                if name_attr == 'name' or name_attr in cls._find_by or \
+                        name_attr in sync_variables(cls):
+                    fields.add(name_attr)
+                elif name_attr in cls._sort_by:
+                    fields.add('_dict.' + name_attr)
+                else:
+                    return None
+
+        if len(fields) == 1:
+            return fields.pop()
+
+        return None
+
+    def sorted(self, key, reverse=False):
+        if isinstance(key, six.string_types):
+            field = self._sort_field(key)
+            if field is not None:
+                return QueryBundle(
+                    self.bundle, self.filters, self.classes,
+                    [(field, -1 if reverse else 1)])
+
+        # functions and attributes in different fields are sorted in python
+        return super(QueryBundle, self).sorted(key, reverse)
+
+    @property
+    def first(self):
+        """
+        object or None
+            the first of the sorted entries or the earliest entry if the
+            bundle is not sorted
+        """
+        if self.sort is None and self._store is None:
+            return _first_by_time(self)
+
+        return next(self._iter(self.sort or _time_order, 1), None)
+
+    @property
+    def last(self):
+        """
+        object or None
+            the last of the sorted entries or the latest entry if the
+            bundle is not sorted
+        """
+        if self.sort is None and self._store is None:
+            return _first_by_time(self, True)
+
+        return next(self._iter(
+            [(field, -direction)
+             for field, direction in self.sort or _time_order], 1), None)
+
+    def top(self, k):
+        return list(self._iter(self.sort, k))
+
+    def sample(self, n):
+        store = self._store
+        if store is not None and self._exact:
+            return store.sample(n, self.query)
+
+        return super(QueryBundle, self).sample(n)
+
+    def pick(self):
+        picked = self.sample(1)
+        if picked:
+            return picked[0]
+
+        return None
+
+    def c(self, cls):
+        classes = cls if isinstance(cls, tuple) else (cls,)
+        if all(isinstance(c, type) and issubclass(c, StorableMixin)
+               for c in classes):
+            condition = {'_cls': {'$in': [
+                name for name, c in StorableMixin.objects().items()
+                if issubclass(c, classes)]}}
+        else:
+            # not storable classes cannot be found by name
+            condition = None
+
+        return self._filtered(
+            condition, lambda x: isinstance(x, cls), True, [classes])
+
+    def m(self, name_attr, value):
+        if isinstance(value, _query_types) or value is None:
+            condition = _field_condition(name_attr, value)
+        else:
+            condition = None
+
+        # entries without the attribute do not match
+        return self._filtered(
+            condition, lambda x: getattr(x, name_attr, _missing) == value)
+
+    def a(self, name_attr, pattern, match=False):
+        if match:
+            return self.m(name_attr, pattern)
+
+        return self._filtered(
+            _field_condition(name_attr, {'$regex': re.escape(pattern)}),
+            lambda x: isinstance(
+                getattr(x, name_attr, None), six.string_types) and
+            getattr(x, name_attr).find(pattern) >= 0)
@@ -0,0 +1,233 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+#          John Ossyra
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+
+"""
+Capture - Bounded capture of the output of running tasks
+
+The output of a task is written to a file as it arrives and only the first
+and the last bytes are kept in memory. Once the task is done the file can
+be uploaded gzip compressed to GridFS without reading it into memory.
+"""
+
+from __future__ import absolute_import
+
+import zlib
+
+# zlib window bits that read and write the gzip format
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class StreamCapture(object):
+    """
+    Write a stream to a file and keep its head and tail in memory
+
+    Parameters
+    ----------
+    path : str
+        the file the stream is written to
+    head : int
+        the number of bytes kept from the start of the stream
+    tail : int
+        the number of bytes kept from the end of the stream
+
+    Attributes
+    ----------
+    size : int
+        the number of bytes written so far
+    """
+
+    def __init__(self, path, head=16384, tail=65536):
+        self.path = path
+        self.head_size = head
+        self.tail_size = tail
+        self.size = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        """
+        Append data to the file and update head and tail
+
+        Parameters
+        ----------
+        data : bytes
+            the new output
+        """
+        self._file.write(data)
+        # make the output available to readers of the file right away
+        self._file.flush()
+        self.size += len(data)
+
+        missing = self.head_size - len(self._head)
+        if missing > 0:
+            self._head += data[:missing]
+            data = data[missing:]
+
+        self._tail += data
+        if len(self._tail) > 2 * self.tail_size:
+            # trim rarely to keep appending cheap
+            del self._tail[:-self.tail_size]
+
+    @property
+    def skipped(self):
+        """
+        int : the number of bytes neither in the head nor the tail
+        """
+        return self.size - len(self._head) - min(
+            len(self._tail), self.tail_size)
+
+    def tail(self, size=None):
+        """
+        Return the last bytes of the stream
+
+        Parameters
+        ----------
+        size : int or None
+            the maximal number of bytes. If None all bytes of the tail
+
+        Returns
+        -------
+        bytes
+        """
+        if size is None or size > self.tail_size:
+            size = self.tail_size
+
+        if size <= 0:
+            return b''
+
+        data = self._tail[-size:]
+        missing = size - len(data)
+        if missing > 0 and len(self._head) + len(self._tail) == self.size:
+            # head and tail are contiguous, so the tail can be extended
+            data = self._head[-missing:] + data
+
+        return bytes(data)
+
+    def excerpt(self):
+        """
+        Return the head and the tail of the stream
+
+        Returns
+        -------
+        bytes
+            the full stream if nothing was skipped, otherwise the head and
+            the tail separated by a note on the number of skipped bytes
+        """
+        tail = self._tail[-self.tail_size:]
+        skipped = self.skipped
+        if skipped:
+            return bytes(self._head) + (
+                b'\n[... %d bytes skipped ...]\n' % skipped) + bytes(tail)
+
+        return bytes(self._head + tail)
+
+    def close(self):
+        """
+        Close the file
+        """
+        if not self._file.closed:
+            self._file.close()
+
+    def upload(self, grid, file_id, **kwargs):
+        """
+        Store the full stream gzip compressed in GridFS
+
+        Parameters
+        ----------
+        grid : `gridfs.GridFS` or `mongodb.sqlite.SQLiteGridFS`
+            the GridFS to store the stream in
+        file_id : object
+            the `_id` of the GridFS file
+        kwargs : dict
+            additional fields for the GridFS file
+
+        Returns
+        -------
+        object
+            the `_id` of the GridFS file
+        """
+        self.close()
+        with open(self.path, 'rb') as f:
+            return grid.put(
+                GzipReader(f), _id=file_id, compression='gzip',
+                raw_length=self.size, **kwargs)
+
+
+class GzipReader(object):
+    """
+    A file-like object returning the gzip compressed content of a file
+
+    The file is read and compressed block by block while data is read, so
+    GridFS can store a large file in chunks without holding it in memory.
+
+    Parameters
+    ----------
+    f : file
+        the file opened in binary mode
+    level : int
+        the compression level from 1 to 9
+    """
+
+    block_size = 1 << 16
+
+    def __init__(self, f, level=6):
+        self._file = f
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+        self._buffer = b''
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            block = self._file.read(self.block_size)
+            if block:
+                self._buffer += self._compressor.compress(block)
+            else:
+                self._buffer += self._compressor.flush()
+                self._done = True
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+
+def read_compressed(grid, file_id):
+    """
+    Return the content of a gzip compressed GridFS file
+
+    Parameters
+    ----------
+    grid : `gridfs.GridFS` or `mongodb.sqlite.SQLiteGridFS`
+        the GridFS containing the file
+    file_id : object
+        the `_id` of the GridFS file
+
+    Returns
+    -------
+    bytes
+        the uncompressed content
+    """
+    return zlib.decompress(grid.get(file_id).read(), _GZIP_WBITS)
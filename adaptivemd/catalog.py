@@ -0,0 +1,422 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+#          John Ossyra
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+
+"""
+Catalog - A table of all stored trajectories that is kept up to date
+
+The catalog holds a small entry for each trajectory in the files store of
+a project. It is filled once from the stored documents and afterwards only
+documents that were saved or had a sync variable (like `created`) changed
+since the last refresh are requested. Counting, membership and filtering
+by the fields of the entries never load the trajectories.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import random
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from uuid import UUID
+
+import six
+
+from .bundle import BaseBundle
+from .engine import Trajectory
+from .mongodb import StorableMixin
+from .mongodb.base import long_t
+from .mongodb.buffer import modified_key
+
+logger = logging.getLogger(__name__)
+
+
+class TrajectoryEntry(namedtuple('TrajectoryEntry', [
+        'uuid', 'length', 'engine', 'parent', 'parent_frame',
+        'created', 'time'])):
+    """
+    The catalog entry of a stored trajectory
+
+    Attributes
+    ----------
+    uuid : int
+        the uuid of the trajectory
+    length : int or None
+        the length of the trajectory in frames
+    engine : int or None
+        the uuid of the engine used to create the trajectory
+    parent : int or None
+        the uuid of the file or trajectory of the initial frame
+    parent_frame : int or None
+        the index of the initial frame in the parent trajectory or None if
+        the initial frame is a file
+    created : float or None
+        the value of `File.created`
+    time : int
+        the creation time of the trajectory object
+    """
+
+    __slots__ = ()
+
+    @property
+    def exists(self):
+        """
+        bool : True if the trajectory has a positive `created` timestamp
+        """
+        return self.created is not None and self.created > 0
+
+
+def _reference_uuid(value):
+    # the uuid of a simplified reference to a stored object
+    if isinstance(value, dict) and '_hex_uuid' in value:
+        return long_t(value['_hex_uuid'], 16)
+
+    return None
+
+
+def _entry(dct):
+    dct_dict = dct.get('_dict', {})
+    length = dct.get('length', dct_dict.get('length'))
+
+    frame = dct_dict.get('frame')
+    parent = _reference_uuid(frame)
+    parent_frame = None
+    if parent is None and isinstance(frame, dict) and \
+            frame.get('_cls') == 'Frame':
+        parent = _reference_uuid(frame['_dict'].get('trajectory'))
+        parent_frame = frame['_dict'].get('index')
+
+    return TrajectoryEntry(
+        int(UUID(dct['_id'])),
+        length,
+        _reference_uuid(dct.get('engine')),
+        parent,
+        parent_frame,
+        dct.get('created'),
+        dct.get('_time', 0))
+
+
+class TrajectoryCatalog(object):
+    """
+    All trajectories of a store, refreshed incrementally from the DB
+
+    A refresh requests only documents that were saved or modified after
+    the newest known change minus `overlap` seconds and compares the
+    number of stored trajectories to find removed ones. Refreshes are
+    skipped if the last one is less than `staleness` seconds ago.
+
+    Attributes
+    ----------
+    store : `ObjectStore` or None
+        the store that contains the trajectories
+    staleness : float
+        seconds the catalog is used without asking the DB
+    """
+
+    # seconds the catalog is used without a refresh
+    default_staleness = 0.5
+    # seconds the refresh looks back to allow for clock skew
+    # between processes writing to the same store
+    overlap = 5.0
+
+    projection = [
+        '_id', '_time', '_saved', modified_key, 'length', 'engine',
+        'created', '_dict.length', '_dict.frame']
+
+    def __init__(self, content_class=Trajectory):
+        self.content_class = content_class
+        self.store = None
+        self.staleness = self.default_staleness
+        self._lock = threading.RLock()
+        self._reset()
+        self.stats = {
+            'full': 0,
+            'incremental': 0,
+            'skipped': 0,
+            'fetched': 0
+        }
+
+    def _reset(self):
+        self._entries = OrderedDict()
+        self._changed = None
+        self._refreshed = None
+
+    def set_store(self, store):
+        """
+        Set the store of the trajectories and empty the catalog
+
+        Parameters
+        ----------
+        store : `ObjectStore` or None
+            the store that contains the trajectories
+        """
+        with self._lock:
+            self.store = store
+            self._reset()
+
+        return self
+
+    @property
+    def query(self):
+        """
+        dict : the DB query for all documents of trajectories
+        """
+        return {'_cls': {'$in': sorted(
+            name for name, cls in StorableMixin.objects().items()
+            if issubclass(cls, self.content_class))}}
+
+    def refresh(self, force=False):
+        """
+        Update the catalog from the DB
+
+        Parameters
+        ----------
+        force : bool
+            if True the DB is asked even if the last refresh is younger
+            than `staleness`
+        """
+        with self._lock:
+            if self.store is None:
+                return
+
+            now = time.time()
+            if not force and self._refreshed is not None and \
+                    now - self._refreshed <= self.staleness:
+                self.stats['skipped'] += 1
+                return
+
+            query = self.query
+            if self._changed is None:
+                self._load(query)
+            else:
+                since = self._changed - self.overlap
+                self._load({'$and': [query, {'$or': [
+                    {'_saved': {'$gte': since}},
+                    {modified_key: {'$gte': since}}]}]})
+
+                if self.store.count(query) != len(self._entries):
+                    # trajectories have been removed from the store
+                    self._entries = OrderedDict()
+                    self._changed = None
+                    self._load(query)
+
+            self._refreshed = now
+
+    def _load(self, query):
+        full = self._changed is None
+        changed = self._changed or 0.0
+        fetched = 0
+        for dct in self.store._document.find(query, self.projection):
+            entry = _entry(dct)
+            self._entries[entry.uuid] = entry
+            changed = max(
+                changed, dct.get('_saved') or 0.0, dct.get(modified_key) or 0.0)
+            fetched += 1
+
+        self._changed = changed
+        self.stats['full' if full else 'incremental'] += 1
+        self.stats['fetched'] += fetched
+
+    def entries(self):
+        """
+        Return all entries after a refresh
+
+        Returns
+        -------
+        list of `TrajectoryEntry`
+            the entries in the order the trajectories were found
+        """
+        self.refresh()
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, uuid):
+        """
+        Return the entry of a trajectory after a refresh
+
+        Parameters
+        ----------
+        uuid : int
+            the uuid of the trajectory
+
+        Returns
+        -------
+        `TrajectoryEntry` or None
+            the entry or None if the trajectory is not in the catalog
+        """
+        self.refresh()
+        with self._lock:
+            return self._entries.get(uuid)
+
+    def bundle(self, existing=True):
+        """
+        Return a bundle of the trajectories in the catalog
+
+        Parameters
+        ----------
+        existing : bool
+            if True only trajectories that exist are in the bundle
+
+        Returns
+        -------
+        `CatalogBundle`
+        """
+        tests = [lambda entry: entry.exists] if existing else []
+        return CatalogBundle(self, tests)
+
+
+class CatalogBundle(BaseBundle):
+    """
+    A view on the trajectories of a `TrajectoryCatalog`
+
+    Length, membership and filters or sorting by fields of
+    `TrajectoryEntry` only use the catalog. Trajectories are loaded in
+    chunks when the bundle is iterated. Other filters are applied to the
+    loaded trajectories.
+
+    Parameters
+    ----------
+    catalog : `TrajectoryCatalog`
+        the catalog of the trajectories
+    tests : list of callable
+        functions an entry needs to fulfill to be in the bundle
+    order : tuple(str, bool) or None
+        the entry field and if the order is reversed
+    """
+
+    def __init__(self, catalog, tests=None, order=None):
+        super(CatalogBundle, self).__init__()
+        self.catalog = catalog
+        self.tests = tests or []
+        self.order = order
+
+    def entries(self):
+        """
+        Return the entries of all trajectories in the bundle
+
+        Returns
+        -------
+        list of `TrajectoryEntry`
+        """
+        entries = [
+            entry for entry in self.catalog.entries()
+            if all(test(entry) for test in self.tests)]
+
+        if self.order is not None:
+            field, reverse = self.order
+            entries.sort(
+                key=lambda entry: getattr(entry, field), reverse=reverse)
+
+        return entries
+
+    def _load(self, entries):
+        store = self.catalog.store
+        if store is None:
+            return []
+
+        return store.load_many([entry.uuid for entry in entries])
+
+    def __iter__(self):
+        entries = self.entries()
+        store = self.catalog.store
+        if store is None:
+            return
+
+        chunk_size = store.default_load_chunk_size
+        for pos in range(0, len(entries), chunk_size):
+            for obj in self._load(entries[pos:pos + chunk_size]):
+                yield obj
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __contains__(self, item):
+        entry = self.catalog.get(getattr(item, '__uuid__', None))
+        return entry is not None and all(test(entry) for test in self.tests)
+
+    def m(self, name_attr, value):
+        if name_attr not in TrajectoryEntry._fields:
+            return super(CatalogBundle, self).m(name_attr, value)
+
+        if isinstance(value, StorableMixin):
+            value = value.__uuid__
+
+        return CatalogBundle(
+            self.catalog,
+            self.tests + [lambda entry: getattr(entry, name_attr) == value],
+            self.order)
+
+    def sorted(self, key, reverse=False):
+        if isinstance(key, six.string_types) and \
+                key in TrajectoryEntry._fields:
+            return CatalogBundle(self.catalog, self.tests, (key, reverse))
+
+        return super(CatalogBundle, self).sorted(key, reverse)
+
+    def _one(self, entries):
+        objs = self._load(entries[:1])
+        return objs[0] if objs else None
+
+    @property
+    def first(self):
+        """
+        object or None
+            the first of the sorted trajectories or the earliest
+            trajectory if the bundle is not sorted
+        """
+        entries = self.entries()
+        if self.order is None:
+            entries.sort(key=lambda entry: entry.time)
+
+        return self._one(entries)
+
+    @property
+    def last(self):
+        """
+        object or None
+            the last of the sorted trajectories or the latest trajectory
+            if the bundle is not sorted
+        """
+        entries = self.entries()
+        if self.order is None:
+            entries.sort(key=lambda entry: entry.time)
+
+        return self._one(entries[::-1])
+
+    @property
+    def one(self):
+        return self._one(self.entries())
+
+    def top(self, k):
+        return self._load(self.entries()[:k])
+
+    def sample(self, n):
+        entries = self.entries()
+        return self._load(random.sample(entries, min(n, len(entries))))
+
+    def pick(self):
+        entries = self.entries()
+        if entries:
+            return self._one(random.sample(entries, 1))
+
+        return None
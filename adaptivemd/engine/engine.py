@@ -218,7 +218,8 @@ class Trajectory(File):
 
     """
 
-    _find_by = ['created', 'state', 'task', 'engine']
+    _find_by = ['created', 'state', 'task', 'engine', 'length']
+    _index_by = File._index_by + ['engine', 'length']
 
     engine = ObjectSyncVariable('engine', 'generators', lambda x: not bool(x))
 
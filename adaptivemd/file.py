@@ -3,6 +3,8 @@ from __future__ import print_function, absolute_import
 import os
 import time
 
+import six
+
 from .mongodb import (StorableMixin, ObjectJSON,
                       JSONDataSyncVariable, SyncVariable, ObjectSyncVariable, DataDict)
 
@@ -45,12 +47,14 @@ class Location(StorableMixin):
 
     _ignore = True
 
+    _sort_by = ['location']
+
     def __init__(self, location):
         super(Location, self).__init__()
 
         if isinstance(location, Location):
             self.location = location.location
-        elif isinstance(location, (unicode, str)):
+        elif isinstance(location, six.string_types):
             self.location = str(location)
         else:
             raise ValueError('location can only be a `File` or a string.')
@@ -267,6 +271,7 @@ class File(Location):
     the time stamp when it was created.
     """
     _find_by = ['created', 'task']
+    _index_by = ['_cls', 'created', 'task']
 
     created = SyncVariable('created', lambda x: x is not None and x < 0)
     _file = ObjectSyncVariable('_file', lambda x: x is not None)
@@ -21,6 +21,9 @@
 ##############################################################################
 from __future__ import print_function, absolute_import
 
+from uuid import UUID
+
+from .capture import read_compressed
 from .mongodb import StorableMixin
 from .util import DT
 
@@ -49,19 +52,52 @@ class LogEntry(StorableMixin):
         pick `LogEntry.SEVERE`, `LogEntry.ERROR` or `LogEntry.INFO` (default)
     objs : dict of storable objects
         you can attach objects that can help with specifying the error message
+    size : int or None
+        if not None the message is an excerpt of a message of `size` bytes.
+        The full message is stored compressed in the GridFS `logs` of the
+        storage, see `full`
     """
 
     SEVERE = 1
     ERROR = 2
     INFO = 3
 
-    def __init__(self, logger, title, message, level=INFO, objs=None):
+    # the GridFS of full messages
+    grid_name = 'logs'
+
+    def __init__(self, logger, title, message, level=INFO, objs=None,
+                 size=None):
         super(LogEntry, self).__init__()
         self.logger = logger
         self.title = title
         self.message = message
         self.level = level
         self.objs = objs
+        self.size = size
+
+    @property
+    def file_id(self):
+        """
+        str : the `_id` of the full message in GridFS
+        """
+        return str(UUID(int=self.__uuid__))
+
+    @property
+    def full(self):
+        """
+        Return the full message
+
+        Returns
+        -------
+        str
+            the full message if it was stored separately, the message
+            otherwise
+        """
+        if self.size is None or self.__store__ is None:
+            return self.message
+
+        grid = self.__store__.storage.create_grid(self.grid_name)
+        return read_compressed(grid, self.file_id).decode('utf8', 'replace')
 
     def __str__(self):
         return '%s [%s:%s] %s\n%s' % (
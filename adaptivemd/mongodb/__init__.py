@@ -30,12 +30,18 @@ from __future__ import absolute_import
 from .base import StorableMixin, create_to_dict
 from .syncvar import SyncVariable, ObjectSyncVariable, JSONDataSyncVariable
 from .cache import WeakKeyCache, WeakLRUCache, WeakValueCache, MaxCache, \
-    NoCache, Cache, LRUCache
+    NoCache, Cache, LRUCache, ByteLRUCache, CacheBudget
 from .dictify import ObjectJSON, UUIDObjectJSON
+from .sqlite import SQLiteClient, SQLiteGridFS
+from .advisor import IndexAdvisor
+from .client import get_client, close_clients, pool_stats, \
+    set_client_options, enable_index_advisor, disable_index_advisor
 from .mongodb import MongoDBStorage
 
 from .object import ObjectStore
+from .aio import AsyncStorage, AsyncObjectStore
+from .index import UUIDIndex
 
 from .proxy import DelayedLoader, lazy_loading_attributes, LoaderProxy
 
-from .file import FileStore, DataDict
+from .file import FileStore, DataDict, DataSection
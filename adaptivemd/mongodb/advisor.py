@@ -0,0 +1,234 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+"""
+An index advisor based on the command monitoring of pymongo
+
+The advisor reduces every query sent to MongoDB to its shape, the fields
+it filters and sorts by without their values, and sums up the time spent
+for each shape. Shapes that were slow are reported together with the
+index that would support them. Enable it with
+:func:`mongodb.client.enable_index_advisor` before the storages are opened.
+"""
+from __future__ import absolute_import
+
+import threading
+
+from pymongo.monitoring import CommandListener
+
+# operators that select a range of values instead of single ones
+_range_operators = {'$gt', '$gte', '$lt', '$lte', '$ne', '$nin', '$regex',
+                    '$exists', '$not'}
+
+# the field of the query and sort in the commands that are analyzed
+_commands = {
+    'find': ('filter', 'sort'),
+    'count': ('query', None),
+    'distinct': ('query', None),
+    'findAndModify': ('query', 'sort'),
+    'findandmodify': ('query', 'sort'),
+    'update': ('updates', None),
+    'delete': ('deletes', None),
+    'aggregate': ('pipeline', None)
+}
+
+
+def query_shape(query):
+    """
+    Return the fields of a query and how they are compared
+
+    Parameters
+    ----------
+    query : dict or None
+        a mongodb query
+
+    Returns
+    -------
+    tuple of tuple(str, str)
+        the sorted field names with `eq` for equality and `range` for
+        other comparisons. Fields in `$or`, `$and` and `$nor` are included
+    """
+    fields = set()
+    for key, value in (query or {}).items():
+        if key in ('$or', '$and', '$nor'):
+            for part in value:
+                fields.update(query_shape(part))
+        elif key.startswith('$'):
+            continue
+        elif isinstance(value, dict) and any(
+                op in _range_operators for op in value):
+            fields.add((key, 'range'))
+        else:
+            fields.add((key, 'eq'))
+
+    return tuple(sorted(fields))
+
+
+def command_shape(name, command):
+    """
+    Return the shape of a command or None if it is not analyzed
+
+    Parameters
+    ----------
+    name : str
+        the name of the command, e.g. `find`
+    command : dict
+        the command document sent to the server
+
+    Returns
+    -------
+    tuple or None
+        the collection, the command name, the query shape and the sort
+        fields
+    """
+    if name not in _commands:
+        return None
+
+    query_key, sort_key = _commands[name]
+    query = command.get(query_key)
+    if name in ('update', 'delete'):
+        # use the first statement of a batch
+        query = query[0].get('q') if query else None
+    elif name == 'aggregate':
+        query = query[0].get('$match') if query else None
+
+    sort = ()
+    if sort_key and command.get(sort_key):
+        sort = tuple(command[sort_key].keys())
+
+    return command.get(name), name, query_shape(query), sort
+
+
+class IndexAdvisor(CommandListener):
+    """
+    Collect the durations of query shapes sent to MongoDB
+
+    Parameters
+    ----------
+    slow_ms : float
+        commands that take longer than this number of milliseconds are
+        counted as slow
+
+    Examples
+    --------
+    >>> advisor = enable_index_advisor(slow_ms=20)  # doctest: +SKIP
+    >>> for shape in advisor.report():  # doctest: +SKIP
+    ...     print(shape['collection'], shape['index'], shape['total_ms'])
+    """
+
+    def __init__(self, slow_ms=10.0):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._started = {}
+        self.shapes = {}
+
+    def started(self, event):
+        shape = command_shape(event.command_name, event.command)
+        if shape is not None:
+            with self._lock:
+                self._started[
+                    (event.connection_id, event.request_id)] = shape
+
+    def succeeded(self, event):
+        with self._lock:
+            shape = self._started.pop(
+                (event.connection_id, event.request_id), None)
+            if shape is None:
+                return
+
+            ms = event.duration_micros / 1000.0
+            stats = self.shapes.get(shape)
+            if stats is None:
+                stats = self.shapes[shape] = {
+                    'count': 0, 'slow': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+            stats['count'] += 1
+            stats['total_ms'] += ms
+            stats['max_ms'] = max(stats['max_ms'], ms)
+            if ms > self.slow_ms:
+                stats['slow'] += 1
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop((event.connection_id, event.request_id), None)
+
+    def clear(self):
+        """
+        Forget all collected shapes
+        """
+        with self._lock:
+            self.shapes.clear()
+
+    @staticmethod
+    def suggest(fields, sort):
+        """
+        Return the index that supports a query shape
+
+        Equality fields come first, then the sort fields and then the
+        fields compared by ranges
+
+        Returns
+        -------
+        list of str
+            the fields of a compound index, empty if `_id` is sufficient
+        """
+        if any(field == '_id' and kind == 'eq' for field, kind in fields):
+            return []
+
+        keys = [field for field, kind in fields if kind == 'eq']
+        keys += [field for field in sort if field not in keys]
+        keys += [
+            field for field, kind in fields
+            if kind == 'range' and field not in keys]
+
+        return keys
+
+    def report(self, only_slow=True):
+        """
+        Return the collected query shapes, the most expensive first
+
+        Parameters
+        ----------
+        only_slow : bool
+            if True only shapes that were slow at least once are reported
+
+        Returns
+        -------
+        list of dict
+            the `collection`, `command`, `fields`, `sort`, the suggested
+            `index`, the number of commands, of `slow` ones and the
+            `total_ms` and `max_ms` spent
+        """
+        with self._lock:
+            shapes = list(self.shapes.items())
+
+        result = [
+            dict(
+                stats,
+                collection=collection,
+                command=command,
+                fields=fields,
+                sort=sort,
+                index=self.suggest(fields, sort))
+            for (collection, command, fields, sort), stats in shapes
+            if stats['slow'] or not only_slow]
+
+        return sorted(result, key=lambda x: x['total_ms'], reverse=True)
@@ -0,0 +1,222 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+"""
+Awaitable versions of the store operations for use in an asyncio loop
+
+The operations run unchanged (including serialization with
+`UUIDObjectJSON` and the caches) on a single thread that is shared by all
+stores of a storage. Each method returns an `asyncio.Future`, so the loop
+is never blocked by the DB while it waits for loads, saves and sync
+variable updates.
+
+The store indices, the caches and the bookkeeping of `ObjectStore.save`
+are not thread safe, so the operations are executed one after another in
+the order they were requested. Use the storage only through the async API
+while it is in use.
+
+>>> async def states(storage):  # doctest: +SKIP
+...     tasks = AsyncStorage(storage).tasks
+...     return await tasks.read_many(await tasks.all(), 'state')
+"""
+
+from __future__ import absolute_import
+
+import functools
+import logging
+
+try:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    asyncio = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStorage(object):
+    """
+    Give access to `AsyncObjectStore` instances for all stores of a storage
+
+    Parameters
+    ----------
+    storage : :class:`mongodb.MongoDBStorage`
+        the storage to be wrapped
+    loop : `asyncio.AbstractEventLoop` or None
+        the loop to be used. If None the current event loop is used
+    """
+
+    def __init__(self, storage, loop=None):
+        if asyncio is None:
+            raise RuntimeError('The async storage API requires asyncio')
+
+        self.storage = storage
+        # a single thread serializes all access to the stores
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._loop = loop
+        self._stores = {}
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            return asyncio.get_event_loop()
+
+        return self._loop
+
+    def run(self, fnc, *args, **kwargs):
+        """
+        Run a blocking function in the executor
+
+        Returns
+        -------
+        `asyncio.Future`
+            the future of the result
+        """
+        return self.loop.run_in_executor(
+            self.executor, functools.partial(fnc, *args, **kwargs))
+
+    def store(self, name):
+        """
+        Return the `AsyncObjectStore` for a store name
+
+        """
+        if name not in self._stores:
+            self._stores[name] = AsyncObjectStore(
+                self.storage._stores[name], self)
+
+        return self._stores[name]
+
+    def __getattr__(self, item):
+        storage = self.__dict__.get('storage')
+        if storage is not None and item in storage._stores:
+            return self.store(item)
+
+        raise AttributeError(item)
+
+    def refresh(self, objs):
+        return self.run(self.storage.refresh, list(objs))
+
+    def flush(self):
+        return self.run(self.storage.flush)
+
+    def close(self, wait=True):
+        """
+        Stop the executor
+
+        The storage itself stays open
+        """
+        self.executor.shutdown(wait=wait)
+
+
+class AsyncObjectStore(object):
+    """
+    Awaitable operations of an `ObjectStore`
+
+    Parameters
+    ----------
+    store : :class:`mongodb.ObjectStore`
+        the store to be wrapped
+    storage : `AsyncStorage`
+        the async storage that runs the operations
+    """
+
+    def __init__(self, store, storage):
+        self.store = store
+        self.storage = storage
+
+    def __repr__(self):
+        return 'AsyncObjectStore(%s)' % self.store.name
+
+    def _run(self, fnc, *args, **kwargs):
+        return self.storage.run(fnc, *args, **kwargs)
+
+    def load(self, idx):
+        return self._run(self.store.load, idx)
+
+    def load_many(self, idxs, chunk_size=None, skip_missing=True):
+        return self._run(
+            self.store.load_many, list(idxs), chunk_size, skip_missing)
+
+    def save(self, obj):
+        return self._run(self.store.save, obj)
+
+    def all(self):
+        """
+        Load all objects in the store
+
+        """
+        return self._run(list, self.store)
+
+    def count(self):
+        return self._run(len, self.store)
+
+    def find_one(self, dct):
+        return self._run(self.store.find_one, dct)
+
+    def refresh(self, objs, chunk_size=None):
+        return self._run(self.store.refresh, list(objs), chunk_size)
+
+    def consume_one(self, test_fnc=None):
+        return self._run(self.store.consume_one, test_fnc)
+
+    def modify_one(self, key, value, update):
+        return self._run(self.store.modify_one, key, value, update)
+
+    def modify_test_one(self, test_fnc, key, value, update):
+        return self._run(
+            self.store.modify_test_one, test_fnc, key, value, update)
+
+    def claim_one(self, query, key, value, update, exclude=None):
+        return self._run(
+            self.store.claim_one, query, key, value, update, exclude)
+
+    def read(self, obj, name):
+        """
+        Read an attribute, i.e. a `SyncVariable` from the DB
+
+        """
+        return self._run(getattr, obj, name)
+
+    def write(self, obj, name, value):
+        """
+        Set an attribute, i.e. write a `SyncVariable` to the DB
+
+        """
+        return self._run(setattr, obj, name, value)
+
+    def read_many(self, objs, name):
+        """
+        Read an attribute of many objects
+
+        All sync variables are fetched with one query per chunk first
+
+        Returns
+        -------
+        `asyncio.Future`
+            the future of the list of values
+        """
+        objs = list(objs)
+
+        def read():
+            self.store.refresh(objs)
+            return [getattr(obj, name) for obj in objs]
+
+        return self._run(read)
@@ -41,6 +41,10 @@ else:
 logger = logging.getLogger(__name__)
 
 
+# the `__init__` arguments of each class, see `StorableMixin.args`
+_init_args = {}
+
+
 class StorableMixin(object):
     """Mixin that allows objects of the class to to be stored using netCDF+
 
@@ -50,6 +54,10 @@ class StorableMixin(object):
     _args = None
     _ignore = False
     _find_by = []
+    # fields the store of the class indexes in addition to its defaults
+    _index_by = []
+    # keys of `_dict` stored for every instance, which the DB can sort by
+    _sort_by = []
 
     INSTANCE_UUID = list(uuid.uuid1().fields[:-1])
     CREATION_COUNT = long_t(0)
@@ -126,7 +134,7 @@ class StorableMixin(object):
 
         """
         if hasattr(store, 'index'):
-            return store.index.get(self, None)
+            return store.index.get(self.__uuid__, None)
         else:
             return store.idx(self)
 
@@ -240,6 +248,10 @@ class StorableMixin(object):
             included.
 
         """
+        # inspecting is slow and this is called for every object loaded
+        if cls in _init_args:
+            return _init_args[cls]
+
         try:
             if six.PY2:
                 args = inspect.getargspec(cls.__init__)[0]
@@ -250,7 +262,9 @@ class StorableMixin(object):
                 else:
                     args = args.args
         except TypeError as t:
-            return []
+            args = []
+
+        _init_args[cls] = args
         return args
 
     _excluded_attr = []
@@ -285,6 +299,20 @@ class StorableMixin(object):
             key: self.__dict__[key] for key in keys_to_store
         }
 
+    def query_fields(self):
+        """
+        Return additional fields stored with the object for server side queries
+
+        These fields are written at the top level of the stored document
+        and are never used to reconstruct the object
+
+        Returns
+        -------
+        dict
+            the field names and their simple (JSON compatible) values
+        """
+        return {}
+
     @classmethod
     def from_dict(cls, dct):
         """
@@ -0,0 +1,243 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# the document field with the time of the last update of a sync variable
+modified_key = '_modified'
+
+
+class WriteBuffer(object):
+    """
+    Collects field updates of documents and writes them in bulk
+
+    Updates to the same document are merged into a single `$set` so only the
+    last value of each field is written. Documents are written in the order
+    they were first changed using one `bulk_write` per collection.
+
+    The buffer is only used while it is `active`, i.e. inside of at least
+    one :meth:`MongoDBStorage.batch` block or if periodic flushing has been
+    enabled with :meth:`MongoDBStorage.write_behind`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pending = OrderedDict()
+        self._depth = 0
+        self._interval = None
+        self._stop = None
+        self.stats = {
+            'buffered': 0,
+            'written': 0,
+            'flushes': 0
+        }
+
+    @property
+    def active(self):
+        return self._depth > 0 or self._interval is not None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def enter(self):
+        with self._lock:
+            self._depth += 1
+
+    def exit(self):
+        with self._lock:
+            self._depth -= 1
+            if self._depth == 0:
+                self.flush()
+
+    def set(self, collection, idx, name, value):
+        """
+        Buffer a `$set` of a single field
+
+        Parameters
+        ----------
+        collection : `pymongo.collection.Collection`
+            the collection that contains the document
+        idx : str
+            the `_id` of the document
+        name : str
+            the name of the field
+        value : object
+            the (simplified) value to be stored
+        """
+        with self._lock:
+            key = (collection.full_name, idx)
+            if key not in self._pending:
+                self._pending[key] = (collection, OrderedDict())
+
+            self._pending[key][1][name] = value
+            self.stats['buffered'] += 1
+
+    def pending(self, collection, idx):
+        """
+        Return the buffered fields of a document
+
+        Returns
+        -------
+        dict or None
+            the fields not yet written or None if there are none
+        """
+        with self._lock:
+            entry = self._pending.get((collection.full_name, idx))
+            if entry is not None:
+                return dict(entry[1])
+
+        return None
+
+    def pop(self, collection, idx):
+        """
+        Remove and return the buffered fields of a document
+
+        Used to write them together with an unbuffered update of the same
+        document which keeps the order of changes to this document
+
+        Returns
+        -------
+        dict
+            the fields not yet written, possibly empty
+        """
+        with self._lock:
+            entry = self._pending.pop((collection.full_name, idx), None)
+            if entry is not None:
+                return entry[1]
+
+        return {}
+
+    def restore(self, collection, idx, fields):
+        """
+        Put back fields returned by `pop` that could not be written
+
+        Fields buffered again in the meantime are newer and are kept
+
+        Parameters
+        ----------
+        collection : `pymongo.collection.Collection`
+            the collection that contains the document
+        idx : str
+            the `_id` of the document
+        fields : dict
+            the fields returned by `pop`
+        """
+        if not fields:
+            return
+
+        with self._lock:
+            key = (collection.full_name, idx)
+            restored = OrderedDict(fields)
+            if key in self._pending:
+                restored.update(self._pending[key][1])
+
+            self._pending[key] = (collection, restored)
+
+    def flush(self):
+        """
+        Write all buffered updates to the DB
+        """
+        with self._lock:
+            if not self._pending:
+                return
+
+            pending = self._pending
+            self._pending = OrderedDict()
+
+            modified = time.time()
+            by_collection = OrderedDict()
+            for key, (collection, fields) in pending.items():
+                update = dict(fields)
+                update[modified_key] = modified
+                keys, requests = by_collection.setdefault(
+                    key[0], (collection, [], []))[1:]
+                keys.append(key)
+                requests.append(UpdateOne({'_id': key[1]}, {'$set': update}))
+
+            written = set()
+            try:
+                for collection, keys, requests in by_collection.values():
+                    try:
+                        collection.bulk_write(requests, ordered=True)
+                    except BulkWriteError as e:
+                        # ordered writes stop at the first error
+                        errors = e.details.get('writeErrors')
+                        if errors:
+                            written.update(keys[:errors[0]['index']])
+                        raise
+
+                    written.update(keys)
+                    self.stats['written'] += len(requests)
+
+            except Exception:
+                # put back the updates that were not written so they can be
+                # retried. Written ones are dropped, they could overwrite
+                # newer values written by other processes when retried. The
+                # lock is held while writing, so nothing was buffered in the
+                # meantime and unbuffered writes of a document cannot pass
+                # its buffered ones
+                self._pending = OrderedDict(
+                    (key, entry) for key, entry in pending.items()
+                    if key not in written)
+                raise
+
+            self.stats['flushes'] += 1
+
+    def start_timer(self, interval):
+        """
+        Keep the buffer active and flush it every `interval` seconds
+        """
+        self.stop_timer()
+
+        self._interval = interval
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._run_timer, args=(self._stop, interval))
+        thread.daemon = True
+        thread.start()
+
+    def stop_timer(self):
+        """
+        Stop periodic flushing and write all pending updates
+        """
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+        self._interval = None
+        self.flush()
+
+    def _run_timer(self, stop, interval):
+        while not stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning('Could not flush buffered updates: %s' % e)
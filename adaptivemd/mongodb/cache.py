@@ -27,8 +27,12 @@
 
 
 from collections import OrderedDict
+import itertools
+import sys
 import weakref
 
+import numpy as np
+
 __author__ = 'Jan-Hendrik Prinz'
 
 
@@ -72,6 +76,18 @@ class Cache(object):
     def __setitem__(self, key, value):
         pass
 
+    def update(self, other):
+        """
+        Add all key value pairs of a dict to the cache
+
+        Parameters
+        ----------
+        other : dict
+            the items to be added
+        """
+        for key, value in other.items():
+            self[key] = value
+
     def get(self, item, default=None):
         """
         get value by key if it exists, None else
@@ -403,3 +419,320 @@ class WeakKeyCache(weakref.WeakKeyDictionary, Cache):
     @property
     def size(self):
         return 0, -1
+
+
+def estimate_size(obj, depth=4):
+    """
+    Estimate the memory used by an object and the data it holds
+
+    Attributes are followed up to `depth` levels. Referenced storable
+    objects (anything with a `__uuid__`) are not included, since they are
+    cached on their own.
+
+    Parameters
+    ----------
+    obj : object
+        the object to be measured
+    depth : int
+        the number of levels of attributes and contained objects to follow
+
+    Returns
+    -------
+    int
+        the estimated number of bytes
+    """
+    if isinstance(obj, np.ndarray):
+        # views do not own their data, so `getsizeof` would miss it
+        return sys.getsizeof(obj, 0) + (0 if obj.flags.owndata else obj.nbytes)
+
+    size = sys.getsizeof(obj, 0)
+
+    if depth == 0:
+        return size
+
+    if isinstance(obj, dict):
+        items = itertools.chain(obj.keys(), obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = obj
+    elif hasattr(obj, '__dict__'):
+        items = [obj.__dict__]
+    else:
+        return size
+
+    for item in items:
+        if not hasattr(item, '__uuid__'):
+            size += estimate_size(item, depth - 1)
+
+    return size
+
+
+class CacheBudget(object):
+    """
+    A limit for the estimated bytes held by a group of `ByteLRUCache` objects
+
+    If the sum of all caches exceeds the limit, the least recently used
+    objects of all caches that are not pinned are evicted.
+
+    Attributes
+    ----------
+    max_bytes : int
+        the maximal number of bytes held by all caches together
+    nbytes : int
+        the current number of bytes held by all caches together
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.caches = []
+        self._ticks = itertools.count()
+
+    def register(self, cache):
+        """
+        Add a cache to the group limited by this budget
+
+        Parameters
+        ----------
+        cache : `ByteLRUCache`
+            the cache to be added
+        """
+        self.caches.append(cache)
+        self.nbytes += cache.nbytes
+
+    def unregister(self, cache):
+        """
+        Remove a cache from the group limited by this budget
+
+        Parameters
+        ----------
+        cache : `ByteLRUCache`
+            the cache to be removed
+        """
+        if cache in self.caches:
+            self.caches.remove(cache)
+            self.nbytes -= cache.nbytes
+
+    def tick(self):
+        return next(self._ticks)
+
+    def check(self):
+        """
+        Evict objects until the limit is reached
+        """
+        while self.nbytes > self.max_bytes:
+            candidates = [
+                cache for cache in self.caches
+                if not cache.pinned and len(cache._cache) > 0]
+
+            if not candidates:
+                break
+
+            oldest = min(candidates, key=lambda cache: cache.oldest_tick)
+            oldest.evict_oldest()
+
+    @property
+    def stats(self):
+        """
+        dict : the limit, the current bytes and the summed cache counters
+        """
+        return {
+            'max_bytes': self.max_bytes,
+            'bytes': self.nbytes,
+            'hits': sum(cache.hits for cache in self.caches),
+            'misses': sum(cache.misses for cache in self.caches),
+            'evictions': sum(cache.evictions for cache in self.caches)
+        }
+
+
+class ByteLRUCache(Cache):
+    """
+    A Least Recently Used Cache bounded by the estimated size in bytes
+
+    Objects evicted from the cache are kept as weak references, so they are
+    still found as long as they are used elsewhere. The cache counts hits,
+    misses and evictions.
+
+    Attributes
+    ----------
+    max_bytes : int or None
+        the maximal number of bytes held by this cache, None for no limit
+    budget : `CacheBudget` or None
+        a budget shared with other caches
+    pinned : bool
+        if True objects are never evicted, but still counted in the budget
+    nbytes : int
+        the current estimated number of bytes held
+    hits : int
+        the number of successful lookups
+    misses : int
+        the number of failed lookups
+    evictions : int
+        the number of objects moved out of the strong cache
+    """
+
+    def __init__(self, max_bytes=None, budget=None, pinned=False,
+                 sizer=estimate_size):
+        super(ByteLRUCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.pinned = pinned
+        self.sizer = sizer
+
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # key : (value, nbytes, tick of last use)
+        self._cache = OrderedDict()
+        self._weak_cache = weakref.WeakValueDictionary()
+        self._ticks = itertools.count()
+
+        self.budget = budget
+        if budget is not None:
+            budget.register(self)
+
+    @property
+    def count(self):
+        return len(self._cache), len(self._weak_cache)
+
+    @property
+    def size(self):
+        return -1, -1
+
+    @property
+    def stats(self):
+        """
+        dict : the counters, the current bytes and the limit of the cache
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'pinned': self.pinned
+        }
+
+    def _tick(self):
+        if self.budget is not None:
+            return self.budget.tick()
+
+        return next(self._ticks)
+
+    def _add_bytes(self, nbytes):
+        self.nbytes += nbytes
+        if self.budget is not None:
+            self.budget.nbytes += nbytes
+
+    def _insert(self, key, value, nbytes):
+        self._cache[key] = (value, nbytes, self._tick())
+        self._add_bytes(nbytes)
+        self._check_size_limit()
+
+    def __getitem__(self, item):
+        try:
+            value, nbytes, _ = self._cache.pop(item)
+        except KeyError:
+            try:
+                # evicted but still in use somewhere
+                value = self._weak_cache.pop(item)
+            except KeyError:
+                self.misses += 1
+                raise
+
+            self.hits += 1
+            self._insert(item, value, self.sizer(value))
+            return value
+
+        self.hits += 1
+        self._cache[item] = (value, nbytes, self._tick())
+        return value
+
+    def get_silent(self, item):
+        """
+        Return item from the cache without reordering or counting
+
+        Parameters
+        ----------
+        item : object
+            the item index to be retrieved from the cache
+
+        Returns
+        -------
+        object or None
+            the requested object if it exists else None
+        """
+        if item in self._cache:
+            return self._cache[item][0]
+
+        return self._weak_cache.get(item)
+
+    def __setitem__(self, key, value):
+        if key in self._cache:
+            self._add_bytes(-self._cache.pop(key)[1])
+        elif key in self._weak_cache:
+            del self._weak_cache[key]
+
+        self._insert(key, value, self.sizer(value))
+
+    def __delitem__(self, key):
+        if key in self._cache:
+            self._add_bytes(-self._cache.pop(key)[1])
+        else:
+            del self._weak_cache[key]
+
+    @property
+    def oldest_tick(self):
+        """
+        int : the tick of the least recently used object
+        """
+        return next(iter(self._cache.values()))[2]
+
+    def evict_oldest(self):
+        """
+        Move the least recently used object out of the strong cache
+        """
+        key, (value, nbytes, _) = self._cache.popitem(last=False)
+        self._add_bytes(-nbytes)
+        self.evictions += 1
+        try:
+            self._weak_cache[key] = value
+        except TypeError:
+            # not all objects can be referenced weakly
+            pass
+
+    def _check_size_limit(self):
+        if not self.pinned and self.max_bytes is not None:
+            while self.nbytes > self.max_bytes and self._cache:
+                self.evict_oldest()
+
+        if self.budget is not None:
+            self.budget.check()
+
+    def __contains__(self, item):
+        return item in self._cache or item in self._weak_cache
+
+    def clear(self):
+        self._add_bytes(-self.nbytes)
+        self._cache.clear()
+        self._weak_cache.clear()
+
+    def keys(self):
+        return list(self._cache.keys()) + list(self._weak_cache.keys())
+
+    def values(self):
+        return [value[0] for value in self._cache.values()] + \
+            list(self._weak_cache.values())
+
+    def items(self):
+        return [(key, value[0]) for key, value in self._cache.items()] + \
+            list(self._weak_cache.items())
+
+    def __len__(self):
+        return len(self._cache) + len(self._weak_cache)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __reversed__(self):
+        return reversed(self.keys())
@@ -0,0 +1,278 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+"""
+A process wide registry of `MongoClient` instances
+
+All storages that connect to the same URL share a single client and with it
+its connection pool and server monitor threads. URLs starting with
+`sqlite://` give a `SQLiteClient` for an embedded database instead. A
+`MongoClient` must not be used across a `fork`, so a child process that asks
+for a client gets a new one and never touches the ones of its parent.
+"""
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import threading
+
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from .advisor import IndexAdvisor
+from .sqlite import SQLiteClient
+
+logger = logging.getLogger(__name__)
+
+# the keyword arguments used to create new clients
+client_options = {
+    'maxPoolSize': 100,
+    'connectTimeoutMS': 20000,
+    'serverSelectionTimeoutMS': 30000
+}
+
+_lock = threading.Lock()
+_clients = {}
+_counters = {}
+_pid = os.getpid()
+_advisor = None
+
+
+class PoolCounter(ConnectionPoolListener):
+    """
+    Count the connection pool events of a client
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.check_out_failed = 0
+        self.cleared = 0
+
+    @property
+    def open(self):
+        """
+        int : the number of connections currently open
+        """
+        return self.created - self.closed
+
+    @property
+    def in_use(self):
+        """
+        int : the number of connections currently checked out
+        """
+        return self.checked_out - self.checked_in
+
+    @property
+    def stats(self):
+        return {
+            'created': self.created,
+            'closed': self.closed,
+            'open': self.open,
+            'in_use': self.in_use,
+            'checked_out': self.checked_out,
+            'check_out_failed': self.check_out_failed,
+            'cleared': self.cleared
+        }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.check_out_failed += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_in += 1
+
+
+def _check_pid():
+    # forget the clients of the parent process after a fork. They are not
+    # closed, since their sockets and threads belong to the parent
+    global _pid, _lock
+
+    pid = os.getpid()
+    if pid != _pid:
+        _pid = pid
+        _lock = threading.Lock()
+        _clients.clear()
+        _counters.clear()
+
+
+def set_client_options(**kwargs):
+    """
+    Set the options used to create new clients
+
+    Clients that already exist are not changed, use `close_clients` to
+    recreate them.
+
+    Parameters
+    ----------
+    kwargs : dict
+        keyword arguments passed to `MongoClient`, e.g. `maxPoolSize` or
+        `serverSelectionTimeoutMS`
+    """
+    client_options.update(kwargs)
+
+
+def enable_index_advisor(slow_ms=10.0):
+    """
+    Watch the queries of new clients with an `IndexAdvisor`
+
+    Only clients created afterwards report to the advisor, use
+    `close_clients` before to include the storages of this process that
+    are already open. Embedded SQLite databases are not monitored.
+
+    Parameters
+    ----------
+    slow_ms : float
+        commands that take longer than this are counted as slow
+
+    Returns
+    -------
+    `mongodb.advisor.IndexAdvisor`
+        the advisor that collects the query shapes
+    """
+    global _advisor
+
+    if _advisor is None:
+        _advisor = IndexAdvisor(slow_ms)
+    else:
+        _advisor.slow_ms = slow_ms
+
+    return _advisor
+
+
+def disable_index_advisor():
+    """
+    Stop adding the `IndexAdvisor` to new clients
+    """
+    global _advisor
+
+    _advisor = None
+
+
+def get_client(url):
+    """
+    Return the shared client for a mongodb URL
+
+    Parameters
+    ----------
+    url : str
+        the mongodb URL, e.g. `mongodb://localhost:27017/` or the URL of
+        an SQLite file, e.g. `sqlite:///path/to/file.db`
+
+    Returns
+    -------
+    `pymongo.MongoClient` or `mongodb.sqlite.SQLiteClient`
+        the client for this process. Do not close it, use `close_clients`
+    """
+    _check_pid()
+
+    client = _clients.get(url)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(url)
+        if client is None and url.startswith('sqlite://'):
+            client = SQLiteClient.from_url(url)
+            _clients[url] = client
+
+        elif client is None:
+            counter = PoolCounter()
+            listeners = [counter]
+            if _advisor is not None:
+                listeners.append(_advisor)
+
+            # connect lazily, so a client created before a fork is never
+            # connected in the parent
+            client = MongoClient(
+                url, connect=False, event_listeners=listeners,
+                **client_options)
+            _clients[url] = client
+            _counters[url] = counter
+
+            logger.debug('Created MongoClient for %s' % url)
+
+    return client
+
+
+def close_clients():
+    """
+    Close all clients of this process
+
+    """
+    _check_pid()
+
+    with _lock:
+        for client in _clients.values():
+            client.close()
+
+        _clients.clear()
+        _counters.clear()
+
+
+def pool_stats():
+    """
+    Return the connection pool statistics of all clients
+
+    Returns
+    -------
+    dict of str, dict
+        for each URL the number of open, used and created connections
+    """
+    _check_pid()
+
+    return {
+        url: dict(
+            counter.stats,
+            max_pool_size=_clients[url].options.pool_options.max_pool_size)
+        for url, counter in _counters.items()}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_check_pid)
+
+atexit.register(close_clients)
@@ -32,16 +32,18 @@ import importlib
 import numpy as np
 import math
 import abc
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import six
 import ujson
+from bson.binary import Binary
 
 import marshal
 import types
 import opcode
 
 from .base import StorableMixin, long_t
+from .proxy import LoaderProxy
 
 __author__ = 'Jan-Hendrik Prinz'
 
@@ -64,6 +66,10 @@ class ObjectJSON(object):
         np.uint8, np.uint16, np.uint32, np.uint64,
     ]
 
+    # builtin types that are stored as they are, so the encoder can be skipped
+    primitive_types = frozenset([
+        str, six.text_type, int, long_t, bool, type(None)])
+
     safe_modules = [
         'numpy',
         'math',
@@ -81,10 +87,13 @@ class ObjectJSON(object):
         self.allowed_storable_types = dict()
         self.type_names = {}
         self.type_classes = {}
+        self._encoders = {}
+        self._decoders = {}
 
         self.update_class_list()
 
     def update_class_list(self):
+        self._decoders = {}
         self.class_list = StorableMixin.objects()
         self.type_names = {
             cls.__name__: cls for cls in self.allowed_storable_atomic_types}
@@ -99,31 +108,55 @@ class ObjectJSON(object):
         }
 
     def simplify(self, obj, base_type=''):
-        if obj.__class__.__name__ == 'module':
-            # store an imported module
-            if obj.__name__.split('.')[0] in self.safe_modules:
-                return {'_import': obj.__name__}
-            else:
-                raise RuntimeError((
-                    'The module reference "%s" you want to store is '
-                    'not allowed!') % obj.__name__)
-
-        elif type(obj) is type or type(obj) is abc.ABCMeta:
-            # store a storable number type
-            if obj in self.type_classes:
-                return {'_type': obj.__name__}
-            else:
-                return None
+        try:
+            encoder = self._encoders[obj.__class__]
+        except KeyError:
+            encoder = self._create_encoder(obj.__class__)
+            self._encoders[obj.__class__] = encoder
 
-        elif type(obj) is float and math.isinf(obj):
-            return {
-                '_float': str(obj)}
+        return encoder(obj, base_type)
 
-        elif type(obj) is int and math.isinf(obj):
-            return {
-                '_integer': str(obj)}
+    def reset_serializers(self):
+        """
+        Remove all cached per class encoders and decoders
+
+        Needs to be called if the rules for a class change, e.g. when new
+        stores are added to a storage
+        """
+        self._encoders = {}
+        self._decoders = {}
+
+    def _create_encoder(self, cls):
+        """
+        Return a function that simplifies instances of exactly class `cls`
+
+        All checks that only depend on the class are done once here, so
+        the returned function only contains the steps needed for `cls`.
+        Values of `primitive_types` inside containers do not use an
+        encoder at all. The fields of objects with `to_dict` are not part
+        of the plan, since `to_dict` can return different fields for each
+        instance.
+
+        Parameters
+        ----------
+        cls : type
+            the class of the objects to be simplified
+
+        Returns
+        -------
+        callable
+            function(obj, base_type) returning the simplified object
+        """
+        if cls.__name__ == 'module':
+            return self._simplify_module
+
+        elif cls is type or cls is abc.ABCMeta:
+            return self._simplify_type
 
-        elif obj.__class__.__module__ not in ('__builtin__', 'builtins'):
+        elif cls is float:
+            return self._simplify_float
+
+        elif cls.__module__ not in ('__builtin__', 'builtins'):
             # if obj.__class__ is units.Quantity:
             #     # This is number with a unit so turn it into a list
             #     if self.unit_system is not None:
@@ -138,71 +171,195 @@ class ObjectJSON(object):
             #             '_value': self.simplify(obj / obj.unit, base_type),
             #             '_units': self.unit_to_dict(obj.unit)
             #         }
-            if obj.__class__ is np.ndarray:
-                # this is maybe not the best way to store large numpy arrays!
-                return {
-                    '_numpy': self.simplify(obj.shape),
-                    '_dtype': str(obj.dtype),
-                    '_data': base64.b64encode(obj.copy(order='C'))
-                }
-            elif hasattr(obj, 'to_dict'):
+            if cls is np.ndarray:
+                return lambda obj, base_type: self.simplify_array(obj)
+            elif hasattr(cls, 'to_dict'):
                 # the object knows how to dismantle itself into a json string
-                if hasattr(obj, '__uuid__'):
-                    return {
-                        '_cls': obj.__class__.__name__,
-                        '_obj_uuid': str(UUID(int=obj.__uuid__)),
-                        '_dict': self.simplify(obj.to_dict(), base_type)}
-                else:
-                    return {
-                        '_cls': obj.__class__.__name__,
-                        '_dict': self.simplify(obj.to_dict(), base_type)}
-            elif type(obj) is UUID:
-                return {
+                return self._create_to_dict_encoder(cls)
+            elif cls is UUID:
+                return lambda obj, base_type: {
                     '_uuid': str(UUID(int=obj))}
 
             # we will convert numpy scalars to python scalar (and cross fingers)
-            elif isinstance(obj, np.bool_):
-                return bool(obj)
-            elif isinstance(obj, np.int_):
-                return int(obj)
-            elif isinstance(obj, np.float_):
+            elif issubclass(cls, np.bool_):
+                return lambda obj, base_type: bool(obj)
+            elif issubclass(cls, np.int_):
+                return lambda obj, base_type: int(obj)
+            elif issubclass(cls, np.float64):
                 # todo: this might be dangerous - potential loss of accuracy
-                return float(obj)
+                return lambda obj, base_type: float(obj)
             else:
-                return None
-        elif type(obj) is list:
-            return [self.simplify(o, base_type) for o in obj]
-        elif type(obj) is tuple:
-            return {'_tuple': [self.simplify(o, base_type) for o in obj]}
-        elif type(obj) is dict:
-            # we want to support storable objects as keys so we need to wrap
-            # dicts with care and store them using tuples
-
-            simple = [
-                key for key in obj.keys()
-                if type(key) is str or type(key) is int]
-
-            if len(simple) < len(obj):
-                # other keys than int or str
-                result = {
-                    '_dict': [
-                        self.simplify(tuple([key, o]))
-                        for key, o in obj.items()
-                        if key not in self.excluded_keys
-                    ]}
-            else:
-                result = {
-                    key: self.simplify(o) for key, o in obj.items()
-                    if key not in self.excluded_keys
-                }
+                return lambda obj, base_type: None
+
+        elif cls is list:
+            return self._simplify_list
+        elif cls is tuple:
+            return lambda obj, base_type: {
+                '_tuple': self._simplify_list(obj, base_type)}
+        elif cls is dict:
+            return self._simplify_dict
+        elif cls is slice:
+            return lambda obj, base_type: {
+                '_slice': [obj.start, obj.stop, obj.step]}
+        else:
+            return lambda obj, base_type: obj
 
-            return result
-        elif type(obj) is slice:
+    def _simplify_module(self, obj, base_type=''):
+        # store an imported module
+        if obj.__name__.split('.')[0] in self.safe_modules:
+            return {'_import': obj.__name__}
+        else:
+            raise RuntimeError((
+                'The module reference "%s" you want to store is '
+                'not allowed!') % obj.__name__)
+
+    def _simplify_type(self, obj, base_type=''):
+        # store a storable number type
+        if obj in self.type_classes:
+            return {'_type': obj.__name__}
+        else:
+            return None
+
+    @staticmethod
+    def _simplify_float(obj, base_type=''):
+        if math.isinf(obj):
             return {
-                '_slice': [obj.start, obj.stop, obj.step]}
+                '_float': str(obj)}
+
+        return obj
+
+    def _create_to_dict_encoder(self, cls):
+        name = cls.__name__
+        simplify_dict = self._simplify_dict
+
+        def simplify_to_dict(obj, base_type=''):
+            dct = obj.to_dict()
+            if type(dct) is dict:
+                simple = simplify_dict(dct, base_type)
+            else:
+                simple = self.simplify(dct, base_type)
+
+            if hasattr(obj, '__uuid__'):
+                return {
+                    '_cls': name,
+                    '_obj_uuid': str(UUID(int=obj.__uuid__)),
+                    '_dict': simple}
+            else:
+                return {
+                    '_cls': name,
+                    '_dict': simple}
+
+        return simplify_to_dict
+
+    def _simplify_list(self, obj, base_type=''):
+        primitive = self.primitive_types
+        return [
+            o if o.__class__ in primitive else self.simplify(o, base_type)
+            for o in obj]
+
+    def _simplify_dict(self, obj, base_type=''):
+        # we want to support storable objects as keys so we need to wrap
+        # dicts with care and store them using tuples
+
+        simple = [
+            key for key in obj.keys()
+            if type(key) is str or type(key) is int]
+
+        if len(simple) < len(obj):
+            # other keys than int or str
+            result = {
+                '_dict': [
+                    self.simplify(tuple([key, o]))
+                    for key, o in obj.items()
+                    if key not in self.excluded_keys
+                ]}
         else:
-            oo = obj
-            return oo
+            primitive = self.primitive_types
+            result = {
+                key: o if o.__class__ in primitive else self.simplify(o)
+                for key, o in obj.items()
+                if key not in self.excluded_keys
+            }
+
+        return result
+
+    def simplify_array(self, obj):
+        """
+        Turn a numpy array into a JSON compatible dict
+
+        Parameters
+        ----------
+        obj : `numpy.ndarray`
+            the array to be stored
+
+        Returns
+        -------
+        dict
+            the shape, the dtype and the base64 encoded data of the array
+        """
+        # this is maybe not the best way to store large numpy arrays!
+        return {
+            '_numpy': self.simplify(obj.shape),
+            '_dtype': str(obj.dtype),
+            '_data': base64.b64encode(obj.copy(order='C')).decode('ascii')
+        }
+
+    def build_array(self, obj):
+        """
+        Rebuild a numpy array from the dict created by `simplify_array`
+
+        Parameters
+        ----------
+        obj : dict
+            the simplified array
+
+        Returns
+        -------
+        `numpy.ndarray`
+            the (read-only) array
+        """
+        return np.frombuffer(
+            base64.b64decode(obj['_data']),
+            dtype=np.dtype(obj['_dtype'])).reshape(
+                self.build(obj['_numpy'])
+        )
+
+    def _create_decoder(self, name):
+        """
+        Return a function that builds objects of the class named `name`
+
+        Parameters
+        ----------
+        name : str
+            the name of the class as stored in `_cls`
+
+        Returns
+        -------
+        callable
+            function(obj) returning the object built from the simplified dict
+        """
+        if name not in self.class_list:
+            self.update_class_list()
+            if name not in self.class_list:
+                # updating did not help, so there is nothing we can do.
+                raise ValueError((
+                    'Cannot create obj of class `%s`.\n' +
+                    'Class is not registered as creatable! '
+                    'You might have to define\n' +
+                    'the class locally and call '
+                    '`update_storable_classes()` on your storage.') %
+                    name)
+
+        from_dict = self.class_list[name].from_dict
+
+        def decoder(obj):
+            ret = from_dict(self.build(obj['_dict']))
+            if '_obj_uuid' in obj:
+                ret.__uuid__ = int(UUID(obj['_obj_uuid']))
+
+            return ret
+
+        return decoder
 
     @staticmethod
     def _unicode2str(s):
@@ -218,15 +375,20 @@ class ObjectJSON(object):
             #     return self.build(
             #         obj['_value']) * self.unit_from_dict(obj['_units'])
 
-            if '_slice' in obj:
+            if '_cls' in obj and '_dict' in obj:
+                try:
+                    decoder = self._decoders[obj['_cls']]
+                except KeyError:
+                    decoder = self._create_decoder(obj['_cls'])
+                    self._decoders[obj['_cls']] = decoder
+
+                return decoder(obj)
+
+            elif '_slice' in obj:
                 return slice(*obj['_slice'])
 
             elif '_numpy' in obj:
-                return np.frombuffer(
-                    base64.b64decode(obj['_data']),
-                    dtype=np.dtype(obj['_dtype'])).reshape(
-                        self.build(obj['_numpy'])
-                )
+                return self.build_array(obj)
 
             elif '_float' in obj:
                 return float(str(obj['_float']))
@@ -237,29 +399,6 @@ class ObjectJSON(object):
             elif '_uuid' in obj:
                 return int(UUID(obj['_uuid']))
 
-            elif '_cls' in obj and '_dict' in obj:
-                if obj['_cls'] not in self.class_list:
-                    self.update_class_list()
-                    if obj['_cls'] not in self.class_list:
-                        # updating did not help, so there is nothing we can do.
-                        raise ValueError((
-                            'Cannot create obj of class `%s`.\n' +
-                            'Class is not registered as creatable! '
-                            'You might have to define\n' +
-                            'the class locally and call '
-                            '`update_storable_classes()` on your storage.') %
-                            obj['_cls'])
-
-                attributes = self.build(obj['_dict'])
-                ret = self.class_list[obj['_cls']].from_dict(attributes)
-                if '_obj_uuid' in obj:
-                    # vals = {x: getattr(ret, x) for x in ret._find_by}
-                    ret.__uuid__ = int(UUID(obj['_obj_uuid']))
-                    # for k,v in vals.iteritems():
-                    #     setattr(ret, )
-
-                return ret
-
             elif '_tuple' in obj:
                 return tuple([self.build(o) for o in obj['_tuple']])
 
@@ -556,33 +695,205 @@ class ObjectJSON(object):
             if hasattr(obj, key):
                 dct[key] = self.simplify(getattr(obj, key))
 
+        dct.update(obj.query_fields())
+
         return dct
 
 
 class UUIDObjectJSON(ObjectJSON):
+    """
+    A simplifier that stores references to objects in a `MongoDBStorage`
+
+    Numpy arrays in documents are stored as BSON binary data and arrays
+    larger than `gridfs_array_threshold` bytes in the `arrays` GridFS of the
+    storage. JSON strings (e.g. the payloads of a `FileStore`) cannot hold
+    binary data, so there arrays larger than `json_array_threshold` bytes
+    are stored in GridFS and smaller ones base64 encoded. If
+    `binary_arrays` is False all arrays are stored base64 encoded.
+
+    Arrays in GridFS belong to a single document and need to be removed with
+    `delete_arrays` when the document is removed.
+    """
+
+    # arrays with more bytes are stored in GridFS instead of the document
+    gridfs_array_threshold = 1 << 20
+    # arrays with more bytes are stored in GridFS instead of a JSON string
+    json_array_threshold = 1 << 12
+
     def __init__(self, storage, unit_system=None):
         super(UUIDObjectJSON, self).__init__(unit_system)
         self.excluded_keys = ['json']
         self.storage = storage
+        self.binary_arrays = True
+        self._array_grid = None
+        self._json = False
 
-    def simplify(self, obj, base_type=''):
-        if obj is self.storage:
-            return {'_storage': 'self'}
+    @property
+    def array_grid(self):
+        """
+        Return the GridFS that holds large numpy arrays
+
+        Returns
+        -------
+        `gridfs.GridFS`
+        """
+        if self._array_grid is None:
+            self._array_grid = self.storage.create_grid('arrays')
+
+        return self._array_grid
+
+    def simplify_array(self, obj):
+        if not self.binary_arrays:
+            return super(UUIDObjectJSON, self).simplify_array(obj)
+
+        data = np.ascontiguousarray(obj)
+        if self._json:
+            threshold = self.json_array_threshold
+        else:
+            threshold = self.gridfs_array_threshold
+
+        if data.nbytes <= threshold and self._json:
+            return super(UUIDObjectJSON, self).simplify_array(data)
+
+        dct = {
+            '_numpy': self.simplify(obj.shape),
+            '_dtype': str(obj.dtype)
+        }
+
+        if data.nbytes > threshold:
+            # a string id can be used in JSON as well
+            dct['_gridfs'] = self.array_grid.put(
+                data.tobytes(), _id=str(uuid4()))
+        else:
+            dct['_binary'] = Binary(data.tobytes())
+
+        return dct
+
+    @staticmethod
+    def array_ids(simplified):
+        """
+        Return the GridFS ids of all arrays in a simplified object
+
+        Parameters
+        ----------
+        simplified : dict or list
+            a stored document or a decoded JSON string
+
+        Returns
+        -------
+        list
+            the `_id` of each array in the `arrays` GridFS
+        """
+        found = []
+        stack = [simplified]
+        while stack:
+            obj = stack.pop()
+            if type(obj) is dict:
+                if '_gridfs' in obj and '_numpy' in obj:
+                    found.append(obj['_gridfs'])
+                else:
+                    stack.extend(obj.values())
+            elif type(obj) is list:
+                stack.extend(obj)
+
+        return found
+
+    def delete_arrays(self, simplified):
+        """
+        Remove the arrays of a simplified object from GridFS
+
+        Parameters
+        ----------
+        simplified : dict or list
+            a stored document or a decoded JSON string
+
+        Returns
+        -------
+        int
+            the number of removed arrays
+        """
+        ids = self.array_ids(simplified)
+        for _id in ids:
+            self.array_grid.delete(_id)
+
+        return len(ids)
+
+    def build_array(self, obj):
+        if '_binary' in obj:
+            data = obj['_binary']
+        elif '_gridfs' in obj:
+            data = self.array_grid.get(obj['_gridfs']).read()
+        else:
+            return super(UUIDObjectJSON, self).build_array(obj)
+
+        return np.frombuffer(data, dtype=np.dtype(obj['_dtype'])).reshape(
+            self.build(obj['_numpy']))
+
+    def to_json(self, obj, base_type=''):
+        json, self._json = self._json, True
+        try:
+            return super(UUIDObjectJSON, self).to_json(obj, base_type)
+        finally:
+            self._json = json
+
+    def to_json_object(self, obj):
+        json, self._json = self._json, True
+        try:
+            return super(UUIDObjectJSON, self).to_json_object(obj)
+        finally:
+            self._json = json
 
-        if obj.__class__.__module__ not in ('__builtin__', 'builtins'):
-            if obj.__class__ in self.storage._obj_store:
-                if not obj._ignore:
-                    store = self.storage._obj_store[obj.__class__]
+    def _create_encoder(self, cls):
+        encoder = super(UUIDObjectJSON, self)._create_encoder(cls)
+
+        if cls is self.storage.__class__:
+            def encode_storage(obj, base_type):
+                if obj is self.storage:
+                    return {'_storage': 'self'}
+
+                return encoder(obj, base_type)
+
+            return encode_storage
+
+        if cls.__module__ not in ('__builtin__', 'builtins') and \
+                cls in self.storage._obj_store:
+            store = self.storage._obj_store[cls]
+            # build a proxy instead of loading the object
+            lazy = getattr(cls, '_load_lazy', False)
+
+            def encode_reference(obj, base_type):
+                if type(obj) is LoaderProxy:
+                    if obj._store is not store:
+                        store.save(obj)
+
+                elif obj._ignore:
+                    return encoder(obj, base_type)
+
+                elif obj.__store__ is not store:
                     store.save(obj)
-                    return {
-                        '_hex_uuid': hex(obj.__uuid__),
-                        '_store': store.name
-                        }
 
-        return super(UUIDObjectJSON, self).simplify(obj, base_type)
+                # objects that were saved or loaded by `store` are clean,
+                # since only sync variables can change and these are
+                # written to the DB directly, so a reference is enough
+                ref = {
+                    '_hex_uuid': hex(obj.__uuid__),
+                    '_store': store.name
+                    }
+                if lazy:
+                    ref['_lazy'] = True
+
+                return ref
+
+            return encode_reference
+
+        return encoder
 
     def build(self, obj, builder=None):
-        if type(obj) is dict:
+        if type(obj) is not dict or '_cls' in obj:
+            # avoid the checks for references for the most common cases
+            return ObjectJSON.build(self, obj)
+
+        else:
             if '_storage' in obj:
                 if obj['_storage'] == 'self':
                     return self.storage
@@ -597,7 +908,10 @@ class UUIDObjectJSON(ObjectJSON):
                 store = self.storage._stores[obj['_store']]
                 _long = long_t(obj['_hex_uuid'], 16)
 
-                if builder and builder.__uuid__ == _long:
+                if obj.get('_lazy'):
+                    result = LoaderProxy(store, _long)
+
+                elif builder and builder.__uuid__ == _long:
                     result = builder
 
                 else:
@@ -610,6 +924,15 @@ class UUIDObjectJSON(ObjectJSON):
 
                 return result
 
+            elif '_hex_uuid' in obj:
+                # a reference without store is found by the routing index
+                _long = long_t(obj['_hex_uuid'], 16)
+
+                if builder and builder.__uuid__ == _long:
+                    return builder
+
+                return self.storage.load(_long)
+
         return super(UUIDObjectJSON, self).build(obj)
 
 
@@ -1,9 +1,11 @@
 from __future__ import absolute_import, print_function
 
 import logging
-import gridfs
+import time
 from uuid import UUID
 
+import ujson
+
 from .base import StorableMixin, long_t
 from .object import ObjectStore
 from .proxy import LoaderProxy
@@ -12,17 +14,81 @@ logger = logging.getLogger(__name__)
 
 
 class FileStore(ObjectStore):
+    """
+    A store that keeps the objects as JSON files in GridFS
+
+    Each file has a small metadata document (name, `_time`, `_saved`, size
+    and the `_find_by` fields) in the collection of the store. Counts,
+    membership, name lookups and ordering only use these documents and
+    GridFS is only accessed to read and write the payloads.
+    """
+
+    # the metadata does not contain the content of the objects
+    queryable = False
 
     def __init__(self, name, content_class):
         super(FileStore, self).__init__(name, content_class)
         self.grid = None
 
     def initialize(self):
-        self.grid = gridfs.GridFS(self.storage.db)
+        self.grid = self.storage.create_grid()
+        self._create_metadata_indices()
         self._created = True
 
     def restore(self):
-        self.grid = gridfs.GridFS(self.storage.db)
+        self.grid = self.storage.create_grid()
+        self._create_metadata_indices()
+        self._migrate_metadata()
+        self.load_indices()
+
+    def _create_metadata_indices(self):
+        for key in ['_saved', '_time', 'name'] + list(self._find_by):
+            self._document.create_index(key)
+
+    def _metadata(self, obj, size):
+        dct = {
+            '_id': str(UUID(int=obj.__uuid__)),
+            '_time': int(obj.__time__),
+            '_saved': time.time(),
+            'size': size
+        }
+
+        if hasattr(obj, 'name'):
+            dct['name'] = obj.name
+
+        for key in self._find_by:
+            dct[key] = self.storage.simplifier.simplify(getattr(obj, key))
+
+        return dct
+
+    def _migrate_metadata(self):
+        """
+        Create the missing metadata documents for files stored without them
+        """
+        if self._document.count() >= self.grid.find().count():
+            return
+
+        known = set(
+            dct['_id'] for dct in self._document.find({}, {'_id': True}))
+
+        for f in self.grid.find():
+            # ids are stored as `hex(uuid)`, which has a trailing L in py2
+            _id = str(UUID(int=long_t(f._id.rstrip('L'), 16)))
+            if _id not in known:
+                dct = {
+                    '_id': _id,
+                    '_time': int(getattr(f, '_time', 0)),
+                    '_saved': time.time(),
+                    'size': f.length
+                }
+                if f.filename is not None:
+                    dct['name'] = f.filename
+
+                for key in self._find_by:
+                    if hasattr(f, key):
+                        dct[key] = getattr(f, key)
+
+                self._document.insert_one(dct)
 
     def consume_one(self, test_fnc=None):
         raise NotImplementedError()
@@ -33,18 +99,21 @@ class FileStore(ObjectStore):
     def modify_test_one(self, test_fnc, key, value, update):
         raise NotImplementedError()
 
-    def load_indices(self):
-        self.index = [long_t(x, 16) for x in self.grid.list()]
+    def claim_one(self, query, key, value, update):
+        raise NotImplementedError()
 
-    def __len__(self):
-        if self.grid:
-            return len(list(self.grid.find()))
+    def resolve_pending(self, query, key, value, pending='_pending'):
+        raise NotImplementedError()
 
-        return 0
+    def remove_pending(self, obj, pending='_pending'):
+        raise NotImplementedError()
 
     def _load(self, idx):
         _id = hex(idx)
         f = self.grid.find_one({'_id': _id})
+        return self._from_grid_out(f, idx)
+
+    def _from_grid_out(self, f, idx):
         obj = self.storage.simplifier.from_json(f.read())
         obj.__store__ = self
         obj.__uuid__ = idx
@@ -52,6 +121,23 @@ class FileStore(ObjectStore):
 
         return obj
 
+    def _load_many(self, idxs):
+        # one query for all file documents, the payloads are still read
+        # file by file from the chunks collection
+        ids = {hex(idx): idx for idx in idxs}
+
+        loaded = {}
+        for f in self.grid.find({'_id': {'$in': list(ids)}}):
+            idx = ids[f._id]
+            obj = self.cache.get(idx)
+            if obj is None:
+                obj = self._from_grid_out(f, idx)
+                self.cache[idx] = obj
+
+            loaded[idx] = obj
+
+        return loaded
+
     def cache_all(self):
         pass
 
@@ -59,21 +145,30 @@ class FileStore(ObjectStore):
         _id = hex(obj.__uuid__)
 
         s = self.storage.simplifier.to_json_object(obj)
-        if hasattr(obj, 'name'):
-            self.grid.put(
-                s,
-                filename=obj.name,
-                _id=_id,
-                _time=obj.__time__,
-                encoding='utf8',
-                **{x: getattr(obj, x) for x in self._find_by})  # add search indices
-        else:
-            self.grid.put(
-                s,
-                _id=_id,
-                _time=obj.__time__,
-                encoding='utf8',
-                **{x: getattr(obj, x) for x in self._find_by})  # add search indices
+        meta = self._metadata(obj, len(s))
+        try:
+            if hasattr(obj, 'name'):
+                self.grid.put(
+                    s,
+                    filename=obj.name,
+                    _id=_id,
+                    _time=obj.__time__,
+                    encoding='utf8',
+                    **{x: getattr(obj, x) for x in self._find_by})  # add search indices
+            else:
+                self.grid.put(
+                    s,
+                    _id=_id,
+                    _time=obj.__time__,
+                    encoding='utf8',
+                    **{x: getattr(obj, x) for x in self._find_by})  # add search indices
+        except Exception:
+            # large arrays were already put into their own GridFS
+            self.storage.simplifier.delete_arrays(ujson.loads(s))
+            raise
+
+        # the payload exists once its metadata can be found
+        self._document.insert_one(meta)
 
         obj.__store__ = self
         return obj
@@ -82,10 +177,6 @@ class FileStore(ObjectStore):
     # LOAD/SAVE DECORATORS FOR CACHE HANDLING
     # ==========================================================================
 
-    def find_one(self, dct):
-        idx = self.grid.find_one(dct)['filename']
-        return self.load(int(UUID(idx)))
-
     def load(self, idx):
         """
         Returns an object from the storage.
@@ -102,7 +193,7 @@ class FileStore(ObjectStore):
         """
 
         if type(idx) is str:
-            idx = long_t(UUID(self.grid.find_one({'filename': idx})['_id']), 16)
+            idx = int(UUID(self._document.find_one({'name': idx})['_id']))
 
         if type(idx) is long_t:
             pass
@@ -117,9 +208,8 @@ class FileStore(ObjectStore):
         try:
             obj = self.cache[idx]
             logger.debug('Found IDX #' + str(idx) + ' in cache. Not loading!')
-            if idx not in self.index:
-                # update cache
-                self.index.append(idx)
+            # update index, a no-op if already present
+            self.index.append(idx)
 
             return obj
 
@@ -140,9 +230,8 @@ class FileStore(ObjectStore):
             # update cache there might have been a change due to naming
             self.cache[idx] = obj
 
-            if idx not in self.index:
-                # update cache
-                self.index.append(idx)
+            # update index, a no-op if already present
+            self.index.append(idx)
 
             logger.debug(
                 'Try loading UUID object of type %s and IDX # %d ... DONE' %
@@ -174,7 +263,8 @@ class FileStore(ObjectStore):
         n_idx = len(self.index)
         self.index.append(uuid)
 
-        q = self.grid.find_one({'_id': hex(uuid)})
+        q = self._document.find_one(
+            {'_id': str(UUID(int=uuid))}, {'_id': True})
 
         if q is not None:
             # exists
@@ -214,35 +304,88 @@ class FileStore(ObjectStore):
 
         return self.reference(obj)
 
-    def __contains__(self, item):
-        uuid = item.__uuid__
-
-        if item.__uuid__ in self.index:
-            return True
-
-        q = self.grid.find_one({'_id': hex(uuid)})
-
-        if q is not None:
-            # exists
-            self.index.append(uuid)
-            return True
-
-        return False
-
 
 class DataDict(StorableMixin):
     """
     Delegate to the contained .data object
+
+    If `data` is a dict, each top-level entry is stored as a separate
+    `DataSection` and only loaded when it is first accessed.
     """
+
+    # switch to `False` to store all data in a single file
+    sectioned = True
+
     def __init__(self, data):
         super(DataDict, self).__init__()
         self.data = data
+        self._sections = {}
+
+    def to_dict(self):
+        data = self.data
+        if self.sectioned and type(data) is dict:
+            data = {key: self._section(key, value)
+                    for key, value in data.items()}
+
+        return {'data': data}
+
+    def _section(self, key, value):
+        if type(value) is LoaderProxy or isinstance(value, DataSection):
+            # a loaded section, the proxy pretends to be a `DataDict`
+            return value
+
+        # keep new sections, so they are stored only once. The dict of the
+        # caller is not changed
+        section = self._sections.get(key)
+        if section is None or section.data is not value:
+            section = DataSection(value)
+            self._sections[key] = section
+
+        return section
 
     def __getitem__(self, item):
-        return self.data[item]
+        value = self.data[item]
+        if hasattr(value, '_idx'):
+            # a not yet loaded section, keep it once loaded
+            value = value.__subject__
+            self.data[item] = value
+
+        if isinstance(value, DataSection):
+            return value.data
+
+        return value
 
     def __contains__(self, item):
         return item in self.data
 
+    def __iter__(self):
+        return iter(self.data)
+
+    def get(self, item, default=None):
+        if item in self.data:
+            return self[item]
+
+        return default
+
+    def keys(self):
+        return list(self.data.keys())
+
+    def values(self):
+        return [self[key] for key in self.data]
+
+    def items(self):
+        return [(key, self[key]) for key in self.data]
+
     def __getattr__(self, item):
         return getattr(self.data, item)
+
+
+class DataSection(DataDict):
+    """
+    A single top-level entry of a `DataDict` that is stored on its own
+
+    References to sections are loaded lazily
+    """
+
+    sectioned = False
+    _load_lazy = True
@@ -0,0 +1,191 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+
+from __future__ import absolute_import
+
+
+class UUIDIndex(object):
+    """
+    An insertion ordered collection of uuids with constant time lookup
+
+    Behaves like the list of uuids used before. Iteration, positional access
+    and slicing keep the insertion order, while membership tests, appending
+    and finding the position of a uuid do not scan the list. Each uuid can
+    only be contained once.
+
+    If a `routes` dict is given, every added uuid is mapped to `target` in it
+    and removed again with the uuid, so several indices can share a single
+    lookup table of which target contains a uuid.
+
+    Parameters
+    ----------
+    iterable : iterable of long or None
+        the initial uuids
+    routes : dict of long : object or None
+        the shared table of uuids and targets to be kept up to date
+    target : object
+        the value stored in `routes` for the uuids of this index
+
+    Examples
+    --------
+    >>> index = UUIDIndex([10, 20])
+    >>> index.append(30)
+    >>> 20 in index
+    True
+    >>> index[-1]
+    30
+    >>> index.get(30)
+    2
+    """
+
+    def __init__(self, iterable=None, routes=None, target=None):
+        self._list = []
+        self._pos = {}
+        self._routes = routes
+        self._target = target
+
+        if iterable is not None:
+            self.extend(iterable)
+
+    def append(self, uuid):
+        """
+        Add a uuid at the end if it is not yet present
+
+        Parameters
+        ----------
+        uuid : long
+            the uuid to be added
+        """
+        if uuid not in self._pos:
+            self._pos[uuid] = len(self._list)
+            self._list.append(uuid)
+            if self._routes is not None:
+                self._routes[uuid] = self._target
+
+    def extend(self, iterable):
+        """
+        Add several uuids at the end. Already present ones are skipped
+
+        Parameters
+        ----------
+        iterable : iterable of long
+            the uuids to be added
+        """
+        for uuid in iterable:
+            self.append(uuid)
+
+    def remove(self, uuid):
+        """
+        Remove a uuid
+
+        This needs to move all later uuids and is linear in their number
+
+        Parameters
+        ----------
+        uuid : long
+            the uuid to be removed
+
+        Raises
+        ------
+        ValueError
+            if the uuid is not present
+        """
+        try:
+            pos = self._pos[uuid]
+        except KeyError:
+            raise ValueError('uuid %s not in index' % uuid)
+
+        del self[pos]
+
+    def get(self, uuid, default=None):
+        """
+        Return the position of a uuid
+
+        Parameters
+        ----------
+        uuid : long
+            the uuid to be found
+        default : object
+            return value if the uuid is not present
+
+        Returns
+        -------
+        int or object
+            the position of the uuid in insertion order or `default`
+        """
+        return self._pos.get(uuid, default)
+
+    def clear(self):
+        self._unroute(self._list)
+        del self._list[:]
+        self._pos.clear()
+
+    def _unroute(self, uuids):
+        if self._routes is not None:
+            for uuid in uuids:
+                if self._routes.get(uuid) is self._target:
+                    del self._routes[uuid]
+
+    def __contains__(self, uuid):
+        return uuid in self._pos
+
+    def __len__(self):
+        return len(self._list)
+
+    def __iter__(self):
+        return iter(self._list)
+
+    def __reversed__(self):
+        return reversed(self._list)
+
+    def __getitem__(self, item):
+        return self._list[item]
+
+    def __delitem__(self, item):
+        if isinstance(item, slice):
+            removed = self._list[item]
+        else:
+            removed = [self._list[item]]
+
+        if not removed:
+            return
+
+        # positions of all uuids behind the first removed one change
+        start = min(self._pos.pop(uuid) for uuid in removed)
+        self._unroute(removed)
+
+        del self._list[item]
+
+        for pos in range(start, len(self._list)):
+            self._pos[self._list[pos]] = pos
+
+    def __eq__(self, other):
+        if isinstance(other, UUIDIndex):
+            return self._list == other._list
+
+        return self._list == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'UUIDIndex(%d uuid(s))' % len(self._list)
@@ -29,11 +29,18 @@ from __future__ import absolute_import, print_function
 import abc
 import logging
 from collections import OrderedDict
+from contextlib import contextmanager
+from uuid import UUID
+
+import gridfs
+
+from .buffer import WriteBuffer
+from .cache import ByteLRUCache, CacheBudget
+from .client import get_client
+from .sqlite import SQLiteDatabase, SQLiteGridFS
 from .dictify import UUIDObjectJSON
 from .object import ObjectStore
 
-from pymongo import MongoClient
-
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +50,15 @@ class MongoDBStorage(object):
     """
     _db_url = 'mongodb://localhost:27017/'
 
+    # stores with few, small and often used objects that are never evicted
+    # when using a cache budget
+    pinned_stores = ['generators', 'configurations', 'resources']
+
+    # the version of the document layout. Storages written with an older
+    # version are migrated when they are opened for writing
+    schema_version = 1
+    meta_collection = 'storage_meta'
+
     @classmethod
     def set_host(cls, host):
         #cls._db_url = cls._db_url.replace('localhost', host)
@@ -135,7 +151,8 @@ class MongoDBStorage(object):
 
         self.mode = mode
 
-        self._client = MongoClient(self._db_url)
+        # all storages of this process share the client of their URL
+        self._client = get_client(self._db_url)
         self._db_name = 'storage-' + filename
 
         self.filename = filename
@@ -143,6 +160,12 @@ class MongoDBStorage(object):
         # this can be set to false to re-store proxies from other stores
         self.exclude_proxy_from_other = False
 
+        # collects sync variable updates while batching
+        self._write_buffer = WriteBuffer()
+
+        # the byte limit of all caches, see `set_cache_budget`
+        self.cache_budget = None
+
         super(MongoDBStorage, self).__init__()
 
         self._setup_class()
@@ -164,6 +187,7 @@ class MongoDBStorage(object):
             # added stores this is often already call inside of _initialize.
             # If not we just make sure
             self.finalize_stores()
+            self._set_stored_schema_version(self.schema_version)
 
             logger.info("Finished setting up netCDF file")
 
@@ -189,6 +213,10 @@ class MongoDBStorage(object):
 
             self._restore_storages()
 
+            if mode != 'r' and \
+                    self.stored_schema_version < self.schema_version:
+                self.migrate()
+
             # only if we have a new style file
             if hasattr(self, 'attributes'):
                 for attribute, store in zip(
@@ -198,28 +226,128 @@ class MongoDBStorage(object):
                     key_store = self.attributes.key_store(attribute)
                     key_store.attribute_list[attribute] = store
 
+    @property
+    def stored_schema_version(self):
+        """
+        int : the version of the document layout of the stored data. 0 for
+        storages created before versions were recorded
+        """
+        dct = self.db[self.meta_collection].find_one({'_id': 'schema'})
+        if dct is None:
+            return 0
+
+        return dct['version']
+
+    def _set_stored_schema_version(self, version):
+        self.db[self.meta_collection].replace_one(
+            {'_id': 'schema'}, {'_id': 'schema', 'version': version},
+            upsert=True)
+
+    def migrate(self):
+        """
+        Update a storage written by an older version
+
+        Runs :meth:`ObjectStore.migrate` for all stores and records the
+        current `schema_version`. Missing indices are created whenever a
+        store is opened.
+
+        Returns
+        -------
+        dict of str : int
+            the number of updated documents for each store
+        """
+        updated = {}
+        for name, store in self._stores.items():
+            updated[name] = store.migrate()
+
+        logger.info('Migrated storage to schema version %d: %s' % (
+            self.schema_version, updated))
+
+        self._set_stored_schema_version(self.schema_version)
+        return updated
+
     def close(self):
         """
-        Close the DB connection
+        Close the storage
+
+        The shared client stays open for other storages of the same URL, see
+        :func:`mongodb.client.close_clients`
 
         """
-        self._client.close()
+        self._write_buffer.stop_timer()
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer all sync variable updates inside a `with` block
+
+        Updates of the same document are merged and all are written with
+        `bulk_write` when the outermost block is left. Sync variables created
+        with `buffered=False` are always written immediately.
+
+        Examples
+        --------
+        >>> with storage.batch():  # doctest: +SKIP
+        ...     worker.seen = time.time()
+        ...     worker.n_tasks = 2
+        """
+        self._write_buffer.enter()
+        try:
+            yield self
+        finally:
+            self._write_buffer.exit()
+
+    def flush(self):
+        """
+        Write all buffered sync variable updates to the DB
+
+        """
+        self._write_buffer.flush()
+
+    def write_behind(self, interval=None):
+        """
+        Buffer sync variable updates and write them in regular intervals
+
+        Parameters
+        ----------
+        interval : float or None
+            the number of seconds between writes. If None, buffering is
+            switched off and all pending updates are written.
+        """
+        if interval is None:
+            self._write_buffer.stop_timer()
+        else:
+            self._write_buffer.start_timer(interval)
+
+    def create_grid(self, collection='fs'):
+        """
+        Return a GridFS instance for the database of the storage
+
+        Parameters
+        ----------
+        collection : str
+            the name of the GridFS collections
+
+        Returns
+        -------
+        `gridfs.GridFS` or `mongodb.sqlite.SQLiteGridFS`
+        """
+        if isinstance(self.db, SQLiteDatabase):
+            return SQLiteGridFS(self.db, collection)
+
+        return gridfs.GridFS(self.db, collection)
 
     def _create_simplifier(self):
         self.simplifier = UUIDObjectJSON(self)
 
     @classmethod
     def list_storages(cls):
-        c = MongoClient(cls._db_url)
-        names = c.database_names()
-        c.close()
+        names = get_client(cls._db_url).database_names()
         return [n[8:] for n in names if n.startswith('storage-')]
 
     @classmethod
     def delete_storage(cls, name):
-        c = MongoClient(cls._db_url)
-        c.drop_database('storage-' + name)
-        c.close()
+        get_client(cls._db_url).drop_database('storage-' + name)
 
     @staticmethod
     def _cmp_version(v1, v2):
@@ -271,6 +399,13 @@ class MongoDBStorage(object):
         self._obj_store = {}
         self._storages_base_cls = {}
 
+        # the store of each known uuid, kept up to date by the store indices
+        self.uuid_routes = {}
+        self.routing_stats = {
+            'routed': 0,
+            'queried': 0
+        }
+
     def create_store(self, store, register_attr=True):
         """
         Create a special variable type `obj.name` that can hold storable objects
@@ -342,6 +477,11 @@ class MongoDBStorage(object):
             self._obj_store.update(
                 {cls: store for cls in store.content_class.descendants()})
 
+            # encoders of these classes now need to create references
+            simplifier = self.__dict__.get('simplifier')
+            if simplifier is not None:
+                simplifier.reset_serializers()
+
     def __repr__(self):
         return "Storage @ '" + self.filename + "'"
 
@@ -445,6 +585,27 @@ class MongoDBStorage(object):
         raise RuntimeWarning("Objects of type '%s' cannot be stored!" %
                              obj.__class__.__name__)
 
+    def refresh(self, objs):
+        """
+        Fetch the current sync variables of many objects at once
+
+        Objects are grouped by their store and each store requests the sync
+        fields of its objects in bulk. See :meth:`ObjectStore.refresh`
+
+        Parameters
+        ----------
+        objs : iterable of :class:`StorableMixin`
+            the stored objects to be refreshed
+        """
+        by_store = {}
+        for obj in objs:
+            store = obj.__store__
+            if store is not None:
+                by_store.setdefault(store.name, (store, []))[1].append(obj)
+
+        for store, group in by_store.values():
+            store.refresh(group)
+
     def __contains__(self, item):
         if type(item) is list:
             # a list of objects will be stored one by one
@@ -481,19 +642,88 @@ class MongoDBStorage(object):
         this only works in storages with uuids otherwise load directly from the
         sub-stores
         """
+        if isinstance(uuid, UUID):
+            uuid = int(uuid)
+
+        store = self.route(uuid)
+        if store is None:
+            raise KeyError("UUID %s not found in storage" % uuid)
+
+        return store[uuid]
+
+    def route(self, uuid):
+        """
+        Return the store that contains an object
+
+        Known uuids are looked up in `uuid_routes`. Otherwise the stores are
+        asked for a document with this id, one after the other, and the
+        uuid is added to the index of the store that has it
+
+        Parameters
+        ----------
+        uuid : long
+            the uuid of the object
+
+        Returns
+        -------
+        :class:`mongodb.ObjectStore` or None
+            the store that contains the object or None if there is none
+        """
+        store = self.uuid_routes.get(uuid)
+        if store is not None and uuid in store.index:
+            self.routing_stats['routed'] += 1
+            return store
+
+        self.routing_stats['queried'] += 1
+        idx = str(UUID(int=uuid))
+        for store in self._stores.values():
+            if store._document.find_one({'_id': idx}, {'_id': True}):
+                store.index.append(uuid)
+                return store
 
-        for store in self.objects.values():
-            if uuid in store.index:
-                return store[uuid]
+        return None
 
-        # need to update
-        for store in self.objects.values():
-            store.check_size()
-            if uuid in store.index:
-                return store[uuid]
+    def set_cache_budget(self, max_bytes, store_max_bytes=None, pinned=None):
+        """
+        Replace the caches of all stores by caches limited in bytes
 
-        # nothing found.
-        raise KeyError("UUID %s not found in storage" % uuid)
+        Parameters
+        ----------
+        max_bytes : int
+            the maximal estimated number of bytes held by all caches together
+        store_max_bytes : int or dict of str : int or None
+            the limit for each store or a dict with the limits of some stores
+            by store name. If None only the total limit applies.
+        pinned : list of str or None
+            the names of stores whose objects are never evicted. If None
+            `pinned_stores` is used.
+
+        Returns
+        -------
+        `CacheBudget`
+            the budget shared by all caches
+        """
+        if pinned is None:
+            pinned = self.pinned_stores
+
+        budget = CacheBudget(max_bytes)
+
+        for name, store in self.objects.items():
+            if name == 'stores':
+                # the stores themselves stay cached
+                continue
+
+            if isinstance(store_max_bytes, dict):
+                limit = store_max_bytes.get(name)
+            else:
+                limit = store_max_bytes
+
+            store.set_caching(
+                ByteLRUCache(limit, budget, pinned=name in pinned))
+
+        self.cache_budget = budget
+
+        return budget
 
     def cache_image(self):
         """
@@ -529,6 +759,9 @@ class MongoDBStorage(object):
                 'size_strong': size[0],
                 'size_weak': size[1],
             }
+            if hasattr(store.cache, 'stats'):
+                profile.update(store.cache.stats)
+
             total_strong += count[0]
             total_weak += count[1]
             total_file += len(store)
@@ -546,4 +779,7 @@ class MongoDBStorage(object):
         image['file'] = total_file
         image['index'] = total_index
 
+        if self.cache_budget is not None:
+            image['budget'] = self.cache_budget.stats
+
         return image
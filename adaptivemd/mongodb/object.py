@@ -27,17 +27,20 @@
 from __future__ import absolute_import, print_function
 
 import logging
+import time
 from uuid import UUID
 from weakref import WeakValueDictionary
 
-from numpy.random import randint
-
 import six
+from pymongo import UpdateOne
 
 from .base import StorableMixin, long_t
+from .buffer import modified_key
 from .cache import MaxCache, Cache, NoCache, \
     WeakLRUCache
+from .index import UUIDIndex
 from .proxy import LoaderProxy
+from .syncvar import SyncVariable, sync_projection, sync_variables
 
 logger = logging.getLogger(__name__)
 
@@ -69,9 +72,28 @@ class ObjectStore(StorableMixin):
         'index', 'length', 'uuid'
     ]
 
+    # the stored documents contain `_cls`, `_dict` and the sync variables
+    # and can be used by `find` and `count` queries
+    queryable = True
+
+    # fields indexed in every store, the `_index_by` fields of the content
+    # classes are added, see `index_keys`
+    default_indices = ['_saved', modified_key, '_time', 'name']
+
     default_store_chunk_size = 256
+    default_load_chunk_size = 256
     default_cache = 10000
 
+    # refresh the index by fetching only ids saved after the newest known one
+    incremental_index = True
+    # seconds a server side count is reused before asking the server again
+    default_count_staleness = 0.5
+    # seconds the incremental refresh looks back to allow for clock skew
+    # between processes saving to the same store
+    index_overlap = 5.0
+    # seconds the sync variables of an object are served from the last fetch
+    default_sync_staleness = 0.5
+
     def __init__(self, name, content_class):
         """
 
@@ -108,6 +130,19 @@ class ObjectStore(StorableMixin):
 
         self.index = None
 
+        self.count_staleness = self.default_count_staleness
+        self.sync_staleness = self.default_sync_staleness
+        self._last_count = None
+        self._last_count_time = 0.0
+        self._index_saved = None
+        self.refresh_stats = {
+            'count': 0,
+            'count_cached': 0,
+            'full': 0,
+            'incremental': 0,
+            'fetched': 0
+        }
+
         self.proxy_index = WeakValueDictionary()
 
         if self.content_class is not None \
@@ -125,22 +160,65 @@ class ObjectStore(StorableMixin):
             'name': self.name
         }
 
-    def check_size(self):
+    def check_size(self, force=False):
         """
         Perform an update in case the DB has been extended by an external source
 
+        Parameters
+        ----------
+        force : bool
+            if True the number of stored objects is requested from the server
+            even if the last count is younger than `count_staleness`
+
         Returns
         -------
         bool
             returns True if an update was performed
 
         """
-        if len(self) > len(self.index):
-            self.load_indices()
+        count = self._count(force)
+        if count > len(self.index):
+            if self.incremental_index and self._index_saved is not None:
+                self.update_indices()
+
+                if len(self.index) < count:
+                    # some objects were saved with an older timestamp than
+                    # the look back allows for, so we need the full list
+                    self.load_indices()
+            else:
+                self.load_indices()
+
             return True
 
         return False
 
+    def _count(self, force=False):
+        now = time.time()
+        if force or self._last_count is None or \
+                now - self._last_count_time > self.count_staleness:
+            self._last_count = len(self)
+            self._last_count_time = now
+            self.refresh_stats['count'] += 1
+        else:
+            self.refresh_stats['count_cached'] += 1
+
+        return self._last_count
+
+    @property
+    def refresh_statistics(self):
+        """
+        Return counters about the index refreshes of this store
+
+        Returns
+        -------
+        dict
+            `count` and `count_cached` are the number of server side counts
+            and the number of counts answered from the last one, `full` and
+            `incremental` the number of index reloads of each kind and
+            `fetched` the number of ids received by incremental reloads
+        """
+        return dict(self.refresh_stats)
+
     def register(self, storage):
         """
         Associate the object store to a specific storage with a given name
@@ -157,17 +235,143 @@ class ObjectStore(StorableMixin):
         self.index = self.create_uuid_index()
         self._document = storage.db[self.name]
 
-    @staticmethod
-    def create_uuid_index():
-        return []
+    def create_uuid_index(self):
+        routes = None
+        if self._storage is not None:
+            routes = self._storage.uuid_routes
+
+        return UUIDIndex(routes=routes, target=self)
 
     def restore(self):
+        # creating indices is a write, read-only users cannot do it
+        if self.storage.mode != 'r':
+            self.create_indices()
+
         self.load_indices()
 
+    def _content_classes(self):
+        if self.content_class is None:
+            return []
+
+        return [
+            cls for cls in StorableMixin.objects().values()
+            if issubclass(cls, self.content_class)]
+
+    def index_keys(self):
+        """
+        Return the fields that are indexed in the collection of the store
+
+        Returns
+        -------
+        list of str
+            `default_indices` and the `_index_by` fields of the content
+            class and all its subclasses
+        """
+        keys = list(self.default_indices)
+        for cls in self._content_classes():
+            keys += [key for key in cls._index_by if key not in keys]
+
+        return keys
+
+    def create_indices(self):
+        """
+        Create the missing indices of `index_keys`
+
+        Existing indices are requested once, so opening a store with all
+        indices present costs a single round trip
+        """
+        existing = set(
+            info['key'][0][0]
+            for info in self._document.index_information().values())
+
+        for key in self.index_keys():
+            if key not in existing:
+                self._document.create_index(key)
+
+    def migrate(self):
+        """
+        Update documents written by older versions of the store
+
+        Fields in `_find_by` that are not sync variables were only stored
+        in `_dict` before they were added to `_find_by`. They are copied to
+        the top level of the documents, so they can be queried, sorted and
+        indexed.
+
+        Returns
+        -------
+        int
+            the number of updated documents
+        """
+        updated = 0
+        for cls in self._content_classes():
+            for key in cls._find_by:
+                if key in sync_variables(cls):
+                    continue
+
+                requests = [
+                    UpdateOne(
+                        {'_id': dct['_id']},
+                        {'$set': {key: dct['_dict'][key]}})
+                    for dct in self._document.find(
+                        {
+                            '_cls': cls.__name__,
+                            key: {'$exists': False},
+                            '_dict.' + key: {'$exists': True}
+                        },
+                        {'_dict.' + key: True})]
+
+                for pos in range(
+                        0, len(requests), self.default_store_chunk_size):
+                    self._document.bulk_write(
+                        requests[pos:pos + self.default_store_chunk_size],
+                        ordered=False)
+
+                updated += len(requests)
+
+        return updated
+
     def load_indices(self):
-        # self.index.clear()
-        # self.index.extend(
-        self.index = [int(UUID(x)) for x in self._document.distinct('_id')]
+        """
+        Reload the full index of stored ids from the server
+        """
+        index = self.create_uuid_index()
+        saved = None
+        for dct in self._document.find({}, {'_id': True, '_saved': True}):
+            index.append(int(UUID(dct['_id'])))
+            stamp = dct.get('_saved')
+            if stamp is not None and (saved is None or stamp > saved):
+                saved = stamp
+
+        self.index = index
+        self._index_saved = saved
+        self.refresh_stats['full'] += 1
+
+    def update_indices(self):
+        """
+        Add the ids of objects saved since the last reload to the index
+
+        Only objects that were saved after the newest known object minus
+        `index_overlap` seconds are requested from the server
+        """
+        if self._index_saved is None:
+            self.load_indices()
+            return
+
+        saved = self._index_saved
+        fetched = 0
+        for dct in self._document.find(
+                {'_saved': {'$gte': saved - self.index_overlap}},
+                {'_id': True, '_saved': True}):
+            idx = int(UUID(dct['_id']))
+            if idx not in self.index:
+                self.index.append(idx)
+                fetched += 1
+
+            saved = max(saved, dct['_saved'])
+
+        self._index_saved = saved
+        self.refresh_stats['incremental'] += 1
+        self.refresh_stats['fetched'] += fetched
 
     @property
     def storage(self):
@@ -232,7 +436,13 @@ class ObjectStore(StorableMixin):
             caching = WeakLRUCache(caching)
 
         if isinstance(caching, Cache):
-            self.cache = caching.transfer(self.cache)
+            old_cache = self.cache
+            self.cache = caching.transfer(old_cache)
+
+            budget = getattr(old_cache, 'budget', None)
+            if budget is not None:
+                # the replaced cache no longer counts
+                budget.unregister(old_cache)
 
     def idx(self, obj):
         """
@@ -250,15 +460,18 @@ class ObjectStore(StorableMixin):
             The integer index of the given object or None if it is not
             stored yet
         """
-        return self.index[obj.__uuid__]
+        return self.index.get(obj.__uuid__)
 
     def __iter__(self):
         """
         Add iteration over all elements in the storage
         """
         self.check_size()
-        for uuid in list(self.index):
-            yield self.load(uuid)
+        index = list(self.index)
+        chunk_size = self.default_load_chunk_size
+        for pos in range(0, len(index), chunk_size):
+            for obj in self.load_many(index[pos:pos + chunk_size], chunk_size):
+                yield obj
 
     def __len__(self):
         """
@@ -276,6 +489,53 @@ class ObjectStore(StorableMixin):
 
         return 0
 
+    def count(self, query=None):
+        """
+        Return the number of stored objects matching a query
+
+        Parameters
+        ----------
+        query : dict or None
+            a mongodb query on the stored documents. If None all objects are
+            counted
+
+        Returns
+        -------
+        int
+        """
+        return self._document.count(query)
+
+    def find(self, query, sort=None, limit=0, chunk_size=None):
+        """
+        Iterate over all objects whose documents match a query
+
+        Only the ids of matching documents are requested and the objects
+        are loaded in chunks, cached objects are not fetched again
+
+        Parameters
+        ----------
+        query : dict
+            a mongodb query on the stored documents
+        sort : list of tuple(str, int) or None
+            the fields and directions to sort the documents by on the server
+        limit : int
+            the maximal number of objects, 0 means no limit
+        chunk_size : int or None
+            the maximal number of objects requested in a single query. If None
+            `default_load_chunk_size` is used
+        """
+        if chunk_size is None:
+            chunk_size = self.default_load_chunk_size
+
+        idxs = [
+            int(UUID(dct['_id']))
+            for dct in self._document.find(
+                query, {'_id': True}, sort=sort, limit=limit)]
+
+        for pos in range(0, len(idxs), chunk_size):
+            for obj in self.load_many(idxs[pos:pos + chunk_size], chunk_size):
+                yield obj
+
     def proxy(self, item):
         """
         Return a proxy of a object for this store
@@ -309,7 +569,10 @@ class ObjectStore(StorableMixin):
         if item.__uuid__ in self.index:
             return True
 
-        if self.check_size():
+        # an unknown id might have been saved by another process since the
+        # last count, so a miss is never answered from a reused count. Hits
+        # do not contact the server at all
+        if self.check_size(True):
             if item.__uuid__ in self.index:
                 return True
 
@@ -327,7 +590,7 @@ class ObjectStore(StorableMixin):
             elif type(item) is str or type(item) is long_t:
                 return self.load(item)
             elif type(item) is list:
-                return [self.load(idx) for idx in item]
+                return self.load_many(item, skip_missing=False)
             elif item is Ellipsis:
                 return iter(self)
         except KeyError:
@@ -337,7 +600,7 @@ class ObjectStore(StorableMixin):
         try:
             return self[item]
         except KeyError:
-            if self.check_size():
+            if self.check_size(True):
                 try:
                     return self[item]
                 except KeyError:
@@ -373,9 +636,11 @@ class ObjectStore(StorableMixin):
                     break
 
             idx = one.__uuid__
-            erg = self._document.remove({'_id': str(UUID(int=idx))})
-            if erg['ok']:
+            dct = self._document.find_one_and_delete(
+                {'_id': str(UUID(int=idx))})
+            if dct is not None:
                 consumed = one
+                self.storage.simplifier.delete_arrays(dct)
             else:
                 # this means we have a racing condition and the one we found had
                 # had been deleted in the meantime
@@ -384,6 +649,9 @@ class ObjectStore(StorableMixin):
 
         if consumed is not None:
             self.index.remove(consumed.__uuid__)
+            if self._last_count is not None:
+                self._last_count -= 1
+
             if consumed.__uuid__ in self.cache:
                 del self.cache[consumed.__uuid__]
 
@@ -481,12 +749,360 @@ class ObjectStore(StorableMixin):
 
         return modified
 
+    def claim_one(self, query, key, value, update, exclude=None):
+        """
+        Change an attribute of one object that matches a DB query
+
+        The object is selected and changed in a single atomic operation on the
+        server, so no objects need to be loaded to find a match and two
+        processes can never claim the same object.
+
+        Parameters
+        ----------
+        query : dict
+            a mongodb query on the stored documents, see `query_fields`
+        key : str
+            the attributes name to be changed
+        value : object
+            the old value to be found and changed
+        update : object
+            the new value to the changed into
+        exclude : list of `StorableMixin` or None
+            objects that must not be claimed, e.g. because they were
+            claimed and released before
+
+        Returns
+        -------
+        None or `StorableMixin`
+            if None then no object was altered, otherwise the changed object
+            is returned
+        """
+        query = dict(query)
+        query[key] = value
+        if exclude:
+            query['_id'] = {'$nin': [
+                str(UUID(int=obj.__uuid__)) for obj in exclude]}
+
+        erg = self._document.find_one_and_update(
+            query,
+            {"$set": {key: update}},
+            projection={'_id': True}
+        )
+
+        if erg is None:
+            return None
+
+        idx = int(UUID(erg['_id']))
+
+        if idx in self.cache:
+            # keep the cached object, but its sync fields are outdated now
+            obj = self.cache[idx]
+            setattr(obj, SyncVariable.document_key, None)
+            return obj
+
+        return self.load(idx)
+
+    def release_one(self, obj, key, value, update, released='_released'):
+        """
+        Change an attribute of a claimed object back
+
+        This is the reverse of `claim_one`. The time of the release is
+        written to the field `released` in the same operation, so followers
+        of a change stream can tell a release from other changes.
+
+        Parameters
+        ----------
+        obj : `StorableMixin`
+            the claimed object
+        key : str
+            the attributes name to be changed
+        value : object
+            the value set by the claim
+        update : object
+            the value to be restored
+
+        Returns
+        -------
+        bool
+            True if the object still had `value` and was released
+        """
+        erg = self._document.update_one(
+            {'_id': str(UUID(int=obj.__uuid__)), key: value},
+            {'$set': {key: update, released: time.time()}})
+
+        variables = sync_variables(obj.__class__)
+        if key in variables:
+            variables[key].write(obj, update)
+
+        # the other sync fields of the object might be outdated now
+        setattr(obj, SyncVariable.document_key, None)
+        return erg.modified_count > 0
+
+    def resolve_pending(self, query, key, value, pending='_pending'):
+        """
+        Remove references to objects that reached a value from pending lists
+
+        Objects matching `query` can store the (string) ids of other objects
+        of this store in the list field `pending`. All ids of objects where
+        `key` equals `value` are removed from these lists. Documents without
+        the field (stored by earlier versions) get their `query_fields`
+        written instead.
+
+        Parameters
+        ----------
+        query : dict
+            a mongodb query selecting the documents to be updated
+        key : str
+            the attribute of the referenced objects to be checked
+        value : object
+            the value the referenced objects need to have
+        pending : str
+            the name of the field containing the list of ids
+
+        Returns
+        -------
+        int
+            the number of changed documents
+        """
+        query = dict(query)
+        query[pending] = {'$ne': []}
+
+        changed = 0
+        candidates = []
+        refs = set()
+        for dct in self._document.find(query, {'_id': True, pending: True}):
+            if pending in dct:
+                candidates.append(dct['_id'])
+                refs.update(dct[pending])
+            else:
+                obj = self.load(int(UUID(dct['_id'])))
+                self._document.update_one(
+                    {'_id': dct['_id']}, {'$set': obj.query_fields()})
+                changed += 1
+
+        if refs:
+            done = [
+                dct['_id'] for dct in self._document.find(
+                    {'_id': {'$in': list(refs)}, key: value}, {'_id': True})]
+
+            if done:
+                erg = self._document.update_many(
+                    {'_id': {'$in': candidates}},
+                    {'$pull': {pending: {'$in': done}}})
+                changed += erg.modified_count
+
+        return changed
+
+    def remove_pending(self, obj, pending='_pending'):
+        """
+        Remove an object from the pending lists of all stored documents
+
+        Parameters
+        ----------
+        obj : `StorableMixin`
+            the object to be removed, usually after it reached a final state
+        pending : str
+            the name of the field containing the list of ids
+
+        """
+        idx = str(UUID(int=obj.__uuid__))
+        self._document.update_many(
+            {pending: idx}, {'$pull': {pending: idx}})
+
     def _load(self, idx, builder=None):
         one = self._document.find_one({'_id': str(UUID(int=idx))})
         obj = self.storage.simplifier.from_simple_dict(one, builder)
         obj.__store__ = self
+        self._cache_sync_document(obj, one)
         return obj
 
+    def _cache_sync_document(self, obj, dct, fetched=None):
+        # buffered updates not yet written are newer than the DB content
+        pending = self.storage._write_buffer.pending(self._document, dct['_id'])
+        if pending:
+            dct = dict(dct, **pending)
+
+        SyncVariable.cache_document(obj, dct, fetched)
+        return dct
+
+    def refresh(self, objs, chunk_size=None):
+        """
+        Fetch the current sync variables of many objects at once
+
+        The sync fields are requested with one `$in` query per chunk and a
+        projection to only these fields. Reading a sync variable of these
+        objects within `sync_staleness` seconds will not contact the DB.
+
+        Parameters
+        ----------
+        objs : iterable of :py:class:`mongodb.base.StorableMixin`
+            the objects stored in this store to be refreshed
+        chunk_size : int or None
+            the maximal number of objects requested in a single query. If None
+            `default_load_chunk_size` is used
+        """
+        if chunk_size is None:
+            chunk_size = self.default_load_chunk_size
+
+        objs = {obj.__uuid__: obj for obj in objs}
+        idxs = list(objs)
+        projection = sync_projection(set(obj.__class__ for obj in objs.values()))
+
+        for pos in range(0, len(idxs), chunk_size):
+            fetched = time.time()
+            dcts = self._document.find(
+                {'_id': {'$in': [
+                    str(UUID(int=idx)) for idx in idxs[pos:pos + chunk_size]]}},
+                projection)
+
+            for dct in dcts:
+                obj = objs[int(UUID(dct['_id']))]
+                self._cache_sync_document(obj, dct, fetched)
+
+    def exchange(self, obj, values, consume=None):
+        """
+        Write and read sync variables of an object in a single operation
+
+        The new `values`, all buffered changes of the object and a reset
+        of the `consume` variables to None are written with one
+        `find_one_and_update` that returns the previous document. A value
+        written by another process into a consumed variable is therefore
+        returned exactly once. Reading other sync variables of the object
+        within `sync_staleness` seconds afterwards will not contact the DB.
+
+        Parameters
+        ----------
+        obj : :py:class:`mongodb.base.StorableMixin`
+            the object stored in this store
+        values : dict of str : object
+            the new values of sync variables by name
+        consume : list of str or None
+            the names of sync variables to be read and reset to None
+
+        Returns
+        -------
+        dict of str : object
+            the previous values of the consumed variables. Empty if the
+            object is not stored in the DB
+        """
+        variables = sync_variables(obj.__class__)
+        idx = str(UUID(int=obj.__uuid__))
+        consume = consume or []
+
+        buffer = self.storage._write_buffer
+        buffered = buffer.pop(self._document, idx)
+        fields = dict(buffered)
+        fields.update({
+            name: variables[name]._encode(value)
+            for name, value in values.items()})
+        fields.update({name: None for name in consume})
+        fields[modified_key] = time.time()
+
+        fetched = time.time()
+        try:
+            before = self._document.find_one_and_update(
+                {'_id': idx},
+                {'$set': fields},
+                projection=sync_projection([obj.__class__])
+            )
+        except Exception:
+            # keep the buffered changes for the next write, e.g. a retry
+            # after reconnecting
+            buffer.restore(self._document, idx, buffered)
+            raise
+
+        for name, value in values.items():
+            variables[name].write(obj, value)
+
+        if before is None:
+            return {}
+
+        consumed = {
+            name: variables[name]._decode(obj, before.get(name))
+            for name in consume}
+
+        for name in consume:
+            variables[name].write(obj, None)
+
+        self._cache_sync_document(obj, dict(before, **fields), fetched)
+
+        return consumed
+
+    def _load_many(self, idxs):
+        dcts = self._document.find(
+            {'_id': {'$in': [str(UUID(int=idx)) for idx in idxs]}})
+
+        loaded = {}
+        for dct in dcts:
+            idx = int(UUID(dct['_id']))
+
+            # building a previous object might already have loaded this one
+            # as a dependency, so reuse it to keep object identity
+            obj = self.cache.get(idx)
+            if obj is None:
+                obj = self.storage.simplifier.from_simple_dict(dct)
+                obj.__store__ = self
+                self._cache_sync_document(obj, dct)
+                self.cache[idx] = obj
+
+            loaded[idx] = obj
+
+        return loaded
+
+    def load_many(self, idxs, chunk_size=None, skip_missing=True):
+        """
+        Returns a list of objects from the storage using bulk queries.
+
+        Objects found in the cache are returned directly. All others are
+        fetched in chunks with a single `$in` query per chunk instead of one
+        query per object.
+
+        Parameters
+        ----------
+        idxs : list of int
+            the integer indices of the objects to be loaded
+        chunk_size : int or None
+            the maximal number of objects requested in a single query. If None
+            `default_load_chunk_size` is used
+        skip_missing : bool
+            if True indices that do not exist (anymore) in the storage are
+            skipped, otherwise a `ValueError` is raised like by `load`
+
+        Returns
+        -------
+        list of :py:class:`mongodb.base.StorableMixin`
+            the loaded objects in the order of `idxs`
+        """
+        if chunk_size is None:
+            chunk_size = self.default_load_chunk_size
+
+        found = {}
+        missing = []
+        for idx in idxs:
+            if idx in found:
+                continue
+
+            try:
+                found[idx] = self.cache[idx]
+            except KeyError:
+                found[idx] = None
+                missing.append(idx)
+
+        if missing:
+            logger.debug(
+                'Calling load of %d objects of type `%s` in chunks of %d' %
+                (len(missing), self.content_class.__name__, chunk_size))
+
+            for pos in range(0, len(missing), chunk_size):
+                found.update(self._load_many(missing[pos:pos + chunk_size]))
+
+        if not skip_missing:
+            for idx in missing:
+                if found[idx] is None:
+                    raise ValueError('uuid %s not found in storage' % idx)
+
+        return [found[idx] for idx in idxs if found[idx] is not None]
+
     def clear_cache(self):
         """Clear the cache and force reloading"""
 
@@ -527,8 +1143,15 @@ class ObjectStore(StorableMixin):
 
         logger.debug('Saving objects of type ' + str(type(obj[0])) + ' using IDX #' + str(obj[0].__uuid__))
 
+        l_dct = []
         try:
             l_dct = [self.storage.simplifier.to_simple_dict(o) for o in obj]
+
+            # the save time is used to refresh indices incrementally
+            saved = time.time()
+            for dct in l_dct:
+                dct['_saved'] = saved
+
             self._document.insert_many(l_dct)
             [setattr(o,'__store__',self) for o in obj]
             [self.cache.update({o.__uuid__: o}) for o in obj]
@@ -536,34 +1159,48 @@ class ObjectStore(StorableMixin):
         except Exception as e:
             # in case we did not succeed remove the mark as being saved
             del self.index[next_idc:]
+            self.storage.simplifier.delete_arrays(l_dct)
             raise
 
         return [self.reference(o) for o in obj]
 
 
+    def _one_sorted(self, sort):
+        dct = self._document.find_one({}, {'_id': True}, sort=sort)
+        if dct is None:
+            return None
+
+        return self.load(int(UUID(dct['_id'])))
+
     @property
     def last(self):
         """
-        Returns the last generated object. Useful to continue a run.
+        Returns the last saved object.
+
+        This is only accurate to seconds, objects saved in the same second
+        are ordered by the time they were written to the DB
 
         Returns
         -------
-        :py:class:`mongodb.base.StorableMixin`
-            the last stored object in this store
+        `StorableMixin` or None
+            the content of the store or None if the store is empty
         """
-        return self.load(len(self) - 1)
+        return self._one_sorted([('_time', -1), ('_saved', -1)])
 
     @property
     def first(self):
         """
-        Returns the first stored object.
+        Returns the first saved object.
+
+        This is only accurate to seconds, objects saved in the same second
+        are ordered by the time they were written to the DB
 
         Returns
         -------
-        :py:class:`mongodb.base.StorableMixin`
-            the actual first stored object
+        `StorableMixin` or None
+            the content of the store or None if the store is empty
         """
-        return self.load(0)
+        return self._one_sorted([('_time', 1), ('_saved', 1)])
 
     @property
     def one(self):
@@ -572,61 +1209,51 @@ class ObjectStore(StorableMixin):
 
         Returns
         -------
-        `StorableMixin`
-            the content of the store
+        `StorableMixin` or None
+            the content of the store or None if the store is empty
         """
-        idx = int(UUID(self._document.find_one()['_id']))
-        return self.load(idx)
-
-    def pick(self):
-        '''
-        Return one random element
+        return self._one_sorted(None)
 
-        Returns
-        -------
-        
-        '''
-        # TODO use numpy.random.choice and optional
-        #       number argument to get multiple.
-        #       use/implement bulk pull&load for
-        #       for this
-        length = len(self)
-        if length:
-            idx = randint(length)
-            return self.load(self.index[idx])
-        else:
-            return None
-        
-
-    @property
-    def last(self):
+    def sample(self, n, query=None):
         """
-        Returns the last saved object.
+        Return random objects using `$sample` on the server
 
-        This is only accurate to seconds!
+        Parameters
+        ----------
+        n : int
+            the maximal number of objects
+        query : dict or None
+            if not None only objects whose documents match are picked
 
         Returns
         -------
-        `StorableMixin`
-            the content of the store
+        list of `StorableMixin`
+            at most `n` distinct random objects
         """
-        idx = int(UUID(self._document.find_one(sort=[("_time", -1)])['_id']))
-        return self.load(idx)
+        pipeline = []
+        if query:
+            pipeline.append({'$match': query})
 
-    @property
-    def first(self):
-        """
-        Returns the first saved object.
+        pipeline += [{'$sample': {'size': n}}, {'$project': {'_id': True}}]
 
-        This is only accurate to seconds!
+        return self.load_many([
+            int(UUID(dct['_id']))
+            for dct in self._document.aggregate(pipeline)])
+
+    def pick(self):
+        """
+        Return one random element
 
         Returns
         -------
-        `StorableMixin`
-            the content of the store
+        `StorableMixin` or None
+            a random object or None if the store is empty
         """
-        idx = int(UUID(self._document.find_one(sort=[("_time", 1)])['_id']))
-        return self.load(idx)
+        picked = self.sample(1)
+        if picked:
+            return picked[0]
+
+        return None
 
     def free(self):
         """
@@ -648,7 +1275,7 @@ class ObjectStore(StorableMixin):
         Initialize the associated storage to allow for object storage. Mainly
         creates an index dimension with the name of the object.
         """
-
+        self.create_indices()
         self._created = True
 
     # ==========================================================================
@@ -679,7 +1306,7 @@ class ObjectStore(StorableMixin):
 
         if type(idx) is long_t:
             if idx not in self.index:
-                self.check_size()
+                self.check_size(True)
                 if idx not in self.index:
                     raise ValueError(
                         'str %s not found in storage' % idx)
@@ -743,6 +1370,11 @@ class ObjectStore(StorableMixin):
         Otherwise, we handle the group of objects.
         """
         if not isinstance(obj, (tuple, list, set)):
+            if type(obj) is not LoaderProxy and \
+                    getattr(obj, '__store__', None) is self:
+                # saved or loaded by this store and hence unchanged
+                return self.reference(obj)
+
             return self._save_one(obj)
         else:
             return self._save_many(obj)
@@ -858,6 +1490,6 @@ class ObjectStore(StorableMixin):
             # self._get_id(idx, obj)
 
             self.cache[idx] = obj
-            self.index[obj.__uuid__] = idx
+            self.index.append(obj.__uuid__)
 
             return obj
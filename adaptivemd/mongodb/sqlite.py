@@ -0,0 +1,1335 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+"""
+An embedded storage backend using a single SQLite file
+
+`SQLiteClient`, `SQLiteDatabase` and `SQLiteCollection` implement the part
+of the pymongo API used by `MongoDBStorage`, the stores and the sync
+variables and `SQLiteGridFS` replaces GridFS for the `FileStore` and large
+arrays. Documents are kept as BSON, so everything that can be saved to
+mongodb can be saved here.
+
+The backend is selected by the URL of the storage
+
+>>> MongoDBStorage.set_location('sqlite:///path/to/project.db')  # doctest: +SKIP
+>>> Project.set_dburl('sqlite://:memory:')  # doctest: +SKIP
+
+All storages of a process with the same URL share one connection, so an
+in-memory database lives until `close_clients` is called or the process
+ends. A file can be used by several processes on the same node. Every
+modification runs in its own `BEGIN IMMEDIATE` transaction, which makes
+`find_one_and_update` and with it `ObjectStore.claim_one` atomic across
+processes.
+
+Queries are evaluated in python. Equality, `$in` and range conditions on
+`_id` and on fields passed to `create_index` are narrowed down in SQL
+first.
+
+Duplicate ids and violations of unique indices raise the same
+`DuplicateKeyError` and `BulkWriteError` as pymongo. Unique indices only
+apply to scalar values, so several documents without the field can exist
+like for a sparse index in mongodb.
+"""
+
+from __future__ import absolute_import
+
+import copy
+import numbers
+import random
+import re
+import sqlite3
+import threading
+import time
+
+import six
+
+from bson import BSON
+from bson.binary import Binary
+from bson.objectid import ObjectId
+from gridfs.errors import NoFile
+from pymongo.errors import BulkWriteError, DuplicateKeyError, \
+    OperationFailure
+from pymongo.results import InsertOneResult, InsertManyResult, \
+    UpdateResult, DeleteResult
+
+# the maximal number of parameters in a single SQL statement
+max_variables = 500
+
+_scalar_types = six.string_types + six.integer_types + (float,)
+
+
+def parse_url(url):
+    """
+    Return the path of the database file of a `sqlite://` URL
+
+    `sqlite://:memory:` is an in-memory database, `sqlite:///tmp/a.db` an
+    absolute and `sqlite://a.db` a relative path
+    """
+    path = url[len('sqlite://'):]
+    if path.endswith('/') and path != '/':
+        path = path[:-1]
+
+    return path or ':memory:'
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _key(_id):
+    # the primary key of a document. Ids are usually strings
+    if isinstance(_id, six.string_types):
+        return _id
+
+    return '%s:%s' % (_id.__class__.__name__, _id)
+
+
+def _values(doc, path):
+    """
+    Return all values found at a dotted path, lists are traversed
+
+    """
+    current = [doc]
+    for part in path.split('.'):
+        found = []
+        for value in current:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(
+                        v[part] for v in value
+                        if isinstance(v, dict) and part in v)
+
+        current = found
+
+    return current
+
+
+def _is_operator_dict(cond):
+    return isinstance(cond, dict) and len(cond) > 0 and \
+        all(key.startswith('$') for key in cond)
+
+
+def _eq(values, arg):
+    if not values:
+        return arg is None
+
+    for value in values:
+        if value == arg:
+            return True
+        if isinstance(value, list) and not isinstance(arg, list) and \
+                arg in value:
+            return True
+
+    return False
+
+
+def _comparable(value, arg):
+    if isinstance(arg, numbers.Number):
+        return isinstance(value, numbers.Number)
+
+    if isinstance(arg, six.string_types):
+        return isinstance(value, six.string_types)
+
+    return type(value) is type(arg)
+
+
+def _flat(values):
+    for value in values:
+        if isinstance(value, list):
+            for v in value:
+                yield v
+        else:
+            yield value
+
+
+_compare = {
+    '$gt': lambda value, arg: value > arg,
+    '$gte': lambda value, arg: value >= arg,
+    '$lt': lambda value, arg: value < arg,
+    '$lte': lambda value, arg: value <= arg
+}
+
+
+def _match_operator(values, op, arg):
+    if op == '$eq':
+        return _eq(values, arg)
+    elif op == '$ne':
+        return not _eq(values, arg)
+    elif op == '$in':
+        return any(_eq(values, a) for a in arg)
+    elif op == '$nin':
+        return not any(_eq(values, a) for a in arg)
+    elif op == '$exists':
+        return bool(values) == bool(arg)
+    elif op == '$size':
+        return any(
+            isinstance(value, list) and len(value) == arg
+            for value in values)
+    elif op == '$regex':
+        return any(
+            re.search(arg, value) is not None for value in _flat(values)
+            if isinstance(value, six.string_types))
+    elif op == '$not':
+        return not all(
+            _match_operator(values, o, a) for o, a in arg.items())
+    elif op in _compare:
+        fnc = _compare[op]
+        return any(
+            fnc(value, arg) for value in _flat(values)
+            if _comparable(value, arg))
+    else:
+        raise ValueError('Query operator "%s" is not supported' % op)
+
+
+def match(doc, query):
+    """
+    Test if a document matches a mongodb query
+
+    Parameters
+    ----------
+    doc : dict
+        the document
+    query : dict or None
+        the mongodb query
+
+    Returns
+    -------
+    bool
+    """
+    if not query:
+        return True
+
+    for key, cond in query.items():
+        if key == '$or':
+            if not any(match(doc, q) for q in cond):
+                return False
+        elif key == '$and':
+            if not all(match(doc, q) for q in cond):
+                return False
+        elif key == '$nor':
+            if any(match(doc, q) for q in cond):
+                return False
+        elif _is_operator_dict(cond):
+            values = _values(doc, key)
+            if not all(
+                    _match_operator(values, op, arg)
+                    for op, arg in cond.items()):
+                return False
+        elif not _eq(_values(doc, key), cond):
+            return False
+
+    return True
+
+
+def _parent(doc, path, create):
+    parts = path.split('.')
+    current = doc
+    for part in parts[:-1]:
+        if isinstance(current, list):
+            current = current[int(part)]
+        elif part in current:
+            current = current[part]
+        elif create:
+            current = current.setdefault(part, {})
+        else:
+            return None, parts[-1]
+
+    return current, parts[-1]
+
+
+def _pull_matches(item, arg):
+    if _is_operator_dict(arg):
+        return all(
+            _match_operator([item], op, a) for op, a in arg.items())
+    elif isinstance(arg, dict) and isinstance(item, dict):
+        return match(item, arg)
+
+    return item == arg
+
+
+def apply_update(doc, update):
+    """
+    Apply a mongodb update to a document in place
+
+    Parameters
+    ----------
+    doc : dict
+        the document to be changed
+    update : dict
+        the update, either with operators like `$set` or a replacement
+
+    Returns
+    -------
+    bool
+        True if the document was changed
+    """
+    before = copy.deepcopy(doc)
+
+    if not any(key.startswith('$') for key in update):
+        _id = doc.get('_id')
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if _id is not None:
+            doc['_id'] = _id
+
+        return doc != before
+
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            create = op != '$unset' and op != '$pull'
+            parent, last = _parent(doc, path, create)
+            if parent is None:
+                continue
+
+            if op == '$set':
+                parent[last] = copy.deepcopy(arg)
+            elif op == '$unset':
+                parent.pop(last, None)
+            elif op == '$inc':
+                parent[last] = parent.get(last, 0) + arg
+            elif op == '$push':
+                items = arg['$each'] if _is_operator_dict(arg) else [arg]
+                parent.setdefault(last, []).extend(copy.deepcopy(items))
+            elif op == '$addToSet':
+                items = arg['$each'] if _is_operator_dict(arg) else [arg]
+                current = parent.setdefault(last, [])
+                for item in items:
+                    if item not in current:
+                        current.append(copy.deepcopy(item))
+            elif op == '$pull':
+                current = parent.get(last)
+                if isinstance(current, list):
+                    parent[last] = [
+                        item for item in current
+                        if not _pull_matches(item, arg)]
+            else:
+                raise ValueError('Update operator "%s" is not supported' % op)
+
+    return doc != before
+
+
+def project(doc, projection):
+    """
+    Return the part of a document selected by a mongodb projection
+
+    """
+    if projection is None:
+        return doc
+
+    if isinstance(projection, (list, tuple)):
+        projection = {key: True for key in projection}
+
+    if not any(projection.values()):
+        # exclusion of fields
+        out = dict(doc)
+        for key in projection:
+            parent, last = _parent(out, key, False)
+            if isinstance(parent, dict):
+                parent.pop(last, None)
+
+        return out
+
+    out = {}
+    if projection.get('_id', True) and '_id' in doc:
+        out['_id'] = doc['_id']
+
+    for key, value in projection.items():
+        if value and key != '_id':
+            parts = key.split('.')
+            source = doc
+            target = out
+            for part in parts[:-1]:
+                if not isinstance(source, dict) or part not in source:
+                    break
+                source = source[part]
+                target = target.setdefault(part, {})
+            else:
+                if isinstance(source, dict) and parts[-1] in source:
+                    target[parts[-1]] = source[parts[-1]]
+
+    return out
+
+
+def _sort_key(value):
+    # order values of different types like mongodb
+    if value is None:
+        return 0, 0
+    elif isinstance(value, numbers.Number):
+        return 1, value
+    elif isinstance(value, six.string_types):
+        return 2, value
+    else:
+        return 3, str(value)
+
+
+def sort_documents(docs, sort):
+    """
+    Sort documents in place by a list of `(key, direction)` tuples
+
+    """
+    for key, direction in reversed(sort):
+        docs.sort(
+            key=lambda doc: _sort_key(
+                (_values(doc, key) or [None])[0]),
+            reverse=direction < 0)
+
+
+def _indexable(value):
+    # only scalars that sqlite can compare are kept in index columns
+    if isinstance(value, bool) or not isinstance(value, _scalar_types):
+        return False
+
+    if isinstance(value, six.integer_types):
+        return -(1 << 63) <= value < (1 << 63)
+
+    return True
+
+
+def _duplicate_key_message(collection, error, doc):
+    # sqlite reports the columns, e.g. `UNIQUE constraint failed: t._id`
+    keys = [
+        column.rsplit('.', 1)[-1].strip('"')
+        for column in str(error).split(':', 1)[-1].split(',')]
+    keys = [key[3:] if key.startswith('ix_') else key for key in keys]
+    if keys == ['_id']:
+        index = '_id_'
+    else:
+        index = '_1_'.join(keys) + '_1'
+
+    return 'E11000 duplicate key error collection: %s index: %s ' \
+        'dup key: { %s }' % (
+            collection.full_name, index,
+            ', '.join('%s: %r' % (key, doc.get(key)) for key in keys))
+
+
+def _index_value(doc, key):
+    values = _values(doc, key)
+    if len(values) == 1 and _indexable(values[0]):
+        return values[0]
+
+    return None
+
+
+class SQLiteCursor(object):
+    """
+    The result of `SQLiteCollection.find`
+
+    Sorting, skip and limit are applied before the documents are iterated
+    """
+
+    def __init__(self, docs):
+        self._docs = docs
+        self._skip = 0
+        self._limit = 0
+        self._iter = None
+
+    def sort(self, key_or_list, direction=1):
+        if isinstance(key_or_list, six.string_types):
+            key_or_list = [(key_or_list, direction)]
+
+        sort_documents(self._docs, key_or_list)
+        return self
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def count(self, with_limit_and_skip=False):
+        if with_limit_and_skip:
+            return len(self._selected())
+
+        return len(self._docs)
+
+    def _selected(self):
+        docs = self._docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+
+        return docs
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iter is None:
+            self._iter = iter(self._selected())
+
+        return next(self._iter)
+
+    next = __next__
+
+
+class SQLiteCollection(object):
+    """
+    A collection of documents in a table of a SQLite file
+
+    Parameters
+    ----------
+    database : `SQLiteDatabase`
+        the database the collection belongs to
+    name : str
+        the name of the collection
+    """
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.full_name = database.name + '.' + name
+        self.table = _quote(self.full_name)
+        self._indexes = None
+
+    @property
+    def client(self):
+        return self.database.client
+
+    def __getitem__(self, item):
+        return self.database[self.name + '.' + item]
+
+    def __repr__(self):
+        return 'SQLiteCollection(%s)' % self.full_name
+
+    # ==========================================================================
+    # TABLE AND INDICES
+    # ==========================================================================
+
+    @property
+    def indexes(self):
+        """
+        list of str : the fields that have a column and an SQL index
+        """
+        if self._indexes is None:
+            self._indexes = self.client._ensure_table(self)
+
+        return self._indexes
+
+    def create_index(self, keys, unique=False, **kwargs):
+        """
+        Add an SQL index for a field
+
+        Parameters
+        ----------
+        keys : str or list of (str, int)
+            the field or a list of fields with directions. Compound indices
+            are replaced by an index for each field
+        unique : bool
+            if True documents with the same (scalar) values of all `keys`
+            are rejected with a `DuplicateKeyError`
+        """
+        if isinstance(keys, six.string_types):
+            keys = [keys]
+        else:
+            keys = [key for key, _ in keys]
+
+        name = '%s_1' % '_1_'.join(keys)
+        # the primary key is always unique
+        unique = unique and keys != ['_id']
+
+        try:
+            with self.client.transaction() as conn:
+                self._create_index(conn, keys, name, unique)
+        except Exception:
+            # the columns and indices were rolled back
+            self._indexes = None
+            raise
+
+        return name
+
+    def _create_index(self, conn, keys, name, unique):
+        if unique:
+            self._check_unique_index(conn, keys, name)
+
+        for key in keys:
+            if key == '_id' or key in self.indexes:
+                continue
+
+            column = _quote('ix_' + key)
+            conn.execute(
+                'ALTER TABLE %s ADD COLUMN %s' % (self.table, column))
+            rows = conn.execute(
+                'SELECT _id, doc FROM %s' % self.table).fetchall()
+            conn.executemany(
+                'UPDATE %s SET %s = ? WHERE _id = ?' % (self.table, column),
+                [
+                    (_index_value(BSON(bytes(doc)).decode(), key), _id)
+                    for _id, doc in rows])
+            conn.execute('CREATE INDEX %s ON %s (%s)' % (
+                _quote('ix_' + self.full_name + '.' + key),
+                self.table, column))
+            self._indexes.append(key)
+            self.client._save_indexes(self)
+
+        if unique:
+            try:
+                conn.execute(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS %s ON %s (%s)' % (
+                        _quote('ux_' + self.full_name + '.' + name),
+                        self.table,
+                        ', '.join(_quote('ix_' + key) for key in keys)))
+            except sqlite3.IntegrityError as e:
+                raise DuplicateKeyError(
+                    _duplicate_key_message(self, e, {}), 11000)
+
+    def _check_unique_index(self, conn, keys, name):
+        # like mongodb, an index cannot be changed to a unique one
+        if name in self._unique_indexes(conn):
+            return
+
+        if len(keys) == 1 and keys[0] in self.indexes:
+            raise OperationFailure(
+                'Index with name: %s already exists with different options'
+                % name, 85)
+
+    def _unique_indexes(self, conn):
+        prefix = 'ux_' + self.full_name + '.'
+        return [
+            row[1][len(prefix):]
+            for row in conn.execute('PRAGMA index_list(%s)' % self.table)
+            if row[1].startswith(prefix)]
+
+    def index_information(self):
+        info = {'_id_': {'key': [('_id', 1)]}}
+        for key in self.indexes:
+            info['%s_1' % key] = {'key': [(key, 1)]}
+
+        with self.client.transaction(write=False) as conn:
+            for name in self._unique_indexes(conn):
+                keys = name[:-2].split('_1_')
+                info[name] = {
+                    'key': [(key, 1) for key in keys], 'unique': True}
+
+        return info
+
+    def _row(self, doc):
+        return [_key(doc['_id']), sqlite3.Binary(BSON.encode(doc))] + [
+            _index_value(doc, key) for key in self.indexes]
+
+    def _columns(self):
+        return ', '.join(
+            ['_id', 'doc'] + [_quote('ix_' + key) for key in self.indexes])
+
+    def _where(self, query):
+        # narrow down the rows that can match in SQL
+        clauses = []
+        params = []
+        if not query:
+            return clauses, params
+
+        for key, cond in query.items():
+            if key == '_id':
+                column = '_id'
+            elif key in self.indexes:
+                column = _quote('ix_' + key)
+            else:
+                continue
+
+            if isinstance(cond, _scalar_types) or isinstance(cond, ObjectId):
+                if key == '_id':
+                    clauses.append('_id = ?')
+                    params.append(_key(cond))
+                elif _indexable(cond):
+                    clauses.append('(%s = ? OR %s IS NULL)' % (column, column))
+                    params.append(cond)
+
+            elif _is_operator_dict(cond):
+                for op, arg in cond.items():
+                    if op == '$in' and key == '_id':
+                        # the chunks are handled in `_rows`
+                        clauses.append(('$in', [_key(a) for a in arg]))
+                    elif op == '$in' and len(arg) <= max_variables and \
+                            all(_indexable(a) for a in arg):
+                        clauses.append('(%s IN (%s) OR %s IS NULL)' % (
+                            column, ', '.join('?' * len(arg)), column))
+                        params.extend(arg)
+                    elif op in _compare and key != '_id' and \
+                            _indexable(arg):
+                        clauses.append('(%s %s ? OR %s IS NULL)' % (
+                            column,
+                            {'$gt': '>', '$gte': '>=',
+                             '$lt': '<', '$lte': '<='}[op],
+                            column))
+                        params.append(arg)
+
+        return clauses, params
+
+    def _rows(self, conn, query):
+        # make sure the table exists
+        self.indexes
+
+        clauses, params = self._where(query)
+        ids = None
+        for clause in clauses:
+            if isinstance(clause, tuple):
+                ids = clause[1] if ids is None else \
+                    [i for i in ids if i in set(clause[1])]
+
+        clauses = [c for c in clauses if not isinstance(c, tuple)]
+
+        sql = 'SELECT _id, doc FROM %s' % self.table
+        if ids is None:
+            if clauses:
+                sql += ' WHERE ' + ' AND '.join(clauses)
+            for row in conn.execute(sql, params):
+                yield row
+
+            return
+
+        clauses.append('_id IN (%s)')
+        sql += ' WHERE ' + ' AND '.join(clauses)
+        for pos in range(0, len(ids), max_variables):
+            chunk = ids[pos:pos + max_variables]
+            for row in conn.execute(
+                    sql % ', '.join('?' * len(chunk)), params + chunk):
+                yield row
+
+    def _find(self, conn, query, sort=None, limit=0):
+        found = []
+        for key, blob in self._rows(conn, query):
+            doc = BSON(bytes(blob)).decode()
+            if match(doc, query):
+                found.append((key, doc))
+                if limit and not sort and len(found) == limit:
+                    break
+
+        if sort:
+            docs = [doc for _, doc in found]
+            sort_documents(docs, sort)
+            keys = {id(doc): key for key, doc in found}
+            found = [(keys[id(doc)], doc) for doc in docs]
+
+        return found
+
+    def _insert(self, conn, docs, ordered=True):
+        """
+        Insert new documents and return the write errors like pymongo
+
+        With `ordered` the documents after the first error are skipped,
+        otherwise all others are inserted
+        """
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            self.table, self._columns(),
+            ', '.join('?' * (len(self.indexes) + 2)))
+        rows = [self._row(doc) for doc in docs]
+
+        conn.execute('SAVEPOINT insert_many')
+        try:
+            conn.executemany(sql, rows)
+            return []
+        except sqlite3.IntegrityError:
+            # insert one by one to find the duplicates
+            conn.execute('ROLLBACK TO insert_many')
+        finally:
+            conn.execute('RELEASE insert_many')
+
+        errors = []
+        for index, (doc, row) in enumerate(zip(docs, rows)):
+            try:
+                conn.execute(sql, row)
+            except sqlite3.IntegrityError as e:
+                errors.append({
+                    'index': index,
+                    'code': 11000,
+                    'errmsg': _duplicate_key_message(self, e, doc),
+                    'op': doc})
+                if ordered:
+                    break
+
+        return errors
+
+    def _replace(self, conn, docs):
+        # update documents in place, `INSERT OR REPLACE` would remove other
+        # documents that violate a unique index
+        columns = ['doc'] + [_quote('ix_' + key) for key in self.indexes]
+        try:
+            conn.executemany(
+                'UPDATE %s SET %s WHERE _id = ?' % (
+                    self.table, ', '.join('%s = ?' % c for c in columns)),
+                [self._row(doc)[1:] + [_key(doc['_id'])] for doc in docs])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(
+                _duplicate_key_message(self, e, docs[0]), 11000)
+
+    # ==========================================================================
+    # QUERIES
+    # ==========================================================================
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, **kwargs):
+        with self.client.transaction(write=False) as conn:
+            docs = [doc for _, doc in self._find(conn, filter, sort, limit)]
+
+        cursor = SQLiteCursor([project(doc, projection) for doc in docs])
+        if limit:
+            cursor.limit(limit)
+
+        return cursor
+
+    def aggregate(self, pipeline, **kwargs):
+        """
+        Run an aggregation pipeline of `$match`, `$sort`, `$skip`, `$limit`,
+        `$sample` and `$project` stages
+
+        """
+        stages = list(pipeline)
+        query = None
+        if stages and '$match' in stages[0]:
+            query = stages.pop(0)['$match']
+
+        with self.client.transaction(write=False) as conn:
+            docs = [doc for _, doc in self._find(conn, query)]
+
+        for stage in stages:
+            (op, arg), = stage.items()
+            if op == '$match':
+                docs = [doc for doc in docs if match(doc, arg)]
+            elif op == '$sort':
+                sort_documents(docs, list(arg.items()))
+            elif op == '$skip':
+                docs = docs[arg:]
+            elif op == '$limit':
+                docs = docs[:arg]
+            elif op == '$sample':
+                docs = random.sample(docs, min(arg['size'], len(docs)))
+            elif op == '$project':
+                docs = [project(doc, arg) for doc in docs]
+            else:
+                raise ValueError(
+                    'Aggregation stage "%s" is not supported' % op)
+
+        return SQLiteCursor(docs)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+
+        with self.client.transaction(write=False) as conn:
+            found = self._find(conn, filter, sort, 1)
+
+        if found:
+            return project(found[0][1], projection)
+
+        return None
+
+    def count(self, filter=None, **kwargs):
+        if not filter:
+            self.indexes
+            with self.client.transaction(write=False) as conn:
+                return conn.execute(
+                    'SELECT COUNT(*) FROM %s' % self.table).fetchone()[0]
+
+        with self.client.transaction(write=False) as conn:
+            return len(self._find(conn, filter))
+
+    def count_documents(self, filter, **kwargs):
+        return self.count(filter)
+
+    # ==========================================================================
+    # MODIFICATIONS
+    # ==========================================================================
+
+    def insert_one(self, document, **kwargs):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+
+        # make sure the table exists
+        self.indexes
+
+        with self.client.transaction() as conn:
+            errors = self._insert(conn, [document])
+            if errors:
+                raise DuplicateKeyError(
+                    errors[0]['errmsg'], 11000, errors[0])
+
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        documents = list(documents)
+        for document in documents:
+            if '_id' not in document:
+                document['_id'] = ObjectId()
+
+        # make sure the table exists
+        self.indexes
+
+        with self.client.transaction() as conn:
+            errors = self._insert(conn, documents, ordered)
+
+        if errors:
+            if ordered:
+                inserted = errors[0]['index']
+            else:
+                inserted = len(documents) - len(errors)
+
+            raise BulkWriteError({
+                'writeErrors': errors,
+                'writeConcernErrors': [],
+                'nInserted': inserted,
+                'nUpserted': 0,
+                'nMatched': 0,
+                'nModified': 0,
+                'nRemoved': 0,
+                'upserted': []})
+
+        return InsertManyResult([doc['_id'] for doc in documents], True)
+
+    def _update(self, conn, filter, update, upsert, multi, sort=None):
+        found = self._find(conn, filter, sort, 0 if multi else 1)
+        if not multi:
+            found = found[:1]
+
+        changed = []
+        for _, doc in found:
+            before = copy.deepcopy(doc)
+            if apply_update(doc, update):
+                changed.append((before, doc))
+
+        if changed:
+            self._replace(conn, [doc for _, doc in changed])
+
+        upserted = None
+        if not found and upsert:
+            doc = {
+                key: value for key, value in (filter or {}).items()
+                if not key.startswith('$') and not _is_operator_dict(value)}
+            apply_update(doc, update)
+            if '_id' not in doc:
+                doc['_id'] = ObjectId()
+
+            errors = self._insert(conn, [doc])
+            if errors:
+                raise DuplicateKeyError(
+                    errors[0]['errmsg'], 11000, errors[0])
+
+            upserted = doc
+
+        return found, changed, upserted
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self.client.transaction() as conn:
+            found, changed, upserted = self._update(
+                conn, filter, update, upsert, False)
+
+        return self._result(found, changed, upserted)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self.client.transaction() as conn:
+            found, changed, upserted = self._update(
+                conn, filter, update, upsert, True)
+
+        return self._result(found, changed, upserted)
+
+    @staticmethod
+    def _result(found, changed, upserted):
+        raw = {
+            'n': len(found) or int(upserted is not None),
+            'nModified': len(changed),
+            'ok': 1.0
+        }
+        if upserted is not None:
+            raw['upserted'] = upserted['_id']
+
+        return UpdateResult(raw, True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self.update_one(filter, replacement, upsert)
+
+    def find_one_and_update(
+            self, filter, update, projection=None, sort=None, upsert=False,
+            return_document=False, **kwargs):
+        with self.client.transaction() as conn:
+            found, changed, upserted = self._update(
+                conn, filter, update, upsert, False, sort)
+
+        if return_document:
+            if changed:
+                return project(changed[0][1], projection)
+            elif found:
+                return project(found[0][1], projection)
+            elif upserted is not None:
+                return project(upserted, projection)
+        else:
+            if changed:
+                return project(changed[0][0], projection)
+            elif found:
+                return project(found[0][1], projection)
+
+        return None
+
+    def find_and_modify(
+            self, query=None, update=None, upsert=False, sort=None,
+            new=False, fields=None, **kwargs):
+        return self.find_one_and_update(
+            query or {}, update, fields, sort, upsert, new)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        errors = []
+        with self.client.transaction() as conn:
+            for index, request in enumerate(requests):
+                conn.execute('SAVEPOINT bulk_write')
+                try:
+                    self._update(
+                        conn, request._filter, request._doc, request._upsert,
+                        False)
+                except DuplicateKeyError as e:
+                    conn.execute('ROLLBACK TO bulk_write')
+                    errors.append({
+                        'index': index,
+                        'code': 11000,
+                        'errmsg': str(e),
+                        'op': request._doc})
+                    if ordered:
+                        break
+                finally:
+                    conn.execute('RELEASE bulk_write')
+
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors,
+                'writeConcernErrors': [],
+                'nInserted': 0,
+                'nUpserted': 0,
+                'nMatched': 0,
+                'nModified': 0,
+                'nRemoved': 0,
+                'upserted': []})
+
+    def _delete(self, filter, multi, sort=None):
+        with self.client.transaction() as conn:
+            found = self._find(
+                conn, filter, sort=sort, limit=0 if multi else 1)
+            if not multi:
+                found = found[:1]
+
+            conn.executemany(
+                'DELETE FROM %s WHERE _id = ?' % self.table,
+                [(key,) for key, _ in found])
+
+        return [doc for _, doc in found]
+
+    def delete_one(self, filter, **kwargs):
+        return DeleteResult(
+            {'n': len(self._delete(filter, False)), 'ok': 1.0}, True)
+
+    def delete_many(self, filter, **kwargs):
+        return DeleteResult(
+            {'n': len(self._delete(filter, True)), 'ok': 1.0}, True)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        found = self._delete(filter, False, sort)
+        if found:
+            return project(found[0], projection)
+
+        return None
+
+    def remove(self, spec_or_id=None, multi=True, **kwargs):
+        if spec_or_id is not None and not isinstance(spec_or_id, dict):
+            spec_or_id = {'_id': spec_or_id}
+
+        return {'n': len(self._delete(spec_or_id, multi)), 'ok': 1.0}
+
+    def drop(self):
+        self.client._drop_collection(self)
+        self._indexes = None
+
+
+class SQLiteDatabase(object):
+    """
+    A named group of collections in a `SQLiteClient`
+
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, item):
+        if item not in self._collections:
+            self._collections[item] = SQLiteCollection(self, item)
+
+        return self._collections[item]
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def collection_names(self, **kwargs):
+        return self.client._collection_names(self.name)
+
+    list_collection_names = collection_names
+
+    def drop_collection(self, name):
+        self[name].drop()
+
+    def __repr__(self):
+        return 'SQLiteDatabase(%s)' % self.name
+
+
+class SQLiteClient(object):
+    """
+    A client for the databases in a single SQLite file
+
+    Parameters
+    ----------
+    path : str
+        the path of the file or `:memory:` for an in-memory database
+    timeout : float
+        the seconds to wait for a lock held by another process
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._databases = {}
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False)
+
+        if path != ':memory:':
+            # readers do not block the writer
+            self._conn.execute('PRAGMA journal_mode=WAL')
+
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS _collections '
+            '(name TEXT PRIMARY KEY, db TEXT, indexes TEXT)')
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(parse_url(url), **kwargs)
+
+    def __getitem__(self, item):
+        if item not in self._databases:
+            self._databases[item] = SQLiteDatabase(self, item)
+
+        return self._databases[item]
+
+    def get_database(self, name, **kwargs):
+        return self[name]
+
+    def transaction(self, write=True):
+        """
+        Return a context manager that runs a transaction
+
+        Writing transactions take the database lock right away, so no other
+        process can change the documents read in the transaction.
+        Transactions of the same client can be nested and use the outermost
+        one.
+        """
+        return _Transaction(self, write)
+
+    def _ensure_table(self, collection):
+        with self.transaction() as conn:
+            row = conn.execute(
+                'SELECT indexes FROM _collections WHERE name = ?',
+                (collection.full_name,)).fetchone()
+            if row is not None:
+                return [key for key in row[0].split('\n') if key]
+
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS %s '
+                '(_id TEXT PRIMARY KEY, doc BLOB)' % collection.table)
+            conn.execute(
+                'INSERT INTO _collections (name, db, indexes) '
+                'VALUES (?, ?, ?)',
+                (collection.full_name, collection.database.name, ''))
+            return []
+
+    def _save_indexes(self, collection):
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE _collections SET indexes = ? WHERE name = ?',
+                ('\n'.join(collection.indexes), collection.full_name))
+
+    def _collection_names(self, db):
+        with self.transaction(write=False) as conn:
+            return [
+                name[len(db) + 1:] for name, in conn.execute(
+                    'SELECT name FROM _collections WHERE db = ?', (db,))]
+
+    def _drop_collection(self, collection):
+        with self.transaction() as conn:
+            conn.execute('DROP TABLE IF EXISTS %s' % collection.table)
+            conn.execute(
+                'DELETE FROM _collections WHERE name = ?',
+                (collection.full_name,))
+
+    def database_names(self):
+        with self.transaction(write=False) as conn:
+            return [
+                name for name, in conn.execute(
+                    'SELECT DISTINCT db FROM _collections')]
+
+    list_database_names = database_names
+
+    def drop_database(self, name):
+        database = self[name]
+        for collection in database.collection_names():
+            database[collection].drop()
+
+        for collection in database._collections.values():
+            collection._indexes = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction(object):
+    def __init__(self, client, write):
+        self.client = client
+        self.write = write
+
+    def __enter__(self):
+        client = self.client
+        client._lock.acquire()
+        if client._depth == 0:
+            try:
+                client._conn.execute(
+                    'BEGIN IMMEDIATE' if self.write else 'BEGIN')
+            except:
+                client._lock.release()
+                raise
+
+        client._depth += 1
+        return client._conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        client = self.client
+        client._depth -= 1
+        try:
+            if client._depth == 0:
+                if exc_type is None:
+                    client._conn.execute('COMMIT')
+                else:
+                    client._conn.execute('ROLLBACK')
+        finally:
+            client._lock.release()
+
+
+class SQLiteGridOut(object):
+    """
+    A file read from a `SQLiteGridFS`
+
+    The fields passed to `SQLiteGridFS.put` are available as attributes
+    """
+
+    def __init__(self, doc):
+        self._file = doc
+        self._position = 0
+
+    def read(self, size=-1):
+        data = bytes(self._file['data'])
+        if size is None or size < 0:
+            position, self._position = self._position, len(data)
+            return data[position:]
+
+        position = self._position
+        self._position = min(position + size, len(data))
+        return data[position:self._position]
+
+    @property
+    def length(self):
+        return self._file['length']
+
+    @property
+    def filename(self):
+        return self._file.get('filename')
+
+    def __getattr__(self, item):
+        try:
+            return self.__dict__['_file'][item]
+        except KeyError:
+            raise AttributeError(item)
+
+
+class SQLiteGridFS(object):
+    """
+    Store files in a `SQLiteDatabase` like GridFS
+
+    Files are not split into chunks and each file is a single document
+    in the collection `<collection>.files`.
+
+    Parameters
+    ----------
+    database : `SQLiteDatabase`
+        the database to store the files in
+    collection : str
+        the name of the files, `fs` by default like GridFS
+    """
+
+    def __init__(self, database, collection='fs'):
+        self._files = database[collection + '.files']
+
+    def put(self, data, **kwargs):
+        encoding = kwargs.pop('encoding', None)
+        if hasattr(data, 'read'):
+            # a file-like object like for GridFS
+            data = data.read()
+
+        if isinstance(data, six.text_type):
+            data = data.encode(encoding or 'utf8')
+
+        doc = dict(kwargs)
+        doc.setdefault('_id', ObjectId())
+        doc['length'] = len(data)
+        doc['uploadDate'] = time.time()
+        doc['data'] = Binary(data)
+        self._files.insert_one(doc)
+
+        return doc['_id']
+
+    def get(self, file_id):
+        doc = self._files.find_one({'_id': file_id})
+        if doc is None:
+            raise NoFile('no file with _id %s' % file_id)
+
+        return SQLiteGridOut(doc)
+
+    def find_one(self, filter=None, **kwargs):
+        doc = self._files.find_one(filter, **kwargs)
+        if doc is None:
+            return None
+
+        return SQLiteGridOut(doc)
+
+    def find(self, filter=None, **kwargs):
+        cursor = self._files.find(filter, **kwargs)
+        cursor._docs = [SQLiteGridOut(doc) for doc in cursor._docs]
+        return cursor
+
+    def exists(self, file_id=None, **kwargs):
+        query = dict(kwargs)
+        if file_id is not None:
+            query['_id'] = file_id
+
+        return self._files.count(query) > 0
+
+    def delete(self, file_id):
+        self._files.delete_one({'_id': file_id})
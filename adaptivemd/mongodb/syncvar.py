@@ -27,16 +27,83 @@
 from __future__ import absolute_import
 
 
+import time
 import uuid
 
 from adaptivemd.mongodb.base import long_t
+from .buffer import modified_key
 from .dictify import ObjectJSON
 
 
+_class_sync_variables = {}
+
+
+def sync_variables(cls):
+    """
+    Return all `SyncVariable` attributes of a class
+
+    Parameters
+    ----------
+    cls : type
+        the class to be inspected
+
+    Returns
+    -------
+    dict of str : `SyncVariable`
+        the variables by the name of the field in the DB
+    """
+    try:
+        return _class_sync_variables[cls]
+    except KeyError:
+        found = {}
+        for klass in reversed(cls.__mro__):
+            for attr in vars(klass).values():
+                if isinstance(attr, SyncVariable):
+                    found[attr.name] = attr
+
+        _class_sync_variables[cls] = found
+        return found
+
+
+def sync_projection(classes):
+    """
+    Return a DB projection that only contains the sync fields of classes
+
+    Parameters
+    ----------
+    classes : iterable of type
+        the classes whose sync fields are requested
+
+    Returns
+    -------
+    dict of str : bool
+        the projection to be used in `find` or `find_one`
+    """
+    projection = {'_id': True}
+    for cls in classes:
+        projection.update({name: True for name in sync_variables(cls)})
+
+    return projection
+
+
 class SyncVariable(object):
-    def __init__(self, name, fix_fnc=None):
+    """
+    Descriptor for an attribute that is kept in sync with the DB
+
+    Reading the attribute fetches the sync fields of the object's document
+    (all at once) unless they have been fetched less than `sync_staleness`
+    seconds ago by the object's store. Writing updates the DB immediately
+    unless the storage is buffering writes and the variable is `buffered`.
+    If `fix_fnc` returns True for the local value it is considered final
+    and the DB is not asked anymore.
+    """
+
+    document_key = '_sync_document_'
+
+    def __init__(self, name, fix_fnc=None, buffered=True):
         self.name = name
         self.fix_fnc = fix_fnc
+        self.buffered = buffered
         self.key = '_' + self.name + '_'
 
     @staticmethod
@@ -47,13 +114,55 @@ class SyncVariable(object):
     def _hex(instance):
         return hex(instance.__uuid__)
 
-    def _update(self, store, idx):
+    @classmethod
+    def cache_document(cls, instance, dct, fetched=None):
+        """
+        Remember the sync fields of a fetched document for an instance
+
+        Parameters
+        ----------
+        instance : :class:`mongodb.StorableMixin`
+            the object the document belongs to
+        dct : dict
+            the (possibly partial) document from the DB
+        fetched : float or None
+            the time of the fetch, if None the current time is used
+        """
+        names = sync_variables(instance.__class__)
+        if names:
+            if fetched is None:
+                fetched = time.time()
+
+            setattr(instance, cls.document_key, (
+                fetched, {name: dct[name] for name in names if name in dct}))
+
+    def _update(self, store, idx, instance=None):
         if store is not None:
+            if instance is not None:
+                cached = getattr(instance, self.document_key, None)
+                if cached is not None and \
+                        time.time() - cached[0] <= store.sync_staleness:
+                    return cached[1]
+
+                dct = store._document.find_one(
+                    {'_id': idx}, sync_projection([instance.__class__]))
+
+                if dct is not None:
+                    dct = store._cache_sync_document(instance, dct)
+
+                return dct
+
             return store._document.find_one(
                 {'_id': idx})
 
         return None
 
+    def _encode(self, value):
+        return value
+
+    def _decode(self, instance, data):
+        return data
+
     def read(self, instance):
         try:
             return getattr(instance, self.key)
@@ -74,9 +183,9 @@ class SyncVariable(object):
 
             if instance.__store__ is not None:
                 idx = self._idx(instance)
-                dct = self._update(instance.__store__, idx)
+                dct = self._update(instance.__store__, idx, instance)
                 if dct and self.name in dct:
-                    value = dct[self.name]
+                    value = self._decode(instance, dct[self.name])
                     self.write(instance, value)
                     return value
 
@@ -89,12 +198,31 @@ class SyncVariable(object):
                 if val is not None and self.fix_fnc(val):
                     return
 
-            idx = str(uuid.UUID(int=instance.__uuid__))
-            instance.__store__._document.find_and_modify(
-                query={'_id': idx},
-                update={"$set": {self.name: value}},
-                upsert=False
-                )
+            idx = self._idx(instance)
+            data = self._encode(value)
+            store = instance.__store__
+            buffer = store.storage._write_buffer
+            if self.buffered and buffer.active:
+                buffer.set(store._document, idx, self.name, data)
+            else:
+                # write pending changes of this document first
+                buffered = buffer.pop(store._document, idx)
+                fields = dict(buffered)
+                fields[self.name] = data
+                fields[modified_key] = time.time()
+                try:
+                    store._document.find_and_modify(
+                        query={'_id': idx},
+                        update={"$set": fields},
+                        upsert=False
+                        )
+                except Exception:
+                    buffer.restore(store._document, idx, buffered)
+                    raise
+
+            cached = getattr(instance, self.document_key, None)
+            if cached is not None:
+                cached[1][self.name] = data
 
         self.write(instance, value)
 
@@ -160,115 +288,41 @@ class SyncVariable(object):
 
 
 class ObjectSyncVariable(SyncVariable):
-    def __init__(self, name, store, fix_fnc=None):
-        super(ObjectSyncVariable, self).__init__(name, fix_fnc)
+    def __init__(self, name, store, fix_fnc=None, buffered=True):
+        super(ObjectSyncVariable, self).__init__(name, fix_fnc, buffered)
         self.store = store
 
-    def __get__(self, instance, owner):
-        if instance is None:
-            return self
-        else:
-            if self.fix_fnc:
-                val = self.read(instance)
-                if val is not None and self.fix_fnc(val):
-                    return val
-
-            if instance.__store__ is not None:
-                idx = self._idx(instance)
-                dct = self._update(instance.__store__, idx)
-
-                if dct and self.name in dct:
-                    data = dct[self.name]
-
-                    if data is None:
-                        value = None
-                    else:
-                        obj_idx = long_t(data['_hex_uuid'], 16)
-                        value = getattr(instance.__store__.storage, self.store).load(obj_idx)
-
-                    self.write(instance, value)
-                    return value
-
-            return self.read(instance)
+    def _encode(self, value):
+        if value is None:
+            return None
 
-    def __set__(self, instance, value):
-        if instance.__store__ is not None:
-            if self.fix_fnc:
-                val = self.read(instance)
-                if val is not None and self.fix_fnc(val):
-                    return
+        return {
+            '_hex_uuid': self._hex(value),
+            '_store': self.store}
 
-            idx = self._idx(instance)
-            if value is not None:
-                instance.__store__._document.find_and_modify(
-                    query={'_id': idx},
-                    update={"$set": {self.name: {
-                        '_hex_uuid': self._hex(value),
-                        '_store': self.store}}},
-                    upsert=False
-                    )
-            else:
-                instance.__store__._document.find_and_modify(
-                    query={'_id': idx},
-                    update={"$set": {self.name: None}},
-                    upsert=False
-                    )
+    def _decode(self, instance, data):
+        if data is None:
+            return None
 
-        self.write(instance, value)
+        obj_idx = long_t(data['_hex_uuid'], 16)
+        return getattr(instance.__store__.storage, self.store).load(obj_idx)
 
 
 _json_sync_simplifier = ObjectJSON()
 
 
 class JSONDataSyncVariable(SyncVariable):
-    def __init__(self, name, fix_fnc=None):
-        super(JSONDataSyncVariable, self).__init__(name, fix_fnc)
+    def __init__(self, name, fix_fnc=None, buffered=True):
+        super(JSONDataSyncVariable, self).__init__(name, fix_fnc, buffered)
 
-    def __get__(self, instance, owner):
-        if instance is None:
-            return self
-        else:
-            if self.fix_fnc:
-                val = self.read(instance)
-                if val is not None and self.fix_fnc(val):
-                    return val
-
-            if instance.__store__ is not None:
-                idx = self._idx(instance)
-                dct = self._update(instance.__store__, idx)
-
-                if dct and self.name in dct:
-                    data = dct[self.name]
-
-                    if data is None:
-                        value = None
-                    else:
-                        value = _json_sync_simplifier.build(data)
-
-                    self.write(instance, value)
-                    return value
-
-            return self.read(instance)
+    def _encode(self, value):
+        if value is None:
+            return None
 
-    def __set__(self, instance, value):
-        if instance.__store__ is not None:
-            if self.fix_fnc:
-                val = self.read(instance)
-                if val is not None and self.fix_fnc(val):
-                    return
+        return _json_sync_simplifier.simplify(value)
 
-            idx = self._idx(instance)
-            if value is not None:
-                instance.__store__._document.find_and_modify(
-                    query={'_id': idx},
-                    update={"$set": {self.name: _json_sync_simplifier.simplify(value)}},
-                    upsert=False
-                    )
-            else:
-                instance.__store__._document.find_and_modify(
-                    query={'_id': idx},
-                    update={"$set": {self.name: None}},
-                    upsert=False
-                    )
+    def _decode(self, instance, data):
+        if data is None:
+            return None
 
-        self.write(instance, value)
+        return _json_sync_simplifier.build(data)
@@ -32,6 +32,7 @@ import types
 from .file import URLGenerator, File
 from .engine import Trajectory
 from .bundle import StoredBundle
+from .catalog import TrajectoryCatalog
 from .condition import Condition
 from .resource import Resource
 from .generator import TaskGenerator
@@ -78,10 +79,11 @@ class Project(object):
         a set of file objects that are available in the project and are
         believed to be available within the resource as long as the project
         lives
-    trajectories : `ViewBundle`
+    trajectories : `CatalogBundle`
         all `File` object that are of `Trajectory` type and which have a
         positive `created` attribute. This means the file was really created
-        and has not been altered yet.
+        and has not been altered yet. The bundle is backed by a
+        `TrajectoryCatalog` that is updated incrementally from the DB
     workers : `Bundle`
         a set of all registered `Worker` instanced in the project
     files : `Bundle`
@@ -112,6 +114,10 @@ class Project(object):
         if a worker is dead then its tasks are assigned this state. Default is
         ``created`` which means the task will be restarted by another worker.
         You can also chose ``halt`` or ``cancelled``. See `Task` for details
+    cache_budget : int or None
+        if set, the caches of all stores are replaced by caches limited to
+        this number of (estimated) bytes in total. See
+        :meth:`MongoDBStorage.set_cache_budget`. Default is None.
 
     See also
     --------
@@ -119,8 +125,16 @@ class Project(object):
 
     """
 
+    cache_budget = None
+
     @classmethod
     def set_dburl(cls, dburl):
+        '''
+        Set the URL of the database used by the project
+
+        Use `sqlite:///path/to/file.db` or `sqlite://:memory:` to store
+        the project in an embedded SQLite database instead of MongoDB.
+        '''
         MongoDBStorage._db_url = dburl
 
     @classmethod
@@ -265,7 +279,8 @@ class Project(object):
         self.resources = StoredBundle()
 
         self._all_trajectories = self.files.c(Trajectory)
-        self.trajectories = self._all_trajectories.v(lambda x: x.exists)
+        self._trajectory_catalog = TrajectoryCatalog()
+        self.trajectories = self._trajectory_catalog.bundle()
 
         self._events = []
 
@@ -393,6 +408,7 @@ class Project(object):
 
         if hasattr(self.storage, 'tasks'):
             self.files.set_store(self.storage.files)
+            self._trajectory_catalog.set_store(self.storage.files)
             self.generators.set_store(self.storage.generators)
             self.configurations.set_store(self.storage.configurations)
             self.models.set_store(self.storage.models)
@@ -412,6 +428,9 @@ class Project(object):
             self.storage.data.set_caching(WeakValueCache())
             self.storage.logs.set_caching(WeakValueCache())
 
+            if self.cache_budget is not None:
+                self.storage.set_cache_budget(self.cache_budget)
+
             # make sure that the file number will be new
             # TODO This may note work...
             self.traj_name.initialize_from_files(self.trajectories)
@@ -843,21 +862,29 @@ class Project(object):
 
             # check worker status and mark as dead if not responding for long times
             now = time.time()
-            for w in self.workers:
+            workers = list(self.workers)
+            # get state and heartbeat of all workers in one go
+            self.storage.refresh(workers)
+            for w in workers:
                 if w.state not in ['dead', 'down'] and now - w.seen > self._worker_dead_time:
-                    # make sure it will end and not finish any jobs, just in case
-                    w.command = 'kill'
-
-                    # and mark it dead
-                    w.state = 'dead'
-
-                    # search for abandoned tasks and do something with them
-                    if self._set_task_state_from_dead_workers:
-                        for t in self.tasks:
-                            if t.worker == w and t.state in ['queued', 'running']:
-                                t.state = self._set_task_state_from_dead_workers
-
-                    w.current = None
+                    # the worker fields are written together at the end,
+                    # task states are never buffered
+                    with self.storage.batch():
+                        # make sure it will end and not finish any jobs, just in case
+                        w.command = 'kill'
+
+                        # and mark it dead
+                        w.state = 'dead'
+
+                        # search for abandoned tasks and do something with them
+                        if self._set_task_state_from_dead_workers:
+                            tasks = list(self.tasks)
+                            self.storage.refresh(tasks)
+                            for t in tasks:
+                                if t.worker == w and t.state in ['queued', 'running']:
+                                    t.state = self._set_task_state_from_dead_workers
+
+                        w.current = None
 
     def run(self):
         """
@@ -280,6 +280,47 @@ class WorkerParser(ActionParser):
         return action
 
 
+class StageCacheParser(ActionParser):
+    """
+    A parser that stages task inputs from the worker's node-local cache
+
+    Files linked or copied from ``staging://`` and files stored in the DB
+    are added to the `stage_cache` of the scheduler and linked from there
+    into the task folder instead of being linked to the shared staging area
+    or written. Copies are made from the cache, so the source is not read
+    from the shared filesystem again. Without a `stage_cache` all actions
+    are left as is.
+
+    """
+    def parse(self, scheduler, action):
+        cache = getattr(scheduler, 'stage_cache', None)
+        if cache is None or not isinstance(action, FileTransaction):
+            return action
+
+        source = action.source
+        target = action.target
+
+        if target.drive != 'worker' or source.is_folder or target.is_folder:
+            return action
+
+        tp = scheduler.replace_prefix(target.url)
+
+        if isinstance(action, (Link, Copy)) and source.drive == 'staging':
+            sp = scheduler.replace_prefix(source.url)
+            if os.path.isfile(sp):
+                # tasks may change copied files, so these are real copies
+                mode = cache.stage_file(
+                    sp, tp, copy=isinstance(action, Copy))
+                return ['# %s `%s` from stage cache' % (mode, tp)]
+
+        elif isinstance(action, Transfer) and source.drive == 'file':
+            if source.has_file:
+                mode = cache.stage_data(source.get_file(), tp)
+                return ['# %s `%s` from stage cache' % (mode, tp)]
+
+        return action
+
+
 class PrefixParser(ActionParser):
     """
     Replace all adaptiveMD prefixes
@@ -1,5 +1,5 @@
 import time
-from pymongo import MongoClient
+from adaptivemd.mongodb.client import get_client
 from pprint import pprint
 from utils import hex_to_id, resolve_location
 from datetime import datetime
@@ -37,7 +37,7 @@ class Database():
         self.configuration_collection = 'configurations'
         self.file_collection = 'files'
         self.generator_collection = 'generators'
-        self.client = MongoClient(self.url)
+        self.client = get_client(self.url)
         self.db = self.client[self.store_name]
 
     def get_task_descriptions(self, state='created'):
@@ -95,7 +95,8 @@ class Database():
                                 timestamp = time.mktime(datetime.now().timetuple())
                                 result = file_col.update_one({'_id': file_id},
                                                              {'$set': {
-                                                                 'created': timestamp
+                                                                 'created': timestamp,
+                                                                 '_modified': time.time()
                                                              }})
                                 if (udpated is False) and (result.modified_count == 1):
                                     udpated = True
@@ -122,7 +123,8 @@ class Database():
                                 timestamp = time.mktime(datetime.now().timetuple())
                                 result = file_col.update_one({'_id': file_id},
                                                              {'$set': {
-                                                                 'created': (timestamp * -1)
+                                                                 'created': (timestamp * -1),
+                                                                 '_modified': time.time()
                                                              }})
                                 if result.modified_count == 1:
                                     udpated = True
@@ -0,0 +1,446 @@
+##############################################################################
+# adaptiveMD: A Python Framework to Run Adaptive Molecular Dynamics (MD)
+#             Simulations on HPC Resources
+# Copyright 2017 FU Berlin and the Authors
+#
+# Authors: Jan-Hendrik Prinz
+#          John Ossyra
+# Contributors:
+#
+# `adaptiveMD` is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 2.1
+# of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with MDTraj. If not, see <http://www.gnu.org/licenses/>.
+##############################################################################
+
+"""
+StageCache - A node-local cache of task input files keyed by content
+
+Tasks of the same generator use the same input files. Instead of copying
+or writing these into every task folder on the shared filesystem, a worker
+stores each content once in a cache directory on the node and links it
+into the task folder. All workers on a node can use the same directory.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import six
+
+
+class StageCache(object):
+    """
+    A directory of read-only files named by the sha256 of their content
+
+    Entries are written to a temporary file first and renamed into place, so
+    several workers can populate the same cache at the same time. Entries
+    of other users are only used if their content matches their name, since
+    anyone who can write to the cache could have added them. Entries
+    are staged as hardlinks or as symlinks if the target is on another
+    filesystem. Since all links share the entry, tasks must not change a
+    linked file in place but replace it. Files a task may change are staged
+    as writable copies of the entry instead.
+
+    Parameters
+    ----------
+    path : str
+        the cache directory, should be on a node-local filesystem
+    max_size : int or None
+        the maximal number of bytes in the cache. If None the size is not
+        limited
+    max_files : int or None
+        the maximal number of entries in the cache. If None the number is not
+        limited
+    keep : float
+        seconds an entry is kept after its last use even if a limit is
+        exceeded. Symlinks of running tasks would break otherwise
+
+    Attributes
+    ----------
+    stats : dict of str : int
+        `hits` and `misses` count staged files found in the cache or not,
+        `bytes_saved` the bytes that did not have to be read or written
+        thanks to hits, `bytes_stored` the bytes added to and `evicted`
+        the number of entries removed from the cache by this instance
+    """
+
+    block_size = 1 << 20
+
+    # seconds after which unfinished entries in `tmp` are removed
+    stale = 3600.0
+
+    def __init__(self, path, max_size=None, max_files=None, keep=3600.0):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_size = max_size
+        self.max_files = max_files
+        self.keep = keep
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytes_saved': 0,
+            'bytes_stored': 0,
+            'evicted': 0}
+
+        # the digests of source files by their stat signature
+        self._digests = {}
+
+        for folder in ['objects', 'tmp']:
+            _makedirs(os.path.join(self.path, folder))
+
+        self._remove_stale()
+
+    @property
+    def hit_rate(self):
+        """
+        float or None : the fraction of staged files found in the cache
+        """
+        total = self.stats['hits'] + self.stats['misses']
+        if not total:
+            return None
+
+        return float(self.stats['hits']) / total
+
+    def entry(self, digest):
+        """
+        Return the path of the entry of a content
+
+        Parameters
+        ----------
+        digest : str
+            the sha256 hex digest of the content
+
+        Returns
+        -------
+        str
+        """
+        return os.path.join(self.path, 'objects', digest[:2], digest)
+
+    def _hash(self, path):
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(self.block_size)
+                if not block:
+                    break
+
+                sha.update(block)
+
+        return sha.hexdigest()
+
+    def _hit(self, digest, size):
+        entry = self.entry(digest)
+        try:
+            if os.stat(entry).st_uid == os.getuid():
+                # the mtime of an entry is its last use
+                os.utime(entry, None)
+
+            elif self._hash(entry) != digest:
+                # added by another user with other content
+                return False
+
+        except (IOError, OSError) as e:
+            if e.errno == errno.ENOENT:
+                # evicted in the meantime
+                return False
+
+            raise
+
+        self.stats['hits'] += 1
+        self.stats['bytes_saved'] += size
+        return True
+
+    def _publish(self, tmp, digest, size):
+        # entries are shared by all links, so protect them from changes
+        os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        entry = self.entry(digest)
+        _makedirs(os.path.dirname(entry))
+
+        # atomic. If another worker was faster it is replaced by the same
+        # content and existing links keep the old file
+        os.rename(tmp, entry)
+
+        self.stats['misses'] += 1
+        self.stats['bytes_stored'] += size
+        self.evict()
+        return entry
+
+    def put_data(self, data):
+        """
+        Add content to the cache
+
+        Parameters
+        ----------
+        data : bytes or str
+            the content. Text is stored utf-8 encoded
+
+        Returns
+        -------
+        str
+            the path of the entry
+        """
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()
+        if self._hit(digest, len(data)):
+            return self.entry(digest)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.path, 'tmp'))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        return self._publish(tmp, digest, len(data))
+
+    def put_file(self, path):
+        """
+        Add the content of a file to the cache
+
+        The file is only read if it changed since it was added last by this
+        instance.
+
+        Parameters
+        ----------
+        path : str
+            the file
+
+        Returns
+        -------
+        str
+            the path of the entry
+        """
+        st = os.stat(path)
+        signature = (
+            os.path.abspath(path), st.st_dev, st.st_ino, st.st_size,
+            st.st_mtime)
+
+        digest = self._digests.get(signature)
+        if digest is not None and self._hit(digest, st.st_size):
+            return self.entry(digest)
+
+        # hash and copy in a single pass over the source
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.path, 'tmp'))
+        with os.fdopen(fd, 'wb') as f, open(path, 'rb') as source:
+            while True:
+                block = source.read(self.block_size)
+                if not block:
+                    break
+
+                sha.update(block)
+                f.write(block)
+
+        digest = sha.hexdigest()
+        self._digests[signature] = digest
+
+        if self._hit(digest, 0):
+            # the content is known, only the source was new to us
+            os.remove(tmp)
+            return self.entry(digest)
+
+        return self._publish(tmp, digest, st.st_size)
+
+    @staticmethod
+    def link(entry, target):
+        """
+        Make an entry available at a target location
+
+        Parameters
+        ----------
+        entry : str
+            the path of the entry
+        target : str
+            the path of the link to be created. An existing file is replaced
+
+        Returns
+        -------
+        str
+            `hardlink` or `symlink` if the target is on another filesystem
+        """
+        try:
+            os.remove(target)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+        try:
+            os.link(entry, target)
+            return 'hardlink'
+        except OSError:
+            os.symlink(entry, target)
+            return 'symlink'
+
+    @staticmethod
+    def copy(entry, target):
+        """
+        Make a writable copy of an entry at a target location
+
+        Parameters
+        ----------
+        entry : str
+            the path of the entry
+        target : str
+            the path of the copy to be created. An existing file is replaced
+
+        Returns
+        -------
+        str
+            `copy`
+        """
+        try:
+            os.remove(target)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+        # a new file, so it does not inherit the read-only mode of the entry
+        shutil.copyfile(entry, target)
+        return 'copy'
+
+    def stage_data(self, data, target):
+        """
+        Add content to the cache and link it to a target location
+
+        Parameters
+        ----------
+        data : bytes or str
+            the content
+        target : str
+            the path of the link
+
+        Returns
+        -------
+        str
+            `hardlink` or `symlink`
+        """
+        return self.link(self.put_data(data), target)
+
+    def stage_file(self, path, target, copy=False):
+        """
+        Add the content of a file to the cache and link it to a target
+
+        Parameters
+        ----------
+        path : str
+            the file
+        target : str
+            the path of the link
+        copy : bool
+            if True the target is a writable copy of the entry instead of a
+            link. The source is still only read if it changed
+
+        Returns
+        -------
+        str
+            `hardlink`, `symlink` or `copy`
+        """
+        entry = self.put_file(path)
+        if copy:
+            return self.copy(entry, target)
+
+        return self.link(entry, target)
+
+    def entries(self):
+        """
+        Return all entries with their size and time of last use
+
+        Returns
+        -------
+        list of (float, int, str)
+            the mtime, size and path of each entry
+        """
+        found = []
+        objects = os.path.join(self.path, 'objects')
+        for folder in os.listdir(objects):
+            folder = os.path.join(objects, folder)
+            for name in os.listdir(folder):
+                entry = os.path.join(folder, name)
+                try:
+                    st = os.stat(entry)
+                except OSError:
+                    # removed by another worker
+                    continue
+
+                found.append((st.st_mtime, st.st_size, entry))
+
+        return found
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the limits are met
+
+        Entries used in the last `keep` seconds are not removed. Unfinished
+        entries older than `stale` seconds are removed as well.
+
+        Returns
+        -------
+        int
+            the number of removed entries
+        """
+        self._remove_stale()
+
+        if self.max_size is None and self.max_files is None:
+            return 0
+
+        entries = sorted(self.entries())
+        size = sum(e[1] for e in entries)
+        count = len(entries)
+        protected = time.time() - self.keep
+
+        removed = 0
+        for mtime, entry_size, entry in entries:
+            if (self.max_size is None or size <= self.max_size) and \
+                    (self.max_files is None or count <= self.max_files):
+                break
+
+            if mtime > protected:
+                break
+
+            try:
+                os.remove(entry)
+                removed += 1
+            except OSError:
+                pass
+
+            size -= entry_size
+            count -= 1
+
+        self.stats['evicted'] += removed
+        return removed
+
+    def _remove_stale(self):
+        # files left by workers that stopped while adding an entry
+        folder = os.path.join(self.path, 'tmp')
+        stale = time.time() - self.stale
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            try:
+                if os.stat(path).st_mtime < stale:
+                    os.remove(path)
+            except OSError:
+                # finished in the meantime or of another user
+                pass
+
+
+def _makedirs(path):
+    # not writable by others, who could replace entries otherwise
+    try:
+        os.makedirs(path, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP |
+                    stat.S_IROTH | stat.S_IXOTH)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
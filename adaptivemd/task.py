@@ -193,9 +193,13 @@ class Task(BaseTask):
         ]
 
     _find_by = ['state', 'worker', 'stderr', 'stdout']
+    # `cuid` is set by the radical.pilot task manager
+    _index_by = ['_cls', 'state', 'worker', 'cuid']
 
-    state = SyncVariable('state', lambda x: x in ['success', 'cancelled'])
-    worker = ObjectSyncVariable('worker', 'workers')
+    # state and worker are used to claim tasks and are never write-behind
+    state = SyncVariable(
+        'state', lambda x: x in ['success', 'cancelled'], buffered=False)
+    worker = ObjectSyncVariable('worker', 'workers', buffered=False)
     stdout = ObjectSyncVariable('stdout', 'logs', lambda x: x is not None)
     stderr = ObjectSyncVariable('stderr', 'logs', lambda x: x is not None)
 
@@ -310,6 +314,83 @@ class Task(BaseTask):
 
         return True
 
+    def query_fields(self):
+        """
+        Return the fields used to select ready tasks on the DB
+
+        Returns
+        -------
+        dict
+            `_generator` contains the name of the generator, `_resource_name`
+            the list of allowed resources, `_cpu_threads` and `_gpu_contexts`
+            the required resources and `_pending` the ids of all
+            dependencies that have not been successful yet
+
+        """
+        generator = self.generator
+        dependencies = self.dependencies or []
+        requirements = self.resource_requirements or {}
+
+        return {
+            '_generator': getattr(generator, 'name', None),
+            '_resource_name': self.resource_name,
+            '_cpu_threads': requirements.get('cpu_threads', 1),
+            '_gpu_contexts': requirements.get('gpu_contexts', 0),
+            '_pending': [
+                str(uuid.UUID(int=d.__uuid__)) for d in dependencies
+                if d.state != 'success']
+        }
+
+    @staticmethod
+    def ready_query(generators=None, resource_names=None,
+                    cpu_threads=None, gpu_contexts=None):
+        """
+        Return a DB query that matches tasks ready for execution
+
+        Parameters
+        ----------
+        generators : list of str or None
+            if not None only tasks from generators with these names match
+        resource_names : list of str or None
+            if not None only tasks that can run on any of these resources
+            or are not restricted to a resource match
+        cpu_threads : int or None
+            if not None only tasks requiring at most this number of cpu
+            threads match
+        gpu_contexts : int or None
+            if not None only tasks requiring at most this number of gpu
+            contexts match
+
+        Returns
+        -------
+        dict
+            the query to be used with `ObjectStore.claim_one`
+
+        """
+        query = {'_pending': []}
+
+        if generators:
+            query['_generator'] = {'$in': list(generators)}
+
+        if resource_names:
+            query['$or'] = [
+                {'_resource_name': None},
+                {'_resource_name': []},
+                {'_resource_name': {'$in': list(resource_names)}}]
+
+        limits = [
+            # tasks stored by earlier versions do not have the field
+            {'$or': [{field: None}, {field: {'$lte': limit}}]}
+            for field, limit in [
+                ('_cpu_threads', cpu_threads),
+                ('_gpu_contexts', gpu_contexts)]
+            if limit is not None]
+
+        if limits:
+            query['$and'] = limits
+
+        return query
+
     def _default_fail(self, scheduler, path=None):
         """
         the default function executed when a task fails
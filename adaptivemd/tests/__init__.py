@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from adaptivemd.mongodb import (MongoDBStorage, ObjectStore, FileStore,
+                                close_clients)
+
+
+def _find_mongod():
+    # like for a `Project` the location is taken from `ADMD_DBURL`
+    url = os.environ.get('ADMD_DBURL', 'mongodb://localhost:27017/')
+    if not url.startswith('mongodb://'):
+        return None
+
+    try:
+        client = MongoClient(url, serverSelectionTimeoutMS=500)
+        client.server_info()
+        client.close()
+    except PyMongoError:
+        return None
+
+    return url
+
+
+# the URL of a running mongod or None
+mongod_url = _find_mongod()
+
+# run tests of the sqlite backend against mongodb as well
+requires_mongod = unittest.skipIf(
+    mongod_url is None, 'requires a running mongod')
+
+
+class StorageTestCase(unittest.TestCase):
+    """
+    A test with a new storage, by default in an embedded sqlite DB
+
+    Subclasses set the `name` of the storage and the `stores` and
+    `file_stores` it contains as tuples of the store name and the content
+    class. Set `url` to `mongod_url` to run the same tests against mongodb.
+    """
+
+    name = 'test'
+    url = 'sqlite://:memory:'
+    stores = []
+    file_stores = []
+
+    def setUp(self):
+        self._url = MongoDBStorage._db_url
+        MongoDBStorage._db_url = self.url
+
+        self.storage = MongoDBStorage(self.name, 'w')
+        for name, content_class in self.stores:
+            self.storage.create_store(ObjectStore(name, content_class))
+
+        for name, content_class in self.file_stores:
+            self.storage.create_store(FileStore(name, content_class))
+
+        self.storage.finalize_stores()
+
+    def tearDown(self):
+        self.storage.close()
+        MongoDBStorage.delete_storage(self.name)
+        close_clients()
+        MongoDBStorage._db_url = self._url
@@ -0,0 +1,70 @@
+import unittest
+
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import AsyncStorage
+from adaptivemd.mongodb.aio import asyncio
+from adaptivemd.task import Task
+from adaptivemd.tests import StorageTestCase
+
+
+@unittest.skipIf(asyncio is None, 'requires asyncio')
+class TestAsyncStorage(StorageTestCase):
+
+    name = 'test-aio'
+    stores = [('logs', LogEntry), ('tasks', Task)]
+
+    def setUp(self):
+        super(TestAsyncStorage, self).setUp()
+        self.storage.logs.set_caching(True)
+        self.storage.tasks.set_caching(True)
+
+        self.loop = asyncio.new_event_loop()
+        self.async_storage = AsyncStorage(self.storage, loop=self.loop)
+
+    def tearDown(self):
+        self.async_storage.close()
+        self.loop.close()
+        super(TestAsyncStorage, self).tearDown()
+
+    def run_all(self, futures):
+        return self.loop.run_until_complete(asyncio.gather(*futures))
+
+    def test_save_load(self):
+        logs = self.async_storage.logs
+        entries = [LogEntry('test', str(n), 'message') for n in range(10)]
+
+        self.run_all([logs.save(entry) for entry in entries])
+        self.assertEqual(self.loop.run_until_complete(logs.count()), 10)
+
+        self.storage.logs.clear_cache()
+        loaded = self.run_all([logs.load(e.__uuid__) for e in entries])
+        self.assertEqual([e.title for e in loaded], [str(n) for n in range(10)])
+
+    def test_shared_dependency(self):
+        tasks = self.async_storage.tasks
+        shared = Task()
+        dependent = []
+        for _ in range(20):
+            task = Task()
+            task.dependencies = [shared]
+            dependent.append(task)
+
+        # all saves reference the same new object, which must be stored once
+        self.run_all([tasks.save(task) for task in dependent])
+        self.assertEqual(self.loop.run_until_complete(tasks.count()), 21)
+        self.assertEqual(self.storage.tasks._document.count({}), 21)
+        self.assertEqual(len(self.storage.tasks.index), 21)
+
+    def test_sync_variables(self):
+        tasks = self.async_storage.tasks
+        objs = [Task() for _ in range(5)]
+        self.loop.run_until_complete(tasks.save(objs))
+
+        self.run_all([tasks.write(obj, 'state', 'queued') for obj in objs])
+        self.assertEqual(
+            self.loop.run_until_complete(tasks.read_many(objs, 'state')),
+            ['queued'] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
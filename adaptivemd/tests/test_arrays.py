@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from adaptivemd.model import Model
+from adaptivemd.mongodb import DataDict
+from adaptivemd.tests import StorageTestCase
+
+
+class TestArrays(StorageTestCase):
+
+    name = 'test-arrays'
+    stores = [('models', Model)]
+    file_stores = [('data', DataDict)]
+
+    def setUp(self):
+        super(TestArrays, self).setUp()
+        self.arrays = self.storage.simplifier.array_grid
+
+        self.small = np.arange(100, dtype=np.float64)
+        self.large = np.random.random((400, 400))
+        self.assertGreater(
+            self.large.nbytes, self.storage.simplifier.gridfs_array_threshold)
+
+    def _reload(self, store, obj):
+        store.clear_cache()
+        store.index.clear()
+        return store.load(obj.__uuid__)
+
+    def test_document(self):
+        model = Model({'small': self.small, 'large': self.large})
+        self.storage.models.save(model)
+
+        dct = self.storage.models._document.find_one()
+        self.assertIn('_binary', dct['_dict']['data']['small'])
+        self.assertIn('_gridfs', dct['_dict']['data']['large'])
+        self.assertEqual(len(list(self.arrays.find())), 1)
+
+        loaded = self._reload(self.storage.models, model)
+        self.assertIsNot(loaded, model)
+        np.testing.assert_array_equal(loaded.data['small'], self.small)
+        np.testing.assert_array_equal(loaded.data['large'], self.large)
+
+        # arrays are removed with their document
+        self.assertEqual(
+            self.storage.models.consume_one().__uuid__, model.__uuid__)
+        self.assertEqual(len(list(self.arrays.find())), 0)
+
+    def test_data_dict(self):
+        model = Model(DataDict({
+            'msm': {'small': self.small, 'large': self.large},
+            'k': 2}))
+        self.storage.models.save(model)
+
+        # only large arrays are stored outside of the JSON
+        self.assertEqual(len(list(self.arrays.find())), 1)
+
+        self._reload(self.storage.data, model.data)
+        loaded = self._reload(self.storage.models, model)
+        self.assertIsNot(loaded.data, model.data)
+        self.assertEqual(loaded.data['k'], 2)
+        np.testing.assert_array_equal(loaded.data['msm']['small'], self.small)
+        np.testing.assert_array_equal(loaded.data['msm']['large'], self.large)
+
+    def test_base64(self):
+        self.storage.simplifier.binary_arrays = False
+        model = Model(DataDict({'large': self.large}))
+        self.storage.models.save(model)
+        self.assertEqual(len(list(self.arrays.find())), 0)
+
+        self._reload(self.storage.data, model.data)
+        loaded = self._reload(self.storage.models, model)
+        np.testing.assert_array_equal(loaded.data['large'], self.large)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from adaptivemd import File, Trajectory
+from adaptivemd.bundle import StoredBundle, SortedBundle
+from adaptivemd.mongodb import MongoDBStorage
+from adaptivemd.tests import StorageTestCase, mongod_url, requires_mongod
+
+
+class TestQueryBundle(StorageTestCase):
+
+    name = 'test-bundle-query'
+    stores = [('files', File)]
+
+    def setUp(self):
+        super(TestQueryBundle, self).setUp()
+        self.storage.close()
+
+        self.storage = MongoDBStorage(self.name)
+        self.storage.files.set_caching(True)
+        pdb = File('file://alanine.pdb')
+        self.storage.files.save(
+            [File('file://%d.txt' % n) for n in range(5)] +
+            [Trajectory('project:///trajs/%d' % n, pdb, 100 + n)
+             for n in range(3)])
+        self.storage.close()
+
+        self.storage = MongoDBStorage(self.name)
+        self.storage.files.set_caching(True)
+        self.files = StoredBundle().set_store(self.storage.files)
+
+    def test_class(self):
+        trajs = self.files.c(Trajectory)
+        self.assertEqual(trajs.query, {'_cls': {'$in': ['Trajectory']}})
+        self.assertEqual(len(trajs), 3)
+        self.assertEqual(len(list(trajs)), 3)
+        # only the trajectories and their initial frame are loaded
+        self.assertEqual(len(self.storage.files.cache), 4)
+
+    def test_chained(self):
+        found = list(self.files.c(Trajectory).m('length', 101))
+        self.assertEqual([t.length for t in found], [101])
+        self.assertEqual(len(self.files.find_all_by('length', 102)), 1)
+
+    def test_pattern(self):
+        found = self.files.c(Trajectory).a('location', 'trajs/2')
+        self.assertEqual(len(list(found)), 1)
+        self.assertEqual(
+            len(list(self.files.c(Trajectory).v(lambda x: x.length > 100))),
+            2)
+
+    def test_sorted(self):
+        trajs = self.files.c(Trajectory).sorted('length', reverse=True)
+        self.assertEqual(trajs.sort, [('length', -1)])
+        self.assertEqual([t.length for t in trajs], [102, 101, 100])
+        self.assertEqual(trajs.first.length, 102)
+        self.assertEqual(trajs.last.length, 100)
+        self.assertEqual([t.length for t in trajs.top(2)], [102, 101])
+        # functions are sorted in python
+        self.assertEqual(
+            self.files.c(Trajectory).sorted(lambda x: -x.length).first.length,
+            102)
+
+    def test_sorted_property(self):
+        # properties are not stored and are sorted in python
+        by_dirname = self.files.sorted('dirname')
+        self.assertIsInstance(by_dirname, SortedBundle)
+        self.assertEqual(
+            [f.dirname for f in by_dirname],
+            sorted(f.dirname for f in self.storage.files))
+
+        by_location = self.files.sorted('location', reverse=True)
+        self.assertEqual(by_location.sort, [('_dict.location', -1)])
+        self.assertEqual(
+            [f.location for f in by_location],
+            sorted((f.location for f in self.storage.files), reverse=True))
+
+    def test_first_last_sample(self):
+        files = self.storage.files
+        self.assertEqual(self.files.first, files.first)
+        new = File('file://new.txt')
+        files.save(new)
+        self.assertEqual(files.last, new)
+        self.assertEqual(self.files.c(File).last, new)
+        trajs = self.files.c(Trajectory)
+        picked = trajs.sample(2)
+        self.assertEqual(len(picked), 2)
+        self.assertTrue(all(isinstance(t, Trajectory) for t in picked))
+        self.assertEqual(len(trajs.sample(10)), 3)
+        self.assertIsInstance(trajs.pick(), Trajectory)
+        self.assertIn(files.pick(), list(files))
+
+
+@requires_mongod
+class TestQueryBundleMongoDB(TestQueryBundle):
+
+    url = mongod_url
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from adaptivemd.mongodb import ByteLRUCache, CacheBudget
+
+
+class Item(object):
+    def __init__(self, size):
+        self.size = size
+
+
+def sizer(item):
+    return item.size
+
+
+class TestByteLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [Item(10) for _ in range(5)]
+        self.cache = ByteLRUCache(30, sizer=sizer)
+
+    def test_eviction(self):
+        for n, item in enumerate(self.items):
+            self.cache[n] = item
+
+        self.assertEqual(self.cache.nbytes, 30)
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertEqual(self.cache.count, (3, 2))
+
+    def test_lru_order(self):
+        for n, item in enumerate(self.items[:3]):
+            self.cache[n] = item
+
+        self.cache[0]
+        self.cache[3] = self.items[3]
+        self.assertEqual(list(self.cache._cache), [2, 0, 3])
+
+    def test_counters(self):
+        self.cache[0] = self.items[0]
+        self.cache[0]
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.stats['hits'], 1)
+        self.assertEqual(self.cache.stats['misses'], 1)
+
+    def test_evicted_alive(self):
+        for n, item in enumerate(self.items):
+            self.cache[n] = item
+
+        # still referenced, so found in the weak part
+        self.assertIs(self.cache[0], self.items[0])
+
+    def test_delete(self):
+        self.cache[0] = self.items[0]
+        del self.cache[0]
+        self.assertNotIn(0, self.cache)
+        self.assertEqual(self.cache.nbytes, 0)
+
+
+class TestCacheBudget(unittest.TestCase):
+
+    def test_shared_limit(self):
+        budget = CacheBudget(25)
+        pinned = ByteLRUCache(budget=budget, pinned=True, sizer=sizer)
+        first = ByteLRUCache(budget=budget, sizer=sizer)
+        second = ByteLRUCache(budget=budget, sizer=sizer)
+        items = [Item(10) for _ in range(4)]
+
+        pinned[0] = items[0]
+        first[1] = items[1]
+        second[2] = items[2]
+        self.assertEqual(budget.nbytes, 20)
+        self.assertEqual(first.evictions, 1)
+
+        second[3] = items[3]
+        self.assertEqual(budget.nbytes, 20)
+        self.assertEqual(second.evictions, 1)
+        self.assertEqual(pinned.evictions, 0)
+        self.assertEqual(budget.stats['evictions'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
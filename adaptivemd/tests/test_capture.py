@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from adaptivemd.capture import StreamCapture, read_compressed
+from adaptivemd.tests import StorageTestCase
+
+
+class TestStreamCapture(StorageTestCase):
+
+    name = 'test-capture'
+
+    def setUp(self):
+        super(TestStreamCapture, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.capture = StreamCapture(
+            os.path.join(self.path, 'out'), head=10, tail=20)
+
+    def tearDown(self):
+        self.capture.close()
+        shutil.rmtree(self.path)
+        super(TestStreamCapture, self).tearDown()
+
+    def test_short(self):
+        self.capture.write(b'0123456789')
+        self.capture.write(b'abc')
+        self.assertEqual(self.capture.skipped, 0)
+        self.assertEqual(self.capture.excerpt(), b'0123456789abc')
+        self.assertEqual(self.capture.tail(5), b'89abc')
+
+    def test_long(self):
+        data = b''.join(b'%04d' % n for n in range(1000))
+        for pos in range(0, len(data), 7):
+            self.capture.write(data[pos:pos + 7])
+
+        self.assertEqual(self.capture.size, len(data))
+        self.assertEqual(self.capture.skipped, len(data) - 30)
+        excerpt = self.capture.excerpt()
+        self.assertTrue(excerpt.startswith(data[:10]))
+        self.assertTrue(excerpt.endswith(data[-20:]))
+        self.assertIn(b'3970 bytes skipped', excerpt)
+        self.assertEqual(self.capture.tail(), data[-20:])
+
+        with open(self.capture.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_upload(self):
+        grid = self.storage.create_grid('logs')
+        data = b'line of output\n' * 10000
+        self.capture.write(data)
+        self.capture.upload(grid, 'log', stream='stdout')
+
+        stored = grid.get('log')
+        self.assertLess(stored.length, len(data) // 10)
+        self.assertEqual(stored.raw_length, len(data))
+        self.assertEqual(read_compressed(grid, 'log'), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from adaptivemd import File, Trajectory, Frame, TrajectoryCatalog
+from adaptivemd.mongodb import MongoDBStorage
+from adaptivemd.tests import StorageTestCase
+
+
+class TestTrajectoryCatalog(StorageTestCase):
+
+    name = 'test-catalog'
+    stores = [('files', File)]
+
+    def setUp(self):
+        super(TestTrajectoryCatalog, self).setUp()
+        self.storage.close()
+
+        self.storage = MongoDBStorage(self.name)
+        self.storage.files.set_caching(True)
+        self.pdb = File('file://alanine.pdb')
+        self.trajs = [
+            Trajectory('project:///trajs/%d' % n, self.pdb, 100 + n)
+            for n in range(3)]
+        self.storage.files.save(self.trajs)
+
+        self.catalog = TrajectoryCatalog().set_store(self.storage.files)
+        self.catalog.staleness = 0
+        self.trajectories = self.catalog.bundle()
+
+    def test_entries(self):
+        self.assertEqual(len(self.catalog.entries()), 3)
+        self.assertEqual(len(self.trajectories), 0)
+        entry = self.catalog.get(self.trajs[1].__uuid__)
+        self.assertEqual(entry.length, 101)
+        self.assertEqual(entry.parent, self.pdb.__uuid__)
+        self.assertIsNone(entry.parent_frame)
+
+    def test_incremental(self):
+        self.catalog.refresh()
+        self.trajs[0].created = time.time()
+        self.trajs[2].created = time.time()
+        ext = Trajectory('project:///trajs/3', Frame(self.trajs[0], 10), 50)
+        self.storage.files.save(ext)
+
+        self.assertEqual(len(self.trajectories), 2)
+        self.assertIn(self.trajs[2], self.trajectories)
+        self.assertNotIn(self.trajs[1], self.trajectories)
+        self.assertEqual(self.catalog.stats['full'], 1)
+        self.assertEqual(
+            self.catalog.get(ext.__uuid__).parent_frame, 10)
+
+        self.trajs[0].created = -time.time()
+        self.assertEqual(list(self.trajectories), [self.trajs[2]])
+
+    def test_filter_and_sort(self):
+        for traj in self.trajs:
+            traj.created = time.time()
+
+        self.assertEqual(len(self.trajectories.m('length', 101)), 1)
+        self.assertEqual(
+            [t.length for t in self.trajectories.sorted('length', True)],
+            [102, 101, 100])
+        self.assertEqual(
+            self.trajectories.sorted('length').first, self.trajs[0])
+        self.assertEqual(len(self.trajectories.sample(2)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import MongoDBStorage
+from adaptivemd.tests import StorageTestCase
+
+
+class TestCheckSize(StorageTestCase):
+
+    name = 'test-check-size'
+    stores = [('logs', LogEntry)]
+
+    def setUp(self):
+        super(TestCheckSize, self).setUp()
+        self.storage.logs.save(self._entries(3))
+
+        # a second process using the same DB, which loaded the index
+        self.other = MongoDBStorage(self.name)
+
+        self.logs = self.other.logs
+        self.logs.count_staleness = 3600.0
+        self.logs.check_size(True)
+
+    def tearDown(self):
+        self.other.close()
+        super(TestCheckSize, self).tearDown()
+
+    @staticmethod
+    def _entries(n):
+        return [LogEntry('test', str(i), 'message') for i in range(n)]
+
+    def _stats(self):
+        return self.logs.refresh_statistics
+
+    def test_incremental(self):
+        entries = self._entries(2)
+        self.storage.logs.save(entries)
+        stats = self._stats()
+
+        self.assertTrue(self.logs.check_size(True))
+        self.assertEqual(len(self.logs.index), 5)
+        self.assertEqual(self._stats()['incremental'], stats['incremental'] + 1)
+        self.assertEqual(self._stats()['fetched'], stats['fetched'] + 2)
+        self.assertEqual(self._stats()['full'], stats['full'])
+
+        self.assertFalse(self.logs.check_size(True))
+
+    def test_overlap(self):
+        entries = self._entries(2)
+        self.storage.logs.save(entries)
+        stats = self._stats()
+
+        # saved by a process with a clock far behind, outside the look back
+        self.logs._document.update_many(
+            {}, {'$set': {'_saved': time.time() - 3600.0}})
+        self.logs._index_saved = time.time()
+
+        self.assertTrue(self.logs.check_size(True))
+        self.assertEqual(len(self.logs.index), 5)
+        self.assertEqual(self._stats()['full'], stats['full'] + 1)
+
+    def test_count_staleness(self):
+        stats = self._stats()
+        self.storage.logs.save(self._entries(1))
+
+        # the last count is reused
+        self.assertFalse(self.logs.check_size())
+        self.assertEqual(self._stats()['count'], stats['count'])
+        self.assertEqual(
+            self._stats()['count_cached'], stats['count_cached'] + 1)
+
+        self.logs.count_staleness = 0.0
+        self.assertTrue(self.logs.check_size())
+        self.assertEqual(self._stats()['count'], stats['count'] + 1)
+
+    def test_miss(self):
+        entry = LogEntry('test', 'other', 'message')
+        stats = self._stats()
+
+        # known objects do not need the server
+        self.assertTrue(self.logs.load(self.logs.index[0]) in self.logs)
+        self.assertEqual(self._stats()['count'], stats['count'])
+
+        self.assertFalse(entry in self.logs)
+        self.assertEqual(self._stats()['count'], stats['count'] + 1)
+
+        # a miss is never answered from a cached count, since the object
+        # could have been saved by another process since the last count
+        self.storage.logs.save(entry)
+        self.assertTrue(entry in self.logs)
+        self.assertEqual(self.logs.get(entry.__uuid__).title, 'other')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from adaptivemd import Task, Worker
+from adaptivemd.tests import StorageTestCase, mongod_url, requires_mongod
+
+
+class _UnreadyTask(Task):
+    # e.g. a `TrajectoryExtensionTask` whose source does not exist yet
+    @property
+    def ready(self):
+        return False
+
+
+class _Project(object):
+    def __init__(self, storage):
+        self.storage = storage
+
+
+class TestClaim(StorageTestCase):
+
+    name = 'test-claim'
+    stores = [('tasks', Task)]
+
+    def setUp(self):
+        super(TestClaim, self).setUp()
+        self.storage.tasks.set_caching(True)
+        self.tasks = self.storage.tasks
+
+    def _claim(self, **kwargs):
+        return self.tasks.claim_one(
+            Task.ready_query(), 'state', 'created', 'queued', **kwargs)
+
+    def test_claim_one(self):
+        tasks = [Task() for _ in range(3)]
+        self.tasks.save(tasks)
+
+        claimed = [self._claim() for _ in range(4)]
+        self.assertEqual(set(claimed[:3]), set(tasks))
+        self.assertIsNone(claimed[3])
+        self.assertEqual([t.state for t in tasks], ['queued'] * 3)
+
+    def test_exclude(self):
+        tasks = [Task() for _ in range(2)]
+        self.tasks.save(tasks)
+
+        self.assertIs(self._claim(exclude=[tasks[0]]), tasks[1])
+        self.assertIsNone(self._claim(exclude=[tasks[0]]))
+        self.assertEqual(tasks[0].state, 'created')
+
+    def test_release_one(self):
+        task = Task()
+        self.tasks.save(task)
+        self.assertIs(self._claim(), task)
+
+        self.assertTrue(self.tasks.release_one(task, 'state', 'queued', 'created'))
+        self.assertEqual(task.state, 'created')
+        self.assertFalse(self.tasks.release_one(task, 'state', 'queued', 'created'))
+
+        # released tasks can be claimed again
+        self.assertIs(self._claim(), task)
+
+    def test_resolve_pending(self):
+        first = Task()
+        second = Task()
+        second.dependencies = [first]
+        self.tasks.save([first, second])
+
+        self.assertIs(self._claim(), first)
+        self.assertIsNone(self._claim())
+
+        self.assertEqual(
+            self.tasks.resolve_pending({'state': 'created'}, 'state', 'success'),
+            0)
+        first.state = 'success'
+        self.assertEqual(
+            self.tasks.resolve_pending({'state': 'created'}, 'state', 'success'),
+            1)
+        self.assertIs(self._claim(), second)
+
+    def test_unready_head(self):
+        unready = [_UnreadyTask() for _ in range(3)]
+        ready = Task()
+        self.tasks.save(unready + [ready])
+
+        worker = Worker()
+        worker._project = _Project(self.storage)
+
+        # the unready tasks come first but do not block the ready one
+        self.assertIs(worker._claim_task(Task.ready_query()), ready)
+        self.assertEqual([t.state for t in unready], ['created'] * 3)
+        self.assertEqual(ready.state, 'queued')
+
+        self.assertIsNone(worker._claim_task(Task.ready_query()))
+        self.assertEqual([t.state for t in unready], ['created'] * 3)
+
+        # releases are marked, so they do not wake up workers
+        self.assertIn(
+            '_released', self.tasks._document.find_one({'state': 'created'}))
+
+
+@requires_mongod
+class TestClaimMongoDB(TestClaim):
+
+    url = mongod_url
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import unittest
+
+from adaptivemd.mongodb import get_client, close_clients, pool_stats
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    url = 'mongodb://localhost:27017/'
+
+    def tearDown(self):
+        close_clients()
+
+    def test_shared(self):
+        self.assertIs(get_client(self.url), get_client(self.url))
+        self.assertIn(self.url, pool_stats())
+
+    def test_close(self):
+        client = get_client(self.url)
+        close_clients()
+        self.assertEqual(pool_stats(), {})
+        self.assertIsNot(get_client(self.url), client)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        client = get_client(self.url)
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, b'1' if get_client(self.url) is client else b'0')
+            os._exit(0)
+
+        os.waitpid(pid, 0)
+        self.assertEqual(os.read(read, 1), b'0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from adaptivemd.model import Model
+from adaptivemd.mongodb import DataDict
+from adaptivemd.mongodb.file import DataSection
+from adaptivemd.tests import StorageTestCase
+
+
+class TestDataDict(StorageTestCase):
+
+    name = 'test-data-dict'
+    stores = [('models', Model)]
+    file_stores = [('data', DataDict)]
+
+    def _load(self, data):
+        store = self.storage.data
+        store.clear_cache()
+        store.index.clear()
+        return store.load(data.__uuid__)
+
+    def test_sections(self):
+        data = DataDict({'msm': {'lagtime': 2}, 'k': 10})
+        first = data.to_dict()['data']
+        second = data.to_dict()['data']
+        self.assertTrue(all(
+            isinstance(section, DataSection) for section in first.values()))
+        self.assertEqual(
+            {key: s.__uuid__ for key, s in first.items()},
+            {key: s.__uuid__ for key, s in second.items()})
+
+        # the same sections are saved with each model
+        self.storage.models.save(Model(data))
+        self.storage.models.save(Model(data))
+        self.assertEqual(len(self.storage.data), 3)
+
+        # the dict of the caller is left as is
+        self.assertEqual(data.data, {'msm': {'lagtime': 2}, 'k': 10})
+
+    def test_loaded(self):
+        data = DataDict({'msm': {'lagtime': 2}, 'k': 10})
+        sections = {
+            key: s.__uuid__ for key, s in data.to_dict()['data'].items()}
+        self.storage.data.save(data)
+        loaded = self._load(data)
+
+        # sections are kept whether they were loaded yet or not
+        loaded['k']
+        self.assertEqual(
+            {key: s.__uuid__ for key, s in loaded.to_dict()['data'].items()},
+            sections)
+
+    def test_access(self):
+        data = DataDict({'msm': {'lagtime': 2}, 'k': 10})
+        self.storage.data.save(data)
+        loaded = self._load(data)
+
+        for dct in [data, loaded]:
+            self.assertEqual(dct['k'], 10)
+            self.assertEqual(dct.get('msm'), {'lagtime': 2})
+            self.assertIsNone(dct.get('tica'))
+            self.assertEqual(sorted(dct), ['k', 'msm'])
+            self.assertEqual(sorted(dct.keys()), ['k', 'msm'])
+            self.assertEqual(
+                sorted(dct.items()), [('k', 10), ('msm', {'lagtime': 2})])
+            self.assertIn({'lagtime': 2}, dct.values())
+
+
+if __name__ == '__main__':
+    unittest.main()
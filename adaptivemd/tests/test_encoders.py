@@ -0,0 +1,80 @@
+import math
+import unittest
+from uuid import UUID
+
+import numpy as np
+
+from adaptivemd import File, Task
+from adaptivemd.mongodb import ObjectStore
+from adaptivemd.mongodb.dictify import ObjectJSON
+from adaptivemd.tests import StorageTestCase
+
+
+class TestEncoders(StorageTestCase):
+
+    name = 'test-encoders'
+    stores = [('tasks', Task)]
+
+    def setUp(self):
+        super(TestEncoders, self).setUp()
+        self.simplifier = self.storage.simplifier
+
+    def test_values(self):
+        simplifier = ObjectJSON()
+        values = [
+            (1, 1),
+            ('a', 'a'),
+            (None, None),
+            (True, True),
+            (1.5, 1.5),
+            (float('inf'), {'_float': 'inf'}),
+            (np.int64(3), 3),
+            (np.float64(0.5), 0.5),
+            (np.bool_(True), True),
+            ((1, 'a'), {'_tuple': [1, 'a']}),
+            ([1, (2,)], [1, {'_tuple': [2]}]),
+            ({'a': [1, None]}, {'a': [1, None]}),
+            ({1.5: 'a'}, {'_dict': [{'_tuple': [1.5, 'a']}]}),
+            (slice(1, 5, 2), {'_slice': [1, 5, 2]}),
+            (int, {'_type': 'int'}),
+            (math, {'_import': 'math'}),
+        ]
+
+        for _ in range(2):
+            # the second pass uses the cached encoders
+            for value, simple in values:
+                self.assertEqual(simplifier.simplify(value), simple)
+
+            simplifier.reset_serializers()
+
+        array = simplifier.build(simplifier.simplify(np.arange(3)))
+        np.testing.assert_array_equal(array, np.arange(3))
+
+    def test_objects(self):
+        source = File('file://input.pdb')
+        task = Task()
+        task.link(source)
+        task.append('python run.py')
+
+        first = self.simplifier.to_simple_dict(task)
+        self.assertEqual(first['_cls'], 'Task')
+        self.assertEqual(first['_obj_uuid'], str(UUID(int=task.__uuid__)))
+        self.assertEqual(self.simplifier.to_simple_dict(task), first)
+
+        self.assertEqual(
+            first['_dict']['_main'][0]['_dict']['source']['_cls'], 'File')
+
+        # adding a store resets the encoders, which now create references
+        self.storage.create_store(ObjectStore('files', File))
+        second = self.simplifier.to_simple_dict(task)
+        self.assertNotEqual(second, first)
+        self.assertEqual(
+            second['_dict']['_main'][0]['_dict']['source'],
+            {'_hex_uuid': hex(source.__uuid__), '_store': 'files'})
+
+        self.simplifier.reset_serializers()
+        self.assertEqual(self.simplifier.to_simple_dict(task), second)
+
+
+if __name__ == '__main__':
+    unittest.main()
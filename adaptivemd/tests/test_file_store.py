@@ -0,0 +1,68 @@
+import unittest
+from uuid import UUID
+
+from adaptivemd.mongodb import MongoDBStorage, DataDict
+from adaptivemd.tests import StorageTestCase
+
+
+class TestFileStore(StorageTestCase):
+
+    name = 'test-file-store'
+    file_stores = [('data', DataDict)]
+
+    def setUp(self):
+        super(TestFileStore, self).setUp()
+
+        data = DataDict({'k': 2})
+        data.sectioned = False
+        self.data = [data.named('first'), DataDict([1, 2, 3])]
+        for data in self.data:
+            self.storage.data.save(data)
+
+    def test_metadata(self):
+        store = self.storage.data
+        dct = store._document.find_one(
+            {'_id': str(UUID(int=self.data[0].__uuid__))})
+
+        self.assertEqual(dct['name'], 'first')
+        self.assertEqual(dct['_time'], int(self.data[0].__time__))
+        self.assertEqual(
+            dct['size'], len(self.storage.simplifier.to_json_object(
+                self.data[0])))
+        self.assertIn('_saved', dct)
+
+        # counts and lookups only use the metadata
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store._document.count(), 2)
+        self.assertIn(self.data[1], store)
+
+    def test_migrate(self):
+        # files written before the metadata documents existed
+        self.storage.data._document.delete_many({})
+        self.storage.close()
+
+        storage = MongoDBStorage(self.name)
+        store = storage.data
+        self.assertEqual(len(store), 2)
+        self.assertEqual(
+            set(store.index), set(data.__uuid__ for data in self.data))
+
+        dct = store._document.find_one(
+            {'_id': str(UUID(int=self.data[0].__uuid__))})
+        self.assertEqual(dct['name'], 'first')
+        self.assertEqual(dct['_time'], int(self.data[0].__time__))
+        self.assertEqual(
+            dct['size'],
+            store.grid.find_one({'_id': hex(self.data[0].__uuid__)}).length)
+
+        store.clear_cache()
+        self.assertEqual(store.load(self.data[1].__uuid__).data, [1, 2, 3])
+
+        # migrating again does not change anything
+        store._migrate_metadata()
+        self.assertEqual(store._document.count(), 2)
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
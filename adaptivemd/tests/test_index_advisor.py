@@ -0,0 +1,52 @@
+import unittest
+from collections import namedtuple
+
+from adaptivemd.mongodb import IndexAdvisor
+from adaptivemd.mongodb.advisor import query_shape, command_shape
+
+Started = namedtuple(
+    'Started', ['command_name', 'command', 'connection_id', 'request_id'])
+Succeeded = namedtuple(
+    'Succeeded', ['connection_id', 'request_id', 'duration_micros'])
+
+
+class TestIndexAdvisor(unittest.TestCase):
+
+    def test_shape(self):
+        self.assertEqual(
+            query_shape({'state': 'created', '_time': {'$gt': 5}}),
+            (('_time', 'range'), ('state', 'eq')))
+        self.assertEqual(
+            query_shape({'$or': [{'name': 'a'}, {'_dict.name': 'a'}]}),
+            (('_dict.name', 'eq'), ('name', 'eq')))
+        self.assertEqual(
+            command_shape('find', {
+                'find': 'tasks', 'filter': {'state': 'created'},
+                'sort': {'_time': -1}}),
+            ('tasks', 'find', (('state', 'eq'),), ('_time',)))
+        self.assertIsNone(command_shape('insert', {'insert': 'tasks'}))
+
+    def test_report(self):
+        advisor = IndexAdvisor(slow_ms=5)
+        command = {
+            'find': 'tasks', 'filter': {'state': 'created', 'n': {'$gt': 1}},
+            'sort': {'_time': 1}}
+        for request_id, micros in enumerate([1000, 20000]):
+            advisor.started(Started('find', command, 1, request_id))
+            advisor.succeeded(Succeeded(1, request_id, micros))
+
+        advisor.started(Started(
+            'find', {'find': 'tasks', 'filter': {'_id': 'a'}}, 1, 5))
+        advisor.succeeded(Succeeded(1, 5, 100))
+
+        report = advisor.report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['index'], ['state', '_time', 'n'])
+        self.assertEqual(report[0]['count'], 2)
+        self.assertEqual(report[0]['slow'], 1)
+        self.assertAlmostEqual(report[0]['total_ms'], 21.0)
+        self.assertEqual(advisor.report(only_slow=False)[1]['index'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from adaptivemd.logentry import LogEntry
+from adaptivemd.tests import StorageTestCase
+
+
+class TestLoadMany(StorageTestCase):
+
+    name = 'test-load-many'
+    stores = [('logs', LogEntry)]
+
+    def setUp(self):
+        super(TestLoadMany, self).setUp()
+        self.logs = self.storage.logs
+        self.logs.set_caching(True)
+
+        self.entries = [LogEntry('test', str(n), 'message') for n in range(5)]
+        self.logs.save(self.entries)
+        self.idxs = [entry.__uuid__ for entry in self.entries]
+        self.logs.clear_cache()
+
+        # count the queries sent to the collection
+        self.queries = []
+        find = self.logs._document.find
+
+        def counting_find(*args, **kwargs):
+            self.queries.append(args[0])
+            return find(*args, **kwargs)
+
+        self.logs._document.find = counting_find
+
+    def test_chunks(self):
+        loaded = self.logs.load_many(self.idxs, chunk_size=2)
+        self.assertEqual([e.title for e in loaded], [str(n) for n in range(5)])
+        self.assertEqual(len(self.queries), 3)
+
+        # all objects are cached now
+        self.assertEqual(self.logs.load_many(self.idxs[::-1]), loaded[::-1])
+        self.assertEqual(len(self.queries), 3)
+
+    def test_cache_hits(self):
+        first = self.logs.load(self.idxs[1])
+        loaded = self.logs.load_many(self.idxs[:3])
+        self.assertIs(loaded[1], first)
+        self.assertEqual(len(self.queries[0]['_id']['$in']), 2)
+
+    def test_duplicates(self):
+        loaded = self.logs.load_many(
+            [self.idxs[0], self.idxs[1], self.idxs[0]])
+        self.assertEqual(len(loaded), 3)
+        self.assertIs(loaded[0], loaded[2])
+        self.assertEqual(len(self.queries[0]['_id']['$in']), 2)
+
+    def test_missing(self):
+        missing = LogEntry('test', 'missing', 'message').__uuid__
+        idxs = [self.idxs[0], missing, self.idxs[1]]
+
+        loaded = self.logs.load_many(idxs)
+        self.assertEqual([e.title for e in loaded], ['0', '1'])
+
+        # indexing keeps the positions of the given indices
+        self.assertRaises(ValueError, self.logs.load_many, idxs,
+                          skip_missing=False)
+        self.assertRaises(ValueError, self.logs.__getitem__, idxs)
+        self.assertEqual(
+            [e.title for e in self.logs[self.idxs[:2]]], ['0', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from adaptivemd import File, Task
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+from adaptivemd.tests import StorageTestCase
+
+
+class TestReferences(StorageTestCase):
+
+    name = 'test-references'
+    stores = [('files', File), ('tasks', Task)]
+
+    def setUp(self):
+        super(TestReferences, self).setUp()
+        self.files = self.storage.files
+        self.files.set_caching(True)
+
+        # record the objects passed to the files store for saving
+        self.saved = []
+        save = self.files.save
+
+        def recording_save(obj):
+            self.saved.append(obj)
+            return save(obj)
+
+        self.files.save = recording_save
+
+    def _task(self, source):
+        task = Task()
+        task.link(source)
+        return task
+
+    def _reference(self, task):
+        dct = self.storage.simplifier.to_simple_dict(task)
+        return dct['_dict']['_main'][0]['_dict']['source']
+
+    def test_new(self):
+        source = File('file://input.pdb')
+        self.assertEqual(
+            self._reference(self._task(source)),
+            {'_hex_uuid': hex(source.__uuid__), '_store': 'files'})
+        self.assertEqual(self.saved, [source])
+        self.assertIs(source.__store__, self.files)
+
+    def test_stored(self):
+        source = File('file://input.pdb')
+        self.files.save(source)
+        del self.saved[:]
+
+        # saved and loaded objects are clean and only referenced
+        self._reference(self._task(source))
+        self.files.clear_cache()
+        loaded = self.files.load(source.__uuid__)
+        self.assertIsNot(loaded, source)
+        self._reference(self._task(loaded))
+        self._reference(self._task(self.files.proxy(source)))
+        self.assertEqual(self.saved, [])
+
+    def test_other_storage(self):
+        source = File('file://input.pdb')
+        self.files.save(source)
+
+        other = MongoDBStorage(self.name + '-other', 'w')
+        other.create_store(ObjectStore('files', File))
+        other.files.save(source)
+        self.assertIs(source.__store__, other.files)
+        del self.saved[:]
+
+        # objects of another storage are saved, which only adds them if new
+        self._reference(self._task(source))
+        self.assertEqual(self.saved, [source])
+        self.assertEqual(self.files._document.count(), 1)
+        other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+
+import numpy as np
+from pymongo.errors import BulkWriteError, DuplicateKeyError, \
+    OperationFailure
+
+from adaptivemd.engine import Trajectory
+from adaptivemd.file import File
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore, DataDict
+from adaptivemd.mongodb.sqlite import SQLiteClient, SQLiteGridFS, match
+from adaptivemd.model import Model
+from adaptivemd.tests import StorageTestCase
+
+
+class TestSQLiteCollection(unittest.TestCase):
+
+    def setUp(self):
+        self.client = SQLiteClient(':memory:')
+        self.col = self.client['db']['docs']
+        self.col.insert_many([
+            {'_id': 'a', 'state': 'created', 'n': 1, '_pending': []},
+            {'_id': 'b', 'state': 'created', 'n': 2, '_pending': ['a']},
+            {'_id': 'c', 'state': 'success', 'n': 3}
+        ])
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_match(self):
+        doc = {'a': {'b': [1, 2]}, 'c': None}
+        self.assertTrue(match(doc, {'a.b': 2}))
+        self.assertTrue(match(doc, {'d': None}))
+        self.assertTrue(match(doc, {'a.b': {'$in': [3, 1]}}))
+        self.assertFalse(match(doc, {'$or': [{'c': 1}, {'a.b': 5}]}))
+
+    def test_find(self):
+        self.assertEqual(self.col.count({'state': 'created'}), 2)
+        self.assertEqual(self.col.count({'_pending': []}), 1)
+        self.assertEqual(
+            [d['_id'] for d in self.col.find({'n': {'$gte': 2}}, ['_id'])],
+            ['b', 'c'])
+        self.assertEqual(
+            self.col.find_one({}, sort=[('n', -1)])['_id'], 'c')
+
+    def test_index(self):
+        self.col.create_index('state')
+        self.assertEqual(self.col.count({'state': 'created'}), 2)
+        self.col.update_one({'_id': 'a'}, {'$set': {'state': 'success'}})
+        self.assertEqual(self.col.count({'state': 'success'}), 2)
+
+    def test_update(self):
+        erg = self.col.update_many(
+            {'_pending': 'a'}, {'$pull': {'_pending': 'a'}})
+        self.assertEqual(erg.modified_count, 1)
+        self.assertEqual(self.col.count({'_pending': []}), 2)
+
+        dct = self.col.find_one_and_update(
+            {'state': 'created'}, {'$set': {'state': 'queued'}})
+        self.assertEqual(dct['state'], 'created')
+        self.assertEqual(self.col.count({'state': 'queued'}), 1)
+
+    def test_remove(self):
+        self.assertEqual(self.col.remove({'_id': 'a'})['n'], 1)
+        self.assertEqual(self.col.count(), 2)
+
+    def test_duplicates(self):
+        self.assertRaises(
+            DuplicateKeyError, self.col.insert_one, {'_id': 'a', 'n': 5})
+        self.assertEqual(self.col.find_one({'_id': 'a'})['n'], 1)
+
+        # ordered inserts stop at the first duplicate
+        with self.assertRaises(BulkWriteError) as ctx:
+            self.col.insert_many([{'_id': 'd'}, {'_id': 'b'}, {'_id': 'e'}])
+
+        details = ctx.exception.details
+        self.assertEqual(details['nInserted'], 1)
+        self.assertEqual(
+            [(e['index'], e['code']) for e in details['writeErrors']],
+            [(1, 11000)])
+        self.assertEqual(self.col.count(), 4)
+        self.assertEqual(self.col.find_one({'_id': 'b'})['n'], 2)
+
+        # unordered inserts skip duplicates only
+        with self.assertRaises(BulkWriteError) as ctx:
+            self.col.insert_many(
+                [{'_id': 'a'}, {'_id': 'e'}, {'_id': 'f'}], ordered=False)
+
+        self.assertEqual(ctx.exception.details['nInserted'], 2)
+        self.assertEqual(self.col.count(), 6)
+
+    def test_unique_index(self):
+        # existing duplicates prevent the index
+        self.assertRaises(
+            DuplicateKeyError, self.col.create_index, 'state', unique=True)
+        self.assertNotIn('state_1', self.col.index_information())
+
+        self.col.create_index([('n', 1)], unique=True)
+        self.assertTrue(self.col.index_information()['n_1']['unique'])
+        self.assertRaises(
+            DuplicateKeyError, self.col.insert_one, {'_id': 'd', 'n': 1})
+        self.assertRaises(
+            DuplicateKeyError,
+            self.col.update_one, {'_id': 'c'}, {'$set': {'n': 2}})
+
+        # no document is replaced or changed
+        self.assertEqual(self.col.count(), 3)
+        self.assertEqual(self.col.find_one({'_id': 'c'})['n'], 3)
+
+        # several documents without the field are allowed
+        self.col.insert_many([{'_id': 'd'}, {'_id': 'e'}])
+
+        # an existing index cannot become unique
+        self.col.create_index('state')
+        self.assertRaises(
+            OperationFailure, self.col.create_index, 'state', unique=True)
+
+    def test_grid_read(self):
+        grid = SQLiteGridFS(self.client['db'])
+        _id = grid.put(b'0123456789')
+        f = grid.get(_id)
+        self.assertEqual(f.read(4), b'0123')
+        self.assertEqual(f.read(3), b'456')
+        self.assertEqual(f.read(), b'789')
+        self.assertEqual(f.read(), b'')
+        self.assertEqual(grid.get(_id).read(), b'0123456789')
+
+
+class TestSQLiteStorage(StorageTestCase):
+
+    stores = [('logs', LogEntry), ('models', Model)]
+    file_stores = [('data', DataDict)]
+
+    def setUp(self):
+        super(TestSQLiteStorage, self).setUp()
+        self.storage.close()
+
+    def test_save_load(self):
+        st = MongoDBStorage('test')
+        log = LogEntry('test', 'title', 'message')
+        model = Model(DataDict({'msm': {'C': np.arange(4)}}))
+        st.logs.save(log)
+        st.models.save(model)
+        st.close()
+
+        st = MongoDBStorage('test')
+        self.assertEqual(st.logs.load(log.__uuid__).title, 'title')
+        data = st.models.load(model.__uuid__).data
+        self.assertTrue(np.array_equal(data['msm']['C'], np.arange(4)))
+        self.assertEqual(MongoDBStorage.list_storages(), ['test'])
+        st.close()
+
+    def test_migrate(self):
+        st = MongoDBStorage('test-migrate', 'w')
+        st.create_store(ObjectStore('files', File))
+        st.close()
+
+        st = MongoDBStorage('test-migrate')
+        self.assertEqual(st.stored_schema_version, st.schema_version)
+        self.assertIn('length_1', st.files._document.index_information())
+
+        # a trajectory written before `length` was a `_find_by` field
+        traj = Trajectory('file://traj.dcd', File('file://a.pdb'), 10)
+        st.files.save(traj)
+        st.files._document.update_many({}, {'$unset': {'length': ''}})
+        st.db[st.meta_collection].delete_many({})
+        st.close()
+
+        st = MongoDBStorage('test-migrate')
+        self.assertEqual(st.files._document.count({'length': 10}), 1)
+        self.assertEqual(st.stored_schema_version, st.schema_version)
+        self.assertEqual(st.migrate()['files'], 0)
+        st.close()
+
+    def test_read_only(self):
+        st = MongoDBStorage('test-read-only', 'w')
+        st.create_store(ObjectStore('files', File))
+        st.close()
+
+        created = []
+        create_indices = ObjectStore.create_indices
+        ObjectStore.create_indices = lambda store: created.append(store.name)
+        try:
+            MongoDBStorage('test-read-only', 'r').close()
+            self.assertEqual(created, [])
+            MongoDBStorage('test-read-only').close()
+            self.assertIn('files', created)
+        finally:
+            ObjectStore.create_indices = create_indices
+
+    def test_route(self):
+        st = MongoDBStorage('test')
+        other = MongoDBStorage('test')
+        log = LogEntry('test', 'title', 'message')
+        st.logs.save(log)
+        self.assertIs(st.uuid_routes[log.__uuid__], st.logs)
+        self.assertEqual(st.load(log.__uuid__), log)
+
+        # saved by another storage, found with a single lookup
+        self.assertEqual(other.load(log.__uuid__).title, 'title')
+        self.assertEqual(other.routing_stats['queried'], 1)
+        self.assertIs(other.route(log.__uuid__), other.logs)
+        self.assertEqual(other.routing_stats['routed'], 1)
+        self.assertRaises(KeyError, other.load, 12345)
+        other.close()
+        st.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
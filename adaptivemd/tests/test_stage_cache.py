@@ -0,0 +1,175 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from adaptivemd import File, Task, WorkerScheduler
+from adaptivemd.stagecache import StageCache
+from adaptivemd.task import DummyTask
+
+
+class _Resource(object):
+    def __init__(self, shared_path):
+        self.shared_path = shared_path
+        self.wrapper = DummyTask()
+
+
+class _Project(object):
+    name = 'test'
+
+
+class TestStageCache(unittest.TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self.path = tempfile.mkdtemp()
+        self.cache = StageCache(os.path.join(self.path, 'cache'))
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self.path)
+
+    def _write(self, name, data):
+        path = os.path.join(self.path, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        return path
+
+    def test_data(self):
+        first = self.cache.put_data(b'content')
+        second = self.cache.put_data(u'content')
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats['misses'], 1)
+        self.assertEqual(self.cache.stats['hits'], 1)
+        self.assertEqual(self.cache.stats['bytes_saved'], 7)
+        self.assertEqual(self.cache.hit_rate, 0.5)
+
+        # entries are shared by all links and must not be changed
+        self.assertFalse(os.stat(first).st_mode & stat.S_IWUSR)
+
+    def test_file(self):
+        source = self._write('system.xml', b'<system/>')
+        targets = [os.path.join(self.path, 'a'), os.path.join(self.path, 'b')]
+        for target in targets:
+            self.assertEqual(
+                self.cache.stage_file(source, target), 'hardlink')
+
+        for target in targets:
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), b'<system/>')
+
+        self.assertEqual(self.cache.stats['misses'], 1)
+        self.assertEqual(self.cache.stats['bytes_saved'], 9)
+
+        # a changed source is a new entry
+        os.remove(source)
+        self._write('system.xml', b'<system />')
+        self.assertNotEqual(
+            self.cache.put_file(source), self.cache.put_data(b'<system/>'))
+
+    def test_copy(self):
+        source = self._write('input.pdb', b'ATOM')
+        target = os.path.join(self.path, 'initial.pdb')
+        self.assertEqual(
+            self.cache.stage_file(source, target, copy=True), 'copy')
+        self.assertEqual(os.stat(target).st_nlink, 1)
+
+        # tasks may change copied files
+        with open(target, 'ab') as f:
+            f.write(b' 1')
+
+        with open(self.cache.put_file(source), 'rb') as f:
+            self.assertEqual(f.read(), b'ATOM')
+
+    def test_foreign_entry(self):
+        entry = self.cache.put_data(b'content')
+        getuid = os.getuid
+
+        # entries of other users are only used with the right content
+        os.getuid = lambda: getuid() + 1
+        try:
+            self.assertEqual(self.cache.put_data(b'content'), entry)
+            self.assertEqual(self.cache.stats['hits'], 1)
+
+            os.chmod(entry, stat.S_IRUSR | stat.S_IWUSR)
+            with open(entry, 'wb') as f:
+                f.write(b'other')
+
+            self.assertEqual(self.cache.put_data(b'content'), entry)
+            self.assertEqual(self.cache.stats['misses'], 2)
+        finally:
+            os.getuid = getuid
+
+        with open(entry, 'rb') as f:
+            self.assertEqual(f.read(), b'content')
+
+        # others cannot add entries
+        self.assertFalse(
+            os.stat(os.path.dirname(entry)).st_mode & stat.S_IWOTH)
+
+    def test_stale(self):
+        tmp = os.path.join(self.cache.path, 'tmp')
+        stale = self._write('cache/tmp/stale', b'')
+        os.utime(stale, (0, 0))
+        self._write('cache/tmp/active', b'')
+
+        # unfinished entries of stopped workers are removed
+        self.cache.evict()
+        self.assertEqual(os.listdir(tmp), ['active'])
+
+    def test_evict(self):
+        self.cache.max_files = 2
+        self.cache.keep = 0.0
+        entries = []
+        for n in range(3):
+            entries.append(self.cache.put_data(b'%d' % n))
+            os.utime(entries[-1], (n, n))
+
+        self.cache.evict()
+        self.assertEqual(
+            [os.path.exists(entry) for entry in entries],
+            [False, True, True])
+
+        # recently used entries are kept
+        self.cache.keep = 3600.0
+        self.cache.put_data(b'1')
+        self.cache.put_data(b'2')
+        self.cache.put_data(b'3')
+        self.assertEqual(len(self.cache.entries()), 3)
+
+    def test_task_to_script(self):
+        scheduler = WorkerScheduler(_Resource(self.path))
+        scheduler.project = _Project()
+        scheduler.stage_cache = self.cache
+
+        os.makedirs(self.path + '/workers/staging_area')
+        self._write('workers/staging_area/system.xml', b'<system/>')
+
+        script = File('file://input.py')
+        script.set_file('print(1)\n')
+
+        task = Task()
+        task.link(File('staging:///system.xml'))
+        task.append(File('staging:///system.xml').copy('copy.xml'))
+        task.get(script)
+        task.append('python input.py')
+
+        folder = self.path + '/workers/worker.0'
+        os.makedirs(folder)
+        os.chdir(folder)
+        lines = scheduler.task_to_script(task)
+
+        self.assertEqual(len([l for l in lines if 'stage cache' in l]), 3)
+        with open('system.xml', 'rb') as f:
+            self.assertEqual(f.read(), b'<system/>')
+        with open('copy.xml', 'rb') as f:
+            self.assertEqual(f.read(), b'<system/>')
+        self.assertTrue(os.stat('copy.xml').st_mode & stat.S_IWUSR)
+        with open('input.py', 'rb') as f:
+            self.assertEqual(f.read(), b'print(1)\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
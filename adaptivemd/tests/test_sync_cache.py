@@ -0,0 +1,99 @@
+import unittest
+
+from adaptivemd import Worker
+from adaptivemd.mongodb import MongoDBStorage
+from adaptivemd.mongodb.syncvar import SyncVariable
+from adaptivemd.tests import StorageTestCase
+
+
+class TestSyncCache(StorageTestCase):
+
+    name = 'test-sync-cache'
+    stores = [('workers', Worker)]
+
+    def setUp(self):
+        super(TestSyncCache, self).setUp()
+        self.storage.workers.set_caching(True)
+        self.workers = [Worker() for _ in range(3)]
+        self.storage.workers.save(self.workers)
+        for worker in self.workers:
+            worker.n_tasks = 0
+
+        # a second process that reads the workers
+        self.other = MongoDBStorage(self.name)
+        self.other.workers.set_caching(True)
+        self.store = self.other.workers
+        self.store.sync_staleness = 3600.0
+        self.loaded = self.store.load_many(
+            [worker.__uuid__ for worker in self.workers])
+
+        self.queries = []
+        collection = self.store._document
+        for method in ['find', 'find_one']:
+            setattr(collection, method, self._counting(
+                method, getattr(collection, method)))
+
+    def tearDown(self):
+        self.other.close()
+        super(TestSyncCache, self).tearDown()
+
+    def _counting(self, method, fnc):
+        def counting(*args, **kwargs):
+            self.queries.append(method)
+            return fnc(*args, **kwargs)
+
+        return counting
+
+    def test_staleness(self):
+        loaded = self.loaded[0]
+
+        # loading seeds the cache for all sync variables
+        self.assertEqual(loaded.n_tasks, 0)
+        self.assertIsNone(loaded.command)
+        self.assertEqual(self.queries, [])
+
+        self.workers[0].n_tasks = 2
+        self.assertEqual(loaded.n_tasks, 0)
+
+        self.store.sync_staleness = 0.0
+        self.assertEqual(loaded.n_tasks, 2)
+        self.assertEqual(self.queries, ['find_one'])
+
+    def test_expired(self):
+        loaded = self.loaded[0]
+        self.workers[0].n_tasks = 2
+
+        fetched, dct = getattr(loaded, SyncVariable.document_key)
+        setattr(loaded, SyncVariable.document_key, (fetched - 3601.0, dct))
+        self.assertEqual(loaded.n_tasks, 2)
+
+        # one fetch serves all sync variables of the object
+        self.assertIsNone(loaded.command)
+        self.assertEqual(self.queries, ['find_one'])
+
+    def test_refresh(self):
+        for n, worker in enumerate(self.workers):
+            worker.n_tasks = n + 1
+
+        self.store.refresh(self.loaded, chunk_size=2)
+        self.assertEqual(self.queries, ['find', 'find'])
+        self.assertEqual([w.n_tasks for w in self.loaded], [1, 2, 3])
+        self.assertEqual(self.queries, ['find', 'find'])
+
+    def test_write(self):
+        loaded = self.loaded[0]
+        loaded.n_tasks = 4
+        self.assertEqual(loaded.n_tasks, 4)
+
+        # buffered updates are newer than the DB content
+        with self.other.batch():
+            loaded.n_tasks = 5
+            self.store.refresh([loaded])
+            self.assertEqual(loaded.n_tasks, 5)
+
+        self.assertEqual(self.queries, ['find'])
+        self.assertEqual(self.workers[0].n_tasks, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
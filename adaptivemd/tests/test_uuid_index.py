@@ -0,0 +1,62 @@
+import unittest
+
+from adaptivemd.mongodb import UUIDIndex
+
+
+class TestUUIDIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = UUIDIndex([11, 22, 33, 44])
+
+    def test_append(self):
+        self.index.append(55)
+        self.index.append(22)
+        self.assertEqual(list(self.index), [11, 22, 33, 44, 55])
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.get(55), 4)
+
+    def test_contains(self):
+        self.assertIn(33, self.index)
+        self.assertNotIn(66, self.index)
+
+    def test_positions(self):
+        self.assertEqual(self.index[0], 11)
+        self.assertEqual(self.index[-1], 44)
+        self.assertEqual(self.index[1:3], [22, 33])
+        self.assertIsNone(self.index.get(66))
+
+    def test_remove(self):
+        self.index.remove(22)
+        self.assertEqual(list(self.index), [11, 33, 44])
+        self.assertNotIn(22, self.index)
+        self.assertEqual(self.index.get(44), 2)
+        self.assertRaises(ValueError, self.index.remove, 22)
+
+    def test_delete_slice(self):
+        del self.index[2:]
+        self.assertEqual(list(self.index), [11, 22])
+        self.assertNotIn(33, self.index)
+        self.index.append(33)
+        self.assertEqual(self.index.get(33), 2)
+
+    def test_delete_item(self):
+        del self.index[0]
+        self.assertEqual(self.index.get(22), 0)
+        self.assertEqual(self.index, [22, 33, 44])
+
+    def test_routes(self):
+        routes = {}
+        first = UUIDIndex([11, 22], routes, 'first')
+        second = UUIDIndex([33], routes, 'second')
+        self.assertEqual(routes, {11: 'first', 22: 'first', 33: 'second'})
+        first.remove(22)
+        second.append(22)
+        self.assertEqual(routes[22], 'second')
+        # removing from an index does not drop routes of other indices
+        first.append(33)
+        second.clear()
+        self.assertEqual(routes, {11: 'first', 33: 'first'})
+
+
+if __name__ == '__main__':
+    unittest.main()
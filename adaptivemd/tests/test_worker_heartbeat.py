@@ -0,0 +1,78 @@
+import unittest
+from uuid import UUID
+
+from adaptivemd import Task, Worker
+from adaptivemd.tests import StorageTestCase, mongod_url, requires_mongod
+
+
+class TestWorkerHeartbeat(StorageTestCase):
+
+    name = 'test-heartbeat'
+    stores = [('tasks', Task), ('workers', Worker)]
+
+    def setUp(self):
+        super(TestWorkerHeartbeat, self).setUp()
+
+        self.task = Task()
+        self.storage.tasks.save(self.task)
+        self.worker = Worker(sleep=1, heartbeat=10)
+        self.worker.state = 'running'
+        self.storage.workers.save(self.worker)
+
+        # count the operations on the workers collection
+        self.calls = []
+        document = self.storage.workers._document
+        for name in ['find_one', 'find_one_and_update', 'find_and_modify']:
+            setattr(document, name, self._counted(name, getattr(document, name)))
+
+    def _counted(self, name, fnc):
+        def counted(*args, **kwargs):
+            self.calls.append(name)
+            return fnc(*args, **kwargs)
+
+        return counted
+
+    def _document(self):
+        return self.storage.workers._document.find_one(
+            {'_id': str(UUID(int=self.worker.__uuid__))})
+
+    def test_beat(self):
+        self.worker.execute('shutdown')
+        del self.calls[:]
+
+        command = self.worker._beat({
+            'seen': 5.0, 'n_tasks': 2, 'current': self.task,
+            'slots': [{'index': 0, 'state': 'running'}]})
+
+        self.assertEqual(command, 'shutdown')
+        self.assertEqual(self.worker.state, 'running')
+        self.assertEqual(self.calls, ['find_one_and_update'])
+
+        dct = self._document()
+        self.assertIsNone(dct['command'])
+        self.assertEqual(dct['seen'], 5.0)
+        self.assertEqual(dct['n_tasks'], 2)
+        self.assertEqual(dct['slots'][0]['state'], 'running')
+        self.assertEqual(self.worker.current, self.task)
+
+        # a command is consumed only once
+        self.assertIsNone(self.worker._beat({'seen': 6.0}))
+
+    def test_buffered(self):
+        with self.storage.batch():
+            self.worker.n_tasks = 3
+            self.worker._beat({'seen': 7.0})
+
+        dct = self._document()
+        self.assertEqual(dct['n_tasks'], 3)
+        self.assertEqual(dct['seen'], 7.0)
+
+
+@requires_mongod
+class TestWorkerHeartbeatMongoDB(TestWorkerHeartbeat):
+
+    url = mongod_url
+
+
+if __name__ == '__main__':
+    unittest.main()
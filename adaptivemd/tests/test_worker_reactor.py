@@ -0,0 +1,62 @@
+import os
+import subprocess
+import threading
+import time
+import unittest
+
+from adaptivemd.tests import StorageTestCase
+from adaptivemd.worker import WorkerReactor, _pidfd_open
+
+
+class TestWorkerReactor(StorageTestCase):
+
+    name = 'test-reactor'
+
+    def setUp(self):
+        super(TestWorkerReactor, self).setUp()
+        self.reactor = WorkerReactor()
+
+    def tearDown(self):
+        self.reactor.close()
+        super(TestWorkerReactor, self).tearDown()
+
+    def test_timeout(self):
+        start = time.time()
+        ready, notified = self.reactor.wait([], 0.1)
+        self.assertGreaterEqual(time.time() - start, 0.09)
+        self.assertEqual(ready, set())
+        self.assertEqual(notified, set())
+
+    def test_notify(self):
+        timer = threading.Timer(0.05, self.reactor.notify, ['tasks'])
+        timer.start()
+        start = time.time()
+        ready, notified = self.reactor.wait([], 5.0)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(notified, {'tasks'})
+
+        # notifications are consumed
+        self.assertEqual(self.reactor.wait([], 0.0), (set(), set()))
+
+    def test_process_exit(self):
+        sub = subprocess.Popen(['sleep', '0.1'])
+        fd = _pidfd_open(sub.pid)
+        if fd is None:
+            self.skipTest('pidfd_open is not supported')
+
+        start = time.time()
+        ready, _ = self.reactor.wait([fd], 5.0)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(ready, {fd})
+        self.assertEqual(sub.wait(), 0)
+        os.close(fd)
+
+    def test_watch_fallback(self):
+        # the embedded DB has no change streams
+        self.assertFalse(
+            self.reactor.watch('logs', self.storage.db['logs']))
+        self.assertFalse(self.reactor.watching('logs'))
+
+
+if __name__ == '__main__':
+    unittest.main()
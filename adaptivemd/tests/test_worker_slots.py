@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from adaptivemd import Task, WorkerScheduler, WorkerSlot
+from adaptivemd.bundle import StoredBundle
+from adaptivemd.logentry import LogEntry
+from adaptivemd.task import DummyTask
+from adaptivemd.tests import StorageTestCase
+
+
+class _Resource(object):
+    def __init__(self, shared_path):
+        self.shared_path = shared_path
+        self.wrapper = DummyTask()
+
+
+class _Project(object):
+    name = 'test'
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.logs = StoredBundle().set_store(storage.logs)
+
+
+class TestWorkerSlots(StorageTestCase):
+
+    name = 'test-slots'
+    stores = [('tasks', Task), ('logs', LogEntry)]
+
+    def setUp(self):
+        super(TestWorkerSlots, self).setUp()
+        self._cwd = os.getcwd()
+
+        self.tasks = []
+        for cpu_threads in [1, 2, 4, 8]:
+            task = Task(cpu_threads=cpu_threads)
+            task.append('sleep 0.2')
+            self.tasks.append(task)
+
+        self.storage.tasks.save(self.tasks)
+
+        self.path = tempfile.mkdtemp()
+        os.makedirs(self.path + '/workers')
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self.path)
+        super(TestWorkerSlots, self).tearDown()
+
+    def test_fits(self):
+        small = WorkerSlot(0, 2, 0)
+        large = WorkerSlot(1, 8, 1)
+        free = WorkerSlot(2)
+
+        self.assertTrue(small.fits(self.tasks[1]))
+        self.assertFalse(small.fits(self.tasks[2]))
+        self.assertTrue(free.fits(self.tasks[3]))
+        self.assertTrue(large.covers(small))
+        self.assertFalse(small.covers(large))
+        self.assertTrue(free.covers(large))
+
+    def test_ready_query(self):
+        document = self.storage.tasks._document
+        self.assertEqual(document.count(Task.ready_query()), 4)
+        self.assertEqual(document.count(
+            Task.ready_query(cpu_threads=2, gpu_contexts=0)), 2)
+        self.assertEqual(document.count(
+            Task.ready_query(gpu_contexts=1)), 4)
+
+    def test_concurrent(self):
+        scheduler = WorkerScheduler(_Resource(self.path), slots=[
+            WorkerSlot(0, 4), WorkerSlot(1, 2), WorkerSlot(2, 8)])
+        scheduler.project = _Project(self.storage)
+        scheduler._save_log_to_db = False
+
+        self.assertEqual(len(scheduler.unreserved_slots()), 3)
+        scheduler.submit(self.tasks)
+        self.assertEqual(scheduler.unreserved_slots(), [])
+
+        scheduler.advance()
+        self.assertEqual(len(scheduler.current_tasks), 3)
+        for slot in scheduler.running_slots:
+            self.assertTrue(slot.fits(slot.task))
+            self.assertEqual(slot.status['state'], 'running')
+            self.assertTrue(os.path.isdir(scheduler.slot_dir(slot)))
+
+        timeout = time.time() + 10
+        while scheduler.tasks and time.time() < timeout:
+            scheduler.advance()
+            time.sleep(0.05)
+
+        self.assertEqual(
+            [task.state for task in self.tasks], ['success'] * 4)
+        self.assertIsNone(scheduler.current_task)
+        self.assertEqual(os.listdir(self.path + '/workers'), [])
+
+    def test_output(self):
+        scheduler = WorkerScheduler(_Resource(self.path))
+        scheduler.project = _Project(self.storage)
+        scheduler.std_head = 100
+        scheduler.std_tail = 1000
+
+        task = Task()
+        task.append('seq 1 100000')
+        task.append('echo done >&2')
+        self.storage.tasks.save(task)
+        scheduler.submit(task)
+
+        scheduler.advance()
+        timeout = time.time() + 10
+        while scheduler.tasks and time.time() < timeout:
+            scheduler.advance()
+            time.sleep(0.05)
+
+        self.assertEqual(task.state, 'success')
+        self.assertLess(len(task.stdout.message), 1200)
+        self.assertTrue(task.stdout.message.endswith('99999\n100000\n'))
+        self.assertEqual(
+            task.stdout.full,
+            ''.join('%d\n' % n for n in range(1, 100001)))
+        self.assertIsNone(task.stderr.size)
+        self.assertEqual(task.stderr.full, 'done\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import time
+import unittest
+from uuid import UUID
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from adaptivemd import Task, Worker
+from adaptivemd.tests import StorageTestCase
+
+
+class TestWriteBuffer(StorageTestCase):
+
+    name = 'test-write-buffer'
+    stores = [('tasks', Task), ('workers', Worker)]
+
+    def setUp(self):
+        super(TestWriteBuffer, self).setUp()
+        self.storage.tasks.set_caching(True)
+        self.storage.workers.set_caching(True)
+        self.buffer = self.storage._write_buffer
+
+        self.workers = [Worker() for _ in range(3)]
+        self.storage.workers.save(self.workers)
+
+        # record the bulk writes of the worker documents
+        self.writes = []
+        collection = self.storage.workers._document
+        bulk_write = collection.bulk_write
+
+        def recording_bulk_write(requests, *args, **kwargs):
+            self.writes.append(len(requests))
+            return bulk_write(requests, *args, **kwargs)
+
+        collection.bulk_write = recording_bulk_write
+
+    def test_batch(self):
+        with self.storage.batch():
+            for n, worker in enumerate(self.workers):
+                worker.n_tasks = n
+                worker.seen = n
+                worker.n_tasks = n + 1
+
+            self.assertEqual(len(self.buffer), 3)
+            self.assertEqual(
+                self.buffer.pending(
+                    self.storage.workers._document, _uuid(self.workers[0])),
+                {'n_tasks': 1, 'seen': 0})
+            self.assertEqual(_document(self.workers[0]).get('n_tasks'), None)
+
+        # one bulk write with one update per document
+        self.assertEqual(self.writes, [3])
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(
+            [_document(w)['n_tasks'] for w in self.workers], [1, 2, 3])
+
+    def test_write_behind(self):
+        self.storage.write_behind(0.05)
+        self.workers[0].n_tasks = 5
+        self.assertEqual(len(self.buffer), 1)
+
+        for _ in range(100):
+            if not len(self.buffer):
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(_document(self.workers[0])['n_tasks'], 5)
+
+        # switching it off writes the remaining updates
+        self.workers[1].n_tasks = 6
+        self.storage.write_behind(None)
+        self.assertFalse(self.buffer.active)
+        self.assertEqual(_document(self.workers[1])['n_tasks'], 6)
+
+    def test_failure(self):
+        task = Task()
+        self.storage.tasks.save(task)
+
+        tasks = self.storage.tasks._document
+        bulk_write = tasks.bulk_write
+
+        def failing_bulk_write(requests, *args, **kwargs):
+            raise BulkWriteError({'writeErrors': [{'index': 0}]})
+
+        with self.storage.batch():
+            self.workers[0].n_tasks = 1
+            self.buffer.set(tasks, _uuid(task), 'output', 'a')
+            tasks.bulk_write = failing_bulk_write
+
+            self.assertRaises(BulkWriteError, self.buffer.flush)
+
+            # only the updates of the failed collection are retried
+            self.assertEqual(_document(self.workers[0])['n_tasks'], 1)
+            self.assertEqual(len(self.buffer), 1)
+            self.assertEqual(
+                self.buffer.pending(tasks, _uuid(task)), {'output': 'a'})
+
+            # newer updates are merged into the retried ones
+            self.buffer.set(tasks, _uuid(task), 'output', 'b')
+            self.workers[0].n_tasks = 2
+            tasks.bulk_write = bulk_write
+
+        self.assertEqual(_document(task)['output'], 'b')
+        self.assertEqual(_document(self.workers[0])['n_tasks'], 2)
+
+    def test_exchange_failure(self):
+        worker = self.workers[0]
+        store = self.storage.workers
+        collection = store._document
+        find_one_and_update = collection.find_one_and_update
+        calls = []
+
+        def failing_find_one_and_update(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise AutoReconnect('connection lost')
+
+            return find_one_and_update(*args, **kwargs)
+
+        collection.find_one_and_update = failing_find_one_and_update
+
+        with self.storage.batch():
+            worker.n_tasks = 3
+            self.assertRaises(
+                AutoReconnect, store.exchange, worker, {'seen': 1},
+                ['command'])
+
+            # the buffered changes are kept and written with the retry
+            self.assertEqual(
+                self.buffer.pending(collection, _uuid(worker)),
+                {'n_tasks': 3})
+            store.exchange(worker, {'seen': 1}, ['command'])
+            self.assertEqual(len(self.buffer), 0)
+            self.assertEqual(_document(worker)['n_tasks'], 3)
+            self.assertEqual(_document(worker)['seen'], 1)
+
+    def test_unbuffered(self):
+        task = Task()
+        self.storage.tasks.save(task)
+
+        with self.storage.batch():
+            task.state = 'queued'
+            self.assertEqual(_document(task)['state'], 'queued')
+            self.assertEqual(len(self.buffer), 0)
+
+            # pending updates of the same document are written with it
+            self.buffer.set(
+                self.storage.tasks._document, _uuid(task), 'output', 'a')
+            task.state = 'running'
+            self.assertEqual(_document(task)['output'], 'a')
+            self.assertEqual(len(self.buffer), 0)
+
+    def test_unbuffered_failure(self):
+        task = Task()
+        self.storage.tasks.save(task)
+        tasks = self.storage.tasks._document
+        find_and_modify = tasks.find_and_modify
+
+        def failing_find_and_modify(*args, **kwargs):
+            raise AutoReconnect('connection lost')
+
+        with self.storage.batch():
+            self.buffer.set(tasks, _uuid(task), 'output', 'a')
+            tasks.find_and_modify = failing_find_and_modify
+
+            def set_state():
+                task.state = 'running'
+
+            # the pending updates are kept for the next write
+            self.assertRaises(AutoReconnect, set_state)
+            self.assertEqual(
+                self.buffer.pending(tasks, _uuid(task)), {'output': 'a'})
+            tasks.find_and_modify = find_and_modify
+
+        self.assertEqual(_document(task)['output'], 'a')
+
+
+def _uuid(obj):
+    return str(UUID(int=obj.__uuid__))
+
+
+def _document(obj):
+    return obj.__store__._document.find_one({'_id': _uuid(obj)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,27 +39,40 @@ The worker consists of two parts:
 2. the worker job instance that runs a loop in the background, checking the DB
    for new tasks and submitting these to the scheduler for execution
 
+A worker can run several tasks at the same time. The scheduler has a number
+of execution slots with a number of cpu threads and gpu contexts each, and
+each slot runs one task whose resource requirements fit into it.
+
 """
 from __future__ import print_function, absolute_import
 
 import six
 import os
+import errno
+import select
 import socket
 import subprocess
 import time
 import sys
+import uuid
 import random
 import signal
 import ctypes
 import re
 import shutil
+import threading
 from fcntl import fcntl, F_GETFL, F_SETFL
+from resource import getrusage, RUSAGE_CHILDREN, RUSAGE_SELF
 
 from .mongodb import (StorableMixin, SyncVariable, create_to_dict,
                       ObjectSyncVariable)
 
+from .capture import StreamCapture
+from .stagecache import StageCache
 from .scheduler import Scheduler
-from .reducer import StrFilterParser, WorkerParser, BashParser, PrefixParser
+from .task import Task
+from .reducer import (StrFilterParser, WorkerParser, BashParser, PrefixParser,
+                      StageCacheParser)
 from .logentry import LogEntry
 from .util import DT
 from adaptivemd import Transfer
@@ -72,9 +85,342 @@ try:
 except OSError:
     libc = None
 
+# the number of the `pidfd_open` system call, linux 5.3 and newer
+_SYS_pidfd_open = 434
+
+
+def _pidfd_open(pid):
+    """
+    Return a file descriptor that becomes readable when a process exits
+
+    Parameters
+    ----------
+    pid : int
+        the id of a child process
+
+    Returns
+    -------
+    int or None
+        the file descriptor or None if the system does not support it
+    """
+    if libc is None:
+        return None
+
+    try:
+        fd = libc.syscall(_SYS_pidfd_open, pid, 0)
+    except AttributeError:
+        return None
+
+    return fd if fd >= 0 else None
+
+
+def _set_nonblocking(fd):
+    flags = fcntl(fd, F_GETFL)
+    fcntl(fd, F_SETFL, flags | os.O_NONBLOCK)
+
+
+def _resource_usage():
+    """
+    Return the load of the node and the resources used by the worker
+
+    Returns
+    -------
+    dict
+        `load` is the 1 minute load average of the node, `cpu_time` the
+        seconds of cpu time used by finished tasks and `maxrss` the
+        maximal resident memory in kB of the worker process
+    """
+    children = getrusage(RUSAGE_CHILDREN)
+    return {
+        'load': round(os.getloadavg()[0], 2),
+        'cpu_time': round(children.ru_utime + children.ru_stime, 3),
+        'maxrss': getrusage(RUSAGE_SELF).ru_maxrss}
+
+
+class WorkerReactor(object):
+    """
+    Wait for the events the worker loop needs to react to
+
+    The reactor waits on file descriptors like the output pipes and process
+    file descriptors of running tasks and on a notification pipe. Threads
+    following MongoDB change streams write to the notification pipe once a
+    watched collection changes. Change streams require a replica set, so
+    the caller needs to poll the DB itself if `watch` returns False.
+    """
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        _set_nonblocking(self._read_fd)
+        _set_nonblocking(self._write_fd)
+        self._lock = threading.Lock()
+        self._notified = set()
+        self._streams = {}
+
+    def notify(self, source):
+        """
+        Wake up a waiting `wait` call
+
+        Parameters
+        ----------
+        source : str
+            the name of the source of the notification
+        """
+        with self._lock:
+            self._notified.add(source)
+
+        try:
+            os.write(self._write_fd, b'.')
+        except OSError as e:
+            # a full pipe will wake up the reactor anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def watch(self, source, collection, pipeline=None):
+        """
+        Notify about changes of a collection from a change stream
+
+        Parameters
+        ----------
+        source : str
+            the name used to notify about changes
+        collection : `pymongo.collection.Collection`
+            the collection to be watched
+        pipeline : list of dict or None
+            an aggregation pipeline selecting the changes of interest
+
+        Returns
+        -------
+        bool
+            True if the change stream could be opened
+        """
+        self.unwatch(source)
+        try:
+            stream = collection.watch(pipeline or [])
+        except (AttributeError, NotImplementedError,
+                pymongo.errors.PyMongoError):
+            return False
+
+        thread = threading.Thread(target=self._follow, args=(source, stream))
+        thread.daemon = True
+        self._streams[source] = (stream, thread)
+        thread.start()
+        return True
+
+    def _follow(self, source, stream):
+        try:
+            for _ in stream:
+                self.notify(source)
+        except (pymongo.errors.PyMongoError, StopIteration):
+            pass
+        finally:
+            # wake up the loop to notice that the stream has ended
+            self.notify(source)
+
+    def watching(self, source):
+        """
+        Check if a change stream is followed for a source
+
+        Parameters
+        ----------
+        source : str
+            the name of the watched source
+
+        Returns
+        -------
+        bool
+            True if the stream is still open
+        """
+        stream = self._streams.get(source)
+        return stream is not None and stream[1].is_alive()
+
+    def unwatch(self, source=None):
+        """
+        Close the change stream of a source or of all sources
+
+        Parameters
+        ----------
+        source : str or None
+            the name of the watched source. If None all streams are closed
+        """
+        sources = list(self._streams) if source is None else [source]
+        for name in sources:
+            stream = self._streams.pop(name, None)
+            if stream is not None:
+                try:
+                    stream[0].close()
+                except pymongo.errors.PyMongoError:
+                    pass
+
+    def wait(self, fds, timeout):
+        """
+        Wait until a file descriptor is readable, a notification arrives
+        or the timeout has passed
+
+        Parameters
+        ----------
+        fds : iterable of int
+            the file descriptors to wait for
+        timeout : float
+            the maximal number of seconds to wait
+
+        Returns
+        -------
+        set of int
+            the file descriptors that are readable or closed
+        set of str
+            the sources that notified since the last call
+        """
+        poller = select.poll()
+        for fd in fds:
+            poller.register(fd, select.POLLIN | select.POLLPRI)
+
+        poller.register(self._read_fd, select.POLLIN)
+
+        try:
+            events = poller.poll(max(timeout, 0.0) * 1000)
+        except (select.error, OSError) as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            events = []
+
+        ready = set(fd for fd, _ in events)
+        if self._read_fd in ready:
+            ready.discard(self._read_fd)
+            try:
+                while os.read(self._read_fd, 4096):
+                    pass
+            except OSError:
+                pass
+
+        with self._lock:
+            notified, self._notified = self._notified, set()
+
+        return ready, notified
+
+    def close(self):
+        """
+        Close all change streams and the notification pipe
+        """
+        self.unwatch()
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class WorkerSlot(object):
+    def __init__(self, index, cpu_threads=None, gpu_contexts=None):
+        """
+        An execution slot of a `WorkerScheduler` that runs one task at a time
+
+        Parameters
+        ----------
+        index : int
+            the number of the slot in the scheduler
+        cpu_threads : int or None
+            the cpu threads available to a task in this slot. If None the
+            number is not limited
+        gpu_contexts : int or None
+            the gpu contexts available to a task in this slot. If None the
+            number is not limited
+        """
+        self.index = index
+        self.cpu_threads = cpu_threads
+        self.gpu_contexts = gpu_contexts
+        self._initialize()
+
+    def _initialize(self):
+        if getattr(self, 'pidfd', None) is not None:
+            os.close(self.pidfd)
+
+        self.task = None
+        self.sub = None
+        self.pidfd = None
+        self.pipes = {}
+        self.unit_dir = None
+        self.started = None
+        self.std = {}
+
+    @property
+    def is_free(self):
+        return self.task is None
+
+    @staticmethod
+    def _fits(required, available):
+        return available is None or (
+            required is not None and required <= available)
+
+    def fits(self, task):
+        """
+        Check if the resource requirements of a task fit into the slot
+
+        Parameters
+        ----------
+        task : `Task`
+            the task to be checked
+
+        Returns
+        -------
+        bool
+            True if the slot has enough cpu threads and gpu contexts
+        """
+        requirements = getattr(task, 'resource_requirements', None) or {}
+        return (
+            self._fits(requirements.get('cpu_threads', 1), self.cpu_threads)
+            and self._fits(
+                requirements.get('gpu_contexts', 0), self.gpu_contexts))
+
+    def covers(self, other):
+        """
+        Check if all tasks that fit into another slot fit into this one
+
+        Parameters
+        ----------
+        other : `WorkerSlot`
+            the slot to be compared
+
+        Returns
+        -------
+        bool
+            True if this slot has at least the resources of the other one
+        """
+        return (
+            self._fits(other.cpu_threads, self.cpu_threads)
+            and self._fits(other.gpu_contexts, self.gpu_contexts))
+
+    @property
+    def status(self):
+        """
+        dict : the state of the slot as stored in the worker document
+        """
+        return {
+            'index': self.index,
+            'cpu_threads': self.cpu_threads,
+            'gpu_contexts': self.gpu_contexts,
+            'state': 'idle' if self.task is None else 'running',
+            'task': None if self.task is None else str(
+                uuid.UUID(int=self.task.__uuid__)),
+            'started': self.started
+        }
+
 
 class WorkerScheduler(Scheduler):
-    def __init__(self, resource, verbose=False):
+    # seconds between checks for the exit of tasks without a process file
+    # descriptor. Exits are noticed earlier if the output pipes are closed
+    reap_interval = 1.0
+
+    # bytes of the output of a task kept in memory and stored in the log
+    # entries, the full output is written to files in the task folder
+    std_head = 16384
+    std_tail = 65536
+    std_files = {'stdout': 'running.out', 'stderr': 'running.err'}
+
+    # bytes of the output of running tasks published by the worker
+    live_tail = 2048
+
+    # the `StageCache` task inputs are linked from. If None they are
+    # linked from the staging area and written to each task folder
+    stage_cache = None
+
+    def __init__(self, resource, verbose=False, slots=None):
         """
         A single instance worker scheduler to interprete `Task` objects
 
@@ -84,19 +430,22 @@ class WorkerScheduler(Scheduler):
             the resource this scheduler should use.
         verbose : bool
             if True the worker will report lots of stuff
+        slots : list of `WorkerSlot` or None
+            the slots to run tasks in. If None a single slot is used that
+            runs one task after another independent of its requirements
         """
         super(WorkerScheduler, self).__init__(resource)
-        self._current_sub = None
-        self._current_unit_dir = None
-        self.current_task = None
+        if not slots:
+            slots = [WorkerSlot(0)]
+
+        self.slots = list(slots)
         self.home_path = os.path.expanduser('~')
         self._done_tasks = set()
         self._save_log_to_db = True
         self.verbose = verbose
         self._fail_after_each_command = True
         self._cleanup_successful = True
-
-        self._std = {}
+        self._log_grid = None
 
     @property
     def path(self):
@@ -127,7 +476,8 @@ class WorkerScheduler(Scheduler):
         wrapped_task = task >> self.wrapper >> self.resource.wrapper
 
         # call the reducer that interpretes task actions
-        reducer = StrFilterParser() >> PrefixParser() >> WorkerParser() >> BashParser()
+        reducer = StrFilterParser() >> PrefixParser() >> WorkerParser() >> \
+            BashParser() >> StageCacheParser()
         script = reducer(self, wrapped_task.script)
 
         if self._fail_after_each_command:
@@ -158,6 +508,34 @@ class WorkerScheduler(Scheduler):
 
         return tasks
 
+    @property
+    def running_slots(self):
+        """
+        list of `WorkerSlot` : the slots that currently run a task
+        """
+        return [slot for slot in self.slots if not slot.is_free]
+
+    @property
+    def current_tasks(self):
+        """
+        list of `Task` : the tasks that are currently executed
+        """
+        return [slot.task for slot in self.running_slots]
+
+    @property
+    def current_task(self):
+        """
+        Return the task executed in the first busy slot
+
+        Returns
+        -------
+        `Task` or None
+            the task or None if no task is executed at the time
+
+        """
+        running = self.running_slots
+        return running[0].task if running else None
+
     @property
     def current_task_dir(self):
         """
@@ -168,12 +546,78 @@ class WorkerScheduler(Scheduler):
             the path or None if no task is executed at the time
 
         """
-        if self._current_unit_dir is not None:
-            return self.path + '/workers/' + self._current_unit_dir
+        running = self.running_slots
+        return self.slot_dir(running[0]) if running else None
+
+    def slot_dir(self, slot):
+        """
+        Return the path to the directory of the task running in a slot
+
+        Parameters
+        ----------
+        slot : `WorkerSlot`
+            the slot of the task
+
+        Returns
+        -------
+        str or None
+            the path or None if the slot is free
+
+        """
+        if slot.unit_dir is not None:
+            return self.path + '/workers/' + slot.unit_dir
         else:
             return None
 
-    def _start_job(self, task):
+    def free_slot(self, task, exclude=None):
+        """
+        Return a free slot the task fits into
+
+        Parameters
+        ----------
+        task : `Task`
+            the task to be placed
+        exclude : list of `WorkerSlot` or None
+            slots that must not be used
+
+        Returns
+        -------
+        `WorkerSlot` or None
+            the smallest free slot that fits or None if there is none
+        """
+        exclude = exclude or []
+        free = [
+            slot for slot in self.slots
+            if slot.is_free and slot not in exclude and slot.fits(task)]
+
+        for slot in free:
+            if all(other.covers(slot) for other in free):
+                return slot
+
+        return free[0] if free else None
+
+    def unreserved_slots(self):
+        """
+        Return the free slots that no queued task will be started in
+
+        Returns
+        -------
+        list of `WorkerSlot`
+            the slots new tasks can be claimed for
+        """
+        running = set(task.__uuid__ for task in self.current_tasks)
+        reserved = []
+        for task in self.tasks.values():
+            if task.__uuid__ not in running:
+                slot = self.free_slot(task, reserved)
+                if slot is not None:
+                    reserved.append(slot)
+
+        return [
+            slot for slot in self.slots
+            if slot.is_free and slot not in reserved]
+
+    def _start_job(self, task, slot=None):
         """
         Start execution of a task
 
@@ -181,11 +625,18 @@ class WorkerScheduler(Scheduler):
         ----------
         task : `Task`
             the task to be executed
+        slot : `WorkerSlot` or None
+            the slot to run the task in. If None the first slot is used
 
         """
-        self._current_unit_dir = 'worker.%s' % hex(task.__uuid__)
+        if slot is None:
+            slot = self.slots[0]
 
-        script_location = self.current_task_dir
+        slot.task = task
+        slot.unit_dir = 'worker.%s' % hex(task.__uuid__)
+        slot.started = time.time()
+
+        script_location = self.slot_dir(slot)
 
         if os.path.exists(script_location):
             print('removing existing folder', script_location)
@@ -196,7 +647,8 @@ class WorkerScheduler(Scheduler):
         # create a fresh folder
         os.makedirs(script_location)
 
-        # and set the current directory
+        # and set the current directory, parsing the task writes files
+        # relative to it
         os.chdir(script_location)
 
         task.fire('submit', self)
@@ -222,188 +674,326 @@ class WorkerScheduler(Scheduler):
         else:
             preexec_fn = None
 
-        self._current_sub = subprocess.Popen(
+        slot.sub = subprocess.Popen(
             ['/bin/bash', script_location + '/running.sh'],
             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            preexec_fn=preexec_fn, shell=False)
+            preexec_fn=preexec_fn, shell=False, cwd=script_location)
 
-        # this is a special hack that allows to read from stdout and stderr
-        # without a blocking `.read`, let's hope this works
-        flags = fcntl(self._current_sub.stdout, F_GETFL)  # get current p.stdout flags
-        fcntl(self._current_sub.stdout, F_SETFL, flags | os.O_NONBLOCK)
+        # read from stdout and stderr without a blocking `.read` once
+        # the worker is woken up by output
+        for s in ['stdout', 'stderr']:
+            pipe = getattr(slot.sub, s)
+            _set_nonblocking(pipe)
+            slot.pipes[pipe.fileno()] = s
 
-        flags = fcntl(self._current_sub.stderr, F_GETFL)  # get current p.stderr flags
-        fcntl(self._current_sub.stderr, F_SETFL, flags | os.O_NONBLOCK)
+        # wake up the worker as soon as the process exits
+        slot.pidfd = _pidfd_open(slot.sub.pid)
 
         # prepare std catching
-        self._start_std()
+        self._start_std(slot)
 
-    def stop_current(self):
+    def wait_fds(self):
         """
-        Stop execution of the current task immediately
+        Return the file descriptors that signal progress of running tasks
+
+        Returns
+        -------
+        list of int
+            the open output pipes and process file descriptors of all
+            running tasks
+        """
+        fds = []
+        for slot in self.running_slots:
+            fds.extend(slot.pipes)
+            if slot.pidfd is not None:
+                fds.append(slot.pidfd)
+
+        return fds
+
+    @property
+    def wait_timeout(self):
+        """
+        float or None : the seconds until running tasks need to be checked
+        even without an event or None if there is no such limit
+        """
+        timeout = None
+        for slot in self.running_slots:
+            if slot.pidfd is None:
+                # the process might have exited while other processes
+                # keep the output pipes open
+                timeout = self.reap_interval if slot.pipes else 0.05
+
+        return timeout
+
+    def stop_slot(self, slot):
+        """
+        Stop execution of the task running in a slot immediately
+
+        Parameters
+        ----------
+        slot : `WorkerSlot`
+            the slot to be stopped
 
         Returns
         -------
         bool
-            if True the current task was cancelled, False if there
-            was no task running
+            if True the task was cancelled, False if there was no task
+            running in the slot
 
         """
-        if self._current_sub is not None:
-            task = self.current_task
-            self._current_sub.kill()
+        if slot.sub is not None:
+            task = slot.task
+            slot.sub.kill()
             del self.tasks[task.__uuid__]
-            self._final_std()
-            self.current_task = None
+            self._final_std(slot)
+            slot._initialize()
 
             return True
         else:
             return False
 
-    def _start_std(self):
-        self._std = {
-            'stdout': '',
-            'stderr': ''
+    def stop_current(self):
+        """
+        Stop execution of all current tasks immediately
+
+        Returns
+        -------
+        bool
+            if True a current task was cancelled, False if there
+            was no task running
+
+        """
+        stopped = False
+        for slot in self.running_slots:
+            stopped = self.stop_slot(slot) or stopped
+
+        return stopped
+
+    @property
+    def log_grid(self):
+        """
+        Return the GridFS that holds the full output of tasks
+
+        Returns
+        -------
+        `gridfs.GridFS`
+        """
+        if self._log_grid is None:
+            self._log_grid = self.project.storage.create_grid(
+                LogEntry.grid_name)
+
+        return self._log_grid
+
+    def _start_std(self, slot):
+        script_location = self.slot_dir(slot)
+        slot.std = {
+            s: StreamCapture(
+                script_location + '/' + name, self.std_head, self.std_tail)
+            for s, name in self.std_files.items()
         }
 
-    def _advance_std(self):
+    def tails(self, size=None):
+        """
+        Return the last output of all running tasks
+
+        Parameters
+        ----------
+        size : int or None
+            the maximal number of bytes per stream. If None `live_tail`
+
+        Returns
+        -------
+        dict of str : dict of str : str
+            the `stdout` and `stderr` by the uuid of the running task
         """
-        Advance the stdout and stderr for some bytes, save it and redirect
+        if size is None:
+            size = self.live_tail
+
+        return {
+            str(uuid.UUID(int=slot.task.__uuid__)): {
+                s: capture.tail(size).decode('utf8', 'replace')
+                for s, capture in slot.std.items()}
+            for slot in self.running_slots if slot.std}
+
+    def _advance_std(self, slot):
         """
-        for s in ['stdout', 'stderr']:
-            try:
-                new_std = os.read(getattr(self._current_sub, s).fileno(), 1024)
-                if six.PY3:
-                    new_std = new_std.decode('utf8')
-                self._std[s] += new_std
+        Read all available stdout and stderr, save it and redirect
+        """
+        for fd, s in list(slot.pipes.items()):
+            while True:
+                try:
+                    new_std = os.read(fd, 65536)
+                except OSError:
+                    # nothing to read right now
+                    break
+
+                if not new_std:
+                    # the pipe is closed, usually because the task exited
+                    del slot.pipes[fd]
+                    break
+
+                slot.std[s].write(new_std)
                 if self.verbose:
                     # send to stdout, stderr
+                    if six.PY3:
+                        new_std = new_std.decode('utf8', 'replace')
                     std = getattr(sys, s)
                     std.write(new_std)
                     std.flush()
 
-            except OSError:
-                pass
-
-    def _final_std(self):
+    def _final_std(self, slot):
         """
         Finish capturing of stdout and stderr
 
+        The log entries contain the head and the tail of the output. If
+        output was skipped the full output is uploaded compressed as well
+
         """
-        task = self.current_task
-        try:
-            out, err = self._current_sub.communicate()
-            if six.PY3:
-                out = out.decode('utf8')
-                err = err.decode('utf8')
-            if self.verbose:
-                sys.stderr.write(err)
-                sys.stdout.write(out)
-
-            # save full message
-            stdout = self._std['stdout'] + out
-            stderr = self._std['stderr'] + err
-
-            if self._save_log_to_db:
-                log_err = LogEntry(
-                    'worker',
-                    'stderr from running task',
-                    stderr
-                )
-                log_out = LogEntry(
+        task = slot.task
+
+        # read what is left without waiting for processes that might
+        # have inherited the pipes
+        self._advance_std(slot)
+        slot.sub.stdout.close()
+        slot.sub.stderr.close()
+        slot.sub.wait()
+
+        for capture in slot.std.values():
+            capture.close()
+
+        if self._save_log_to_db:
+            logs = {}
+            for s in ['stderr', 'stdout']:
+                capture = slot.std[s]
+                log = LogEntry(
                     'worker',
-                    'stdout from running task',
-                    stdout
+                    '%s from running task' % s,
+                    capture.excerpt().decode('utf8', 'replace'),
+                    size=capture.size if capture.skipped else None
                 )
-                self.project.logs.add(log_err)
-                self.project.logs.add(log_out)
+                if log.size is not None:
+                    capture.upload(
+                        self.log_grid, log.file_id, stream=s,
+                        task=str(uuid.UUID(int=task.__uuid__)))
 
-                task.stdout = log_out
-                task.stderr = log_err
+                self.project.logs.add(log)
+                logs[s] = log
 
-        except ValueError:
-            pass
+            task.stdout = logs['stdout']
+            task.stderr = logs['stderr']
 
     def advance(self):
         """
         Advance checking if tasks are completed or failed
 
-        Needs to be called in regular intervals. Usually by the main
-        worker instance
+        Needs to be called in regular intervals or when one of the
+        `wait_fds` is ready. Usually by the main worker instance. Finished
+        tasks are completed and queued tasks are started in free slots
+        they fit into
+
+        Returns
+        -------
+        int
+            the number of tasks that finished
 
         """
-        if self.current_task is None:
-            if len(self.tasks) > 0:
-                t = next(iter(self.tasks.values()))
-                self.current_task = t
-                self._start_job(t)
-        else:
-            task = self.current_task
-            # get current outputs
-            return_code = self._current_sub.poll()
-
-            # update current stdout and stderr by 1024 bytes
-
-            self._advance_std()
-
-            if return_code is not None:
-                # finish std catching
-                self._final_std()
-
-                if return_code == 0:
-                    # success
-
-                    all_files_present = True
-                    # see first if we have all claimed files for worker output staging transfer
-                    for f in task.targets:
-                        if isinstance(f, Transfer):
-                            if not os.path.exists(self.replace_prefix(f.source.url)):
-                                log = LogEntry(
-                                    'worker',
-                                    'execution error',
-                                    'failed to create file before staging %s' % f.source.short,
-                                    objs={'file': f, 'task': task}
-                                )
-                                self.project.logs.add(log)
-                                all_files_present = False
-
-                    if all_files_present:
-                        try:
-                            task.fire('success', self)
-                            task.state = 'success'
-                            print('task succeeded')
-                            if self._cleanup_successful:
-                                print('removing worker dir')
-                                # go to an existing folder before we delete
-                                os.chdir(self.path)
-                                script_location = self.current_task_dir
-                                if script_location is not None:
-                                    shutil.rmtree(script_location)
-                        except IOError:
-
-                            task.state = 'fail'
-                    else:
-                        task.state = 'fail'
-                else:
-                    # failed
-                    log = LogEntry(
-                        'worker',
-                        'task failed',
-                        'see log files',
-                        objs={'task': task}
-                    )
-                    self.project.logs.add(log)
-                    task.state = 'failed'
+        finished = 0
+        for slot in self.running_slots:
+            finished += self._advance_slot(slot)
+
+        running = set(task.__uuid__ for task in self.current_tasks)
+        for task in list(self.tasks.values()):
+            if task.__uuid__ in running:
+                continue
+
+            slot = self.free_slot(task)
+            if slot is not None:
+                self._start_job(task, slot)
+                running.add(task.__uuid__)
+
+            elif not any(slot.fits(task) for slot in self.slots):
+                # the task will never fit, so let another worker run it
+                print('releasing task that does not fit into any slot')
+                task.state = 'created'
+                task.worker = None
+                del self.tasks[task.__uuid__]
+
+        return finished
+
+    def _advance_slot(self, slot):
+        task = slot.task
+        # get current outputs
+        return_code = slot.sub.poll()
+
+        # update current stdout and stderr by 1024 bytes
+
+        self._advance_std(slot)
+
+        if return_code is not None:
+            # finish std catching
+            self._final_std(slot)
+
+            # callbacks and checks use paths relative to the task folder
+            script_location = self.slot_dir(slot)
+            os.chdir(script_location)
+
+            if return_code == 0:
+                # success
+
+                all_files_present = True
+                # see first if we have all claimed files for worker output staging transfer
+                for f in task.targets:
+                    if isinstance(f, Transfer):
+                        if not os.path.exists(self.replace_prefix(f.source.url)):
+                            log = LogEntry(
+                                'worker',
+                                'execution error',
+                                'failed to create file before staging %s' % f.source.short,
+                                objs={'file': f, 'task': task}
+                            )
+                            self.project.logs.add(log)
+                            all_files_present = False
+
+                if all_files_present:
                     try:
-                        task.fire('fail', self)
+                        task.fire('success', self)
+                        task.state = 'success'
+                        self.project.storage.tasks.remove_pending(task)
+                        print('task succeeded')
+                        if self._cleanup_successful:
+                            print('removing worker dir')
+                            # go to an existing folder before we delete
+                            os.chdir(self.path)
+                            shutil.rmtree(script_location)
                     except IOError:
-                        pass
 
+                        task.state = 'fail'
+                else:
                     task.state = 'fail'
+            else:
+                # failed
+                log = LogEntry(
+                    'worker',
+                    'task failed',
+                    'see log files',
+                    objs={'task': task}
+                )
+                self.project.logs.add(log)
+                task.state = 'failed'
+                try:
+                    task.fire('fail', self)
+                except IOError:
+                    pass
 
-                del self.tasks[task.__uuid__]
-                self._done_tasks.add(task.__uuid__)
-                self._initialize_current()
+                task.state = 'fail'
+
+            del self.tasks[task.__uuid__]
+            self._done_tasks.add(task.__uuid__)
+            slot._initialize()
+
+            return 1
+
+        return 0
 
     def release_queued_tasks(self):
         """
@@ -419,11 +1009,6 @@ class WorkerScheduler(Scheduler):
                 t.worker = None
                 del self.tasks[t.__uuid__]
 
-    def _initialize_current(self):
-        self._current_sub = None
-        self._current_unit_dir = None
-        self.current_task = None
-
     def enter(self, project=None):
         self.change_state('booting')
         if project is not None:
@@ -513,14 +1098,14 @@ class WorkerScheduler(Scheduler):
                 self.advance()
                 time.sleep(2.0)
 
-        # kill the current job
+        # kill the current jobs
         self.change_state('shuttingdown')
-        if self.current_task:
+        for task in self.current_tasks:
             if True:
-                self.current_task.state = 'created'
+                task.state = 'created'
             else:
-                self.current_task.state = 'cancelled'
-            self.stop_current()
+                task.state = 'cancelled'
+        self.stop_current()
 
         self.change_state('down')
 
@@ -528,9 +1113,54 @@ class WorkerScheduler(Scheduler):
 class Worker(StorableMixin):
     """
     A Worker instance the will submit tasks from the DB to a scheduler
+
+    Parameters
+    ----------
+    walltime : int or None
+        seconds until the worker shuts down
+    generators : list of str or None
+        if not None only tasks of generators with these names are run
+    sleep : float
+        seconds between two checks for new tasks if the DB cannot notify
+        the worker, and between two heartbeats of a busy worker
+    heartbeat : float
+        the maximal seconds between two heartbeats. The heartbeat interval
+        of an idle worker doubles up to this value
+    prefetch : int
+        the number of tasks claimed for each free slot
+    verbose : bool
+        if True the stdout and stderr of tasks is shown
+    n_slots : int
+        the number of tasks run at the same time
+    cpu_threads : int or None
+        the cpu threads of each slot. Only tasks that do not require more
+        are run. If None the number is not limited
+    gpu_contexts : int or None
+        the gpu contexts of each slot. Only tasks that do not require more
+        are run. If None the number is not limited
+    stage_cache : str or None
+        a node-local directory to cache task inputs in, see `StageCache`.
+        It can be shared by all workers on a node. If None inputs are not
+        cached
+    stage_cache_size : int or None
+        the maximal size of the cache in bytes. If None it is not limited
+
+    Attributes
+    ----------
+    slots : list of dict
+        the state of each slot and the uuid of the task running in it
+    tails : dict
+        the last output of the running tasks, updated every heartbeat. See
+        `tail`
+    usage : dict
+        the load of the node and the resources used by the worker at the
+        last heartbeat
     """
 
-    _find_by = ['state', 'n_tasks', 'seen', 'verbose', 'prefetch', 'current']
+    _find_by = [
+        'state', 'n_tasks', 'seen', 'verbose', 'prefetch', 'current', 'slots',
+        'tails', 'usage']
+    _index_by = ['state']
 
     state = SyncVariable('state')
     n_tasks = SyncVariable('n_tasks')
@@ -539,9 +1169,14 @@ class Worker(StorableMixin):
     prefetch = SyncVariable('prefetch')
     command = SyncVariable('command')
     current = ObjectSyncVariable('current', 'tasks')
+    slots = SyncVariable('slots')
+    tails = SyncVariable('tails')
+    usage = SyncVariable('usage')
 
     def __init__(self, walltime=None, generators=None, sleep=None,
-                 heartbeat=None, prefetch=1, verbose=False):
+                 heartbeat=None, prefetch=1, verbose=False,
+                 n_slots=1, cpu_threads=None, gpu_contexts=None,
+                 stage_cache=None, stage_cache_size=None):
         super(Worker, self).__init__()
         self.hostname = socket.gethostname()
         self.cwd = os.getcwd()
@@ -551,18 +1186,26 @@ class Worker(StorableMixin):
         self.sleep = sleep
         self.heartbeat = heartbeat
         self.prefetch = prefetch
+        self.n_slots = n_slots
+        self.cpu_threads = cpu_threads
+        self.gpu_contexts = gpu_contexts
+        self.stage_cache = stage_cache
+        self.stage_cache_size = stage_cache_size
+        self.slots = []
+        self.tails = {}
+        self.usage = {}
         self.reconnect_time = 10
         self._scheduler = None
         self._project = None
         self.command = None
         self.verbose = verbose
         self.current = None
-        self._last_current = None
         self.pid = os.getpid()
 
     to_dict = create_to_dict([
         'walltime', 'generators', 'sleep', 'heartbeat', 'hostname',
-        'cwd', 'seen', 'prefetch', 'pid'
+        'cwd', 'seen', 'prefetch', 'pid', 'n_slots', 'cpu_threads',
+        'gpu_contexts', 'stage_cache', 'stage_cache_size'
     ])
 
     @classmethod
@@ -576,8 +1219,20 @@ class Worker(StorableMixin):
         return obj
 
     def create(self, project):
-        scheduler = WorkerScheduler(project._current_configuration, self.verbose)
+        slots = None
+        if self.n_slots > 1 or self.cpu_threads is not None or \
+                self.gpu_contexts is not None:
+            slots = [
+                WorkerSlot(n, self.cpu_threads, self.gpu_contexts)
+                for n in range(self.n_slots)]
+
+        scheduler = WorkerScheduler(
+            project._current_configuration, self.verbose, slots)
         scheduler._state_cb = self._state_cb
+        if self.stage_cache:
+            scheduler.stage_cache = StageCache(
+                self.stage_cache, max_size=self.stage_cache_size)
+
         self._scheduler = scheduler
         self._project = project
         scheduler.enter(project)
@@ -611,13 +1266,14 @@ class Worker(StorableMixin):
 
     def _stop_current(self, mode):
         sc = self.scheduler
-        task = sc.current_task
 
-        if task:
-            attempt = self.project.storage.tasks.modify_test_one(
-                lambda x: x == task, 'state', 'running', 'stopping')
+        for slot in sc.running_slots:
+            task = slot.task
+            attempt = self.project.storage.tasks.claim_one(
+                {'_id': str(uuid.UUID(int=task.__uuid__))},
+                'state', 'running', 'stopping')
             if attempt is not None:
-                if sc.stop_current():
+                if sc.stop_slot(slot):
                     # success, so mark the task as cancelled
                     task.state = mode
                     task.worker = None
@@ -630,6 +1286,124 @@ class Worker(StorableMixin):
                 # semms in the meantime the task has finished (success/fail)
                 pass
 
+    def _claim_task(self, query):
+        """
+        Claim one ready task on the DB and mark it as queued
+
+        Parameters
+        ----------
+        query : dict
+            the query selecting tasks this worker can run, see
+            `Task.ready_query`
+
+        Returns
+        -------
+        `Task` or None
+            the claimed task or None if no task was ready
+
+        """
+        tasks = self.project.storage.tasks
+        resolved = False
+        rejected = []
+        while True:
+            task = tasks.claim_one(
+                query, 'state', 'created', 'queued', exclude=rejected)
+
+            if task is None and not resolved:
+                # dependencies might have succeeded since the tasks were
+                # stored
+                resolved = True
+                if tasks.resolve_pending(
+                        {'state': 'created'}, 'state', 'success'):
+                    continue
+
+            if task is None or task.ready:
+                return task
+
+            # some tasks have additional conditions that can only be checked
+            # locally, e.g. the existence of files. Release these without
+            # waking up workers and try the next one
+            tasks.release_one(task, 'state', 'queued', 'created')
+            rejected.append(task)
+
+    def _claim_tasks(self, queries):
+        """
+        Claim ready tasks for all free slots and submit them
+
+        Parameters
+        ----------
+        queries : dict of int : dict
+            the query selecting the tasks that fit into a slot by the
+            index of the slot
+
+        Returns
+        -------
+        list of `Task`
+            the claimed tasks
+        """
+        scheduler = self._scheduler
+        claimed = []
+        # slots for which no task was found. Smaller slots will not find
+        # one either, so we do not ask for them
+        empty = []
+        for slot in scheduler.unreserved_slots():
+            if any(other.covers(slot) for other in empty):
+                continue
+
+            for _ in range(self.prefetch):
+                done = False
+                attempt = 0
+                retries = 10
+                while not done:
+
+                    try:
+                        tasklist = scheduler(
+                            self._claim_task(queries[slot.index]))
+                        done = True
+
+                    except RuntimeError as e:
+                        if attempt < retries:
+                            print("Connection Timeout #{0} ignored"
+                                  .format(attempt))
+                            attempt += 1
+                            time.sleep(2)
+                        else:
+                            raise e
+
+                if not tasklist:
+                    empty.append(slot)
+                    break
+
+                for task in tasklist:
+                    task.worker = self
+                    print('queued a task [%s] from generator `%s`' % (
+                        task.__class__.__name__,
+                        task.generator.name if task.generator else '---'))
+
+                claimed.extend(tasklist)
+
+        return claimed
+
+    def tail(self, task, stream='stdout'):
+        """
+        Return the last output of a task running on this worker
+
+        Parameters
+        ----------
+        task : `Task`
+            the running task
+        stream : str
+            `stdout` or `stderr`
+
+        Returns
+        -------
+        str or None
+            the output at the last heartbeat or None if the task was not
+            running then
+        """
+        tails = self.tails or {}
+        return tails.get(str(uuid.UUID(int=task.__uuid__)), {}).get(stream)
+
     def execute(self, command):
         """
         Send and execute a single command to the worker
@@ -649,22 +1423,106 @@ class Worker(StorableMixin):
         """
         self.command = command
 
+    def _watch(self, reactor):
+        """
+        Follow the changes of ready tasks and of commands to this worker
+
+        Parameters
+        ----------
+        reactor : `WorkerReactor`
+            the reactor to be notified
+        """
+        reactor.watch('tasks', self._project.storage.tasks._document, [
+            {'$match': {'$or': [
+                {'operationType': {'$in': ['insert', 'replace']}},
+                # tasks released by `_claim_task` are still not ready
+                {'updateDescription.updatedFields.state': 'created',
+                 'updateDescription.updatedFields._released': {
+                     '$exists': False}},
+                {'updateDescription.updatedFields._pending': []}]}}])
+
+        if self.__store__ is not None:
+            reactor.watch('worker', self.__store__._document, [
+                {'$match': {
+                    'documentKey._id': str(uuid.UUID(int=self.__uuid__)),
+                    'updateDescription.updatedFields.command': {
+                        '$ne': None}}}])
+
+    def _beat(self, values):
+        """
+        Write the status of the worker and consume a pending command
+
+        All values are written with a single DB operation that also returns
+        and resets the command sent to the worker since the last heartbeat.
+        It caches the state of the worker as well, so reading it right
+        afterwards does not contact the DB.
+
+        Parameters
+        ----------
+        values : dict of str : object
+            the new values of sync variables by name
+
+        Returns
+        -------
+        str or None
+            the pending command
+        """
+        store = self.__store__
+        if store is None:
+            for name, value in values.items():
+                setattr(self, name, value)
+
+            command, self.command = self.command, None
+            return command
+
+        return store.exchange(self, values, ['command']).get('command')
+
+    @staticmethod
+    def _status(scheduler):
+        return {
+            'current': scheduler.current_task,
+            'slots': [slot.status for slot in scheduler.slots],
+            'n_tasks': len(scheduler.tasks)}
+
+    def _poll_interval(self, reactor, source):
+        if reactor.watching(source):
+            # changes are notified, poll only in case some were missed
+            return max(self.sleep, self.heartbeat)
+
+        return self.sleep
+
     def run(self):
         """
         Start the worker to execute tasks until it is shut down
 
+        The worker waits for events instead of sleeping between checks. It
+        wakes up as soon as a task exits or writes output, a heartbeat is
+        due, or if new tasks or commands are stored. New tasks and commands
+        are noticed from change streams if the DB supports them and
+        otherwise by polling the DB every `sleep` seconds.
+
+        Each heartbeat is a single DB operation that writes the status of
+        the worker and its slots, the resource usage and the output of
+        running tasks, and reads a pending command. A heartbeat is sent
+        right away when the status changes. Otherwise the interval starts
+        at `sleep` and doubles up to `heartbeat` while the worker is idle.
+
         """
         scheduler = self._scheduler
         project = self._project
 
-        last = time.time()
-        last_n_tasks = 0
-        self.seen = last
+        last_status = {}
+        last_tails = {}
+        interval = min(self.sleep, self.heartbeat)
 
-        def task_test(x):
-            return x.ready and (not self.generators or (
-                hasattr(x.generator, 'name') and x.generator.name
-                in self.generators))
+        queries = {
+            slot.index: Task.ready_query(
+                self.generators,
+                cpu_threads=slot.cpu_threads,
+                gpu_contexts=slot.gpu_contexts)
+            for slot in scheduler.slots}
+
+        reactor = WorkerReactor()
 
         print('up and running ...')
 
@@ -681,65 +1539,89 @@ class Worker(StorableMixin):
 
                         print('remove all pending tasks')
                         # remove all pending tasks as much as possible
+                        current_tasks = scheduler.current_tasks
                         for t in list(scheduler.tasks.values()):
-                            if t is not scheduler.current_task:
+                            if t not in current_tasks:
                                 if t.worker == self:
                                     t.state = 'created'
                                     t.worker = None
 
                                 del scheduler.tasks[t.__uuid__]
 
-                        # see, if we can salvage the currently running task
-                        # unless it has been cancelled and is running with another worker
-                        t = scheduler.current_task
-                        if t.worker == self and t.state == 'running':
-                            print('continuing current task')
-                            # seems like the task is still ours to finish
-                            pass
-                        else:
-                            print('current task has been captured. releasing.')
-                            scheduler.stop_current()
+                        # see, if we can salvage the currently running tasks
+                        # unless they have been cancelled and are running with another worker
+                        for slot in scheduler.running_slots:
+                            t = slot.task
+                            if t.worker == self and t.state == 'running':
+                                print('continuing current task')
+                                # seems like the task is still ours to finish
+                                pass
+                            else:
+                                print('current task has been captured. releasing.')
+                                scheduler.stop_slot(slot)
+
+                    self._watch(reactor)
+
+                    # check everything once
+                    notified = set(['tasks'])
+                    next_tasks = next_beat = time.time()
+                    claim = True
+                    state = self.state
 
                     # the main worker loop
                     while scheduler.state != 'down':
-                        state = self.state
+                        now = time.time()
+                        if 'tasks' in notified or now >= next_tasks:
+                            claim = True
+                            next_tasks = now + self._poll_interval(
+                                reactor, 'tasks')
+
                         # check the state of the worker
                         if state in self._running_states:
-                            scheduler.advance()
-                            if scheduler.is_idle:
-                                for _ in range(self.prefetch):
-                                    done = False
-                                    attempt = 0
-                                    retries = 10
-                                    while not done:
-
-                                        try:
-                                            tasklist = scheduler(
-                                                project.storage.tasks.modify_test_one(
-                                                 task_test, 'state', 'created', 'queued'))
-                                            done = True
-
-                                        except RuntimeError as e:
-                                            if attempt < retries:
-                                                print("Connection Timeout #{0} ignored"
-                                                      .format(attempt))
-                                                attempt += 1
-                                                time.sleep(2)
-                                            else:
-                                                raise e
-
-                                    for task in tasklist:
-                                        task.worker = self
-                                        print('queued a task [%s] from generator `%s`' % (
-                                            task.__class__.__name__,
-                                            task.generator.name if task.generator else '---'))
-
-                                self.n_tasks = len(scheduler.tasks)
+                            if scheduler.advance():
+                                # slots became free
+                                claim = True
+
+                            if claim:
+                                claim = False
+                                if self._claim_tasks(queries):
+                                    # start the claimed tasks right away
+                                    scheduler.advance()
+
+                        # write changes of the status right away
+                        status = self._status(scheduler)
+                        changed = {
+                            key: value for key, value in status.items()
+                            if key not in last_status or
+                            last_status[key] != value}
+
+                        command = None
+                        if changed or 'worker' in notified or \
+                                now >= next_beat:
+                            usage = _resource_usage()
+                            if scheduler.stage_cache is not None:
+                                usage['stage_cache'] = dict(
+                                    scheduler.stage_cache.stats)
+
+                            values = dict(changed, seen=now, usage=usage)
+                            tails = scheduler.tails()
+                            if tails != last_tails:
+                                values['tails'] = tails
+                                last_tails = tails
+
+                            command = self._beat(values)
+                            last_status = status
+                            state = self.state
+
+                            if changed or command:
+                                interval = min(self.sleep, self.heartbeat)
+                            else:
+                                interval = min(2 * interval, self.heartbeat)
+
+                            next_beat = now + interval
 
                         # handle commands
                         # todo: Place all commands in a separate store and consume ?!?
-                        command = self.command
-
                         if command == 'shutdown':
                             # someone wants us to shutdown
                             scheduler.shut_down()
@@ -765,28 +1647,30 @@ class Worker(StorableMixin):
                                 )
                             )
 
-                        if command:
-                            self.command = None
-
-                        if time.time() - last > self.heartbeat:
-                            # heartbeat
-                            last = time.time()
-                            self.seen = last
-
-                        time.sleep(self.sleep)
                         if self.walltime and time.time() - self.__time__ > self.walltime:
                             # we have reached the set walltime and will shutdown
                             print('hit walltime of %s' % DT(self.walltime).length)
                             scheduler.shut_down()
 
-                        if scheduler.current_task is not self._last_current:
-                            self.current = scheduler.current_task
-                            self._last_current = self.current
+                        if scheduler.state == 'down':
+                            # leave the final status
+                            self._beat(dict(
+                                self._status(scheduler), seen=time.time()))
+                            break
+
+                        # wait for the next event or deadline
+                        deadlines = [next_beat]
+                        if state in self._running_states:
+                            deadlines.append(next_tasks)
+                        if self.walltime:
+                            deadlines.append(self.__time__ + self.walltime)
 
-                        n_tasks = len(scheduler.tasks)
-                        if n_tasks != last_n_tasks:
-                            self.n_tasks = n_tasks
-                            last_n_tasks = n_tasks
+                        timeout = min(deadlines) - time.time()
+                        if scheduler.wait_timeout is not None:
+                            timeout = min(timeout, scheduler.wait_timeout)
+
+                        _, notified = reactor.wait(
+                            scheduler.wait_fds(), timeout)
 
                 except (pymongo.errors.ConnectionFailure, pymongo.errors.AutoReconnect) as e:
                     print('pymongo connection error', e)
@@ -799,6 +1683,9 @@ class Worker(StorableMixin):
             scheduler.shut_down()
             pass
 
+        finally:
+            reactor.close()
+
     def shutdown(self, gracefully=True):
         """
         Shut down the worker
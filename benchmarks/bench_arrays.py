@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Compare storing the numpy arrays of a model as base64 and in GridFS
+
+Stores an MSM model dict shaped like the output of `remote_analysis` as
+`Model(DataDict(data))` like `remote_analysis` does, so the data goes to the
+`data` FileStore, and reports the bytes stored on the server and the time to
+save and load it.
+
+Usage: python bench_arrays.py [n_trajs] [traj_length] [n_states]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+import time
+
+import numpy as np
+
+from common import setup_dburl
+
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore, FileStore, DataDict
+from adaptivemd.model import Model
+
+NAME = 'bench-arrays'
+
+MODES = [
+    ('base64', False, None),
+    ('gridfs > 1 MiB', True, 1 << 20),
+    ('gridfs > 4 KiB', True, 1 << 12),
+]
+
+
+def msm_data(n_trajs, traj_length, n_states):
+    n_features = 3 * n_states
+    counts = np.random.randint(0, 100, (n_states, n_states))
+    return {
+        'clustering': {
+            'k': n_states,
+            'dtrajs': [
+                np.random.randint(0, n_states, traj_length).astype(np.int32)
+                for _ in range(n_trajs)],
+            'centers': np.random.random((n_states, 10))
+        },
+        'tica': {
+            'lagtime': 2,
+            'eigenvectors': np.random.random((n_features, n_features))
+        },
+        'msm': {
+            'lagtime': 2,
+            'C': counts,
+            'P': counts / counts.sum(axis=1, keepdims=True).astype(float),
+            'timescales': np.random.random(n_states - 1)
+        }
+    }
+
+
+def stored_bytes(db):
+    return sum(
+        db.command('collstats', name).get('size', 0)
+        for name in db.collection_names())
+
+
+def main(n_trajs=100, traj_length=10000, n_states=200):
+    setup_dburl()
+
+    data = msm_data(n_trajs, traj_length, n_states)
+    print('model with %d trajectories of length %d and %d states' % (
+        n_trajs, traj_length, n_states))
+
+    for mode, binary_arrays, threshold in MODES:
+        st = MongoDBStorage(NAME, 'w')
+        st.create_store(ObjectStore('models', Model))
+        st.create_store(FileStore('data', DataDict))
+        st.models.set_caching(True)
+        st.simplifier.binary_arrays = binary_arrays
+        if threshold is not None:
+            st.simplifier.json_array_threshold = threshold
+
+        model = Model(DataDict(data))
+        start = time.time()
+        st.models.save(model)
+        encode = time.time() - start
+        size = stored_bytes(st.db)
+        st.close()
+
+        st = MongoDBStorage(NAME)
+        start = time.time()
+        loaded = st.models.load(model.__uuid__)
+        loaded.data['msm']['P'].sum()
+        decode = time.time() - start
+        st.close()
+
+        print('%-20s %12d bytes  encode %8.3f s  decode %8.3f s' % (
+            mode, size, encode, decode))
+
+    MongoDBStorage.delete_storage(NAME)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
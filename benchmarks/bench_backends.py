@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Run the same storage workloads on MongoDB and the embedded SQLite backend
+
+For each backend URL the benchmark saves and loads tasks and log entries,
+reads and writes sync variables and claims all tasks. Without arguments it
+compares the MongoDB URL from `ADMD_DBURL`, an SQLite file and an in-memory
+SQLite database.
+
+Usage: python bench_backends.py [n_objects] [url ...]
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import tempfile
+
+from common import Timer
+
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore, close_clients
+from adaptivemd.task import Task
+
+NAME = 'bench-backends'
+
+
+def open_storage():
+    st = MongoDBStorage(NAME)
+    for store in st._stores.values():
+        store.set_caching(True)
+
+    return st
+
+
+def run(url, n_objects):
+    print('%s' % url)
+    MongoDBStorage._db_url = url
+
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('tasks', Task))
+    st.create_store(ObjectStore('logs', LogEntry))
+    st.close()
+
+    st = open_storage()
+    tasks = [Task() for _ in range(n_objects)]
+    logs = [LogEntry('bench', str(n), 'message') for n in range(n_objects)]
+
+    with Timer('save tasks'):
+        st.tasks.save(tasks)
+
+    with Timer('save logs'):
+        for log in logs:
+            st.logs.save(log)
+
+    st.close()
+
+    st = open_storage()
+    with Timer('load all tasks'):
+        tasks = list(st.tasks)
+
+    with Timer('load logs one by one'):
+        for idx in list(st.logs.index):
+            st.logs.load(idx)
+
+    st.tasks.sync_staleness = 0
+    with Timer('read sync variables'):
+        for task in tasks:
+            task.state
+
+    with Timer('write sync variables'):
+        for task in tasks:
+            task.state = 'created'
+
+    with Timer('claim all tasks'):
+        while st.tasks.claim_one(
+                {}, 'state', 'created', 'queued') is not None:
+            pass
+
+    st.close()
+    MongoDBStorage.delete_storage(NAME)
+    print()
+
+
+def main(n_objects=1000, *urls):
+    if not urls:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        urls = [
+            os.environ.get('ADMD_DBURL', MongoDBStorage._db_url),
+            'sqlite://' + path,
+            'sqlite://:memory:']
+
+    for url in urls:
+        run(url, n_objects)
+
+    close_clients()
+
+
+if __name__ == '__main__':
+    main(*([int(sys.argv[1])] + sys.argv[2:] if len(sys.argv) > 1 else []))
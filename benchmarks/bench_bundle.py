@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Compare filtering, sorting and sampling a stored bundle in python and in the DB
+
+Creates a files store with plain `File` objects and a fraction of
+`Trajectory` objects and runs the same filters with the python
+implementation of `BaseBundle` and with the queries of `StoredBundle`.
+Each filter starts with an empty cache, like a freshly opened project.
+
+Usage: python bench_bundle.py [n_files] [n_trajectories]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+
+from common import Timer, setup_dburl
+
+from adaptivemd import File, Trajectory
+from adaptivemd.bundle import BaseBundle, StoredBundle
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+
+NAME = 'bench-bundle'
+
+
+def open_bundle():
+    st = MongoDBStorage(NAME)
+    st.files.set_caching(True)
+    return st, StoredBundle().set_store(st.files)
+
+
+def main(n_files=100000, n_trajectories=10000):
+    setup_dburl()
+
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('files', File))
+    st.close()
+
+    st, files = open_bundle()
+    pdb = File('file://alanine.pdb').named('initial_pdb')
+    objs = [
+        File('file://input/%08d.txt' % n)
+        for n in range(n_files - n_trajectories)]
+    objs += [
+        Trajectory('project:///trajs/%08d' % n, pdb, 100 + n % 10)
+        for n in range(n_trajectories)]
+
+    st.files.save(objs)
+    st.close()
+    print('%d files, %d trajectories' % (n_files, n_trajectories))
+
+    filters = [
+        ('c(Trajectory)',
+         lambda b: b.c(Trajectory)),
+        ('c(Trajectory).m(length, 105)',
+         lambda b: b.c(Trajectory).m('length', 105)),
+        ('c(Trajectory).a(location, 00001)',
+         lambda b: b.c(Trajectory).a('location', '00001')),
+        ('c(Trajectory).sorted(length).first',
+         lambda b: [b.c(Trajectory).sorted('length').first]),
+        ('c(Trajectory).sorted(length).top(10)',
+         lambda b: b.c(Trajectory).sorted('length', True).top(10)),
+        ('c(Trajectory).sample(10)',
+         lambda b: b.c(Trajectory).sample(10))
+    ]
+
+    for name, fnc in filters:
+        for mode in ['python', 'query']:
+            st, files = open_bundle()
+            if mode == 'python':
+                files = _PythonBundle(files)
+
+            with Timer('%-6s %s' % (mode, name)):
+                n = len(list(fnc(files)))
+
+            print('%40s %d found, %d loaded' % ('', n, len(st.files.cache)))
+            st.close()
+
+    MongoDBStorage.delete_storage(NAME)
+
+
+class _PythonBundle(BaseBundle):
+    # the stored bundle with the filters of `BaseBundle`
+    def __init__(self, bundle):
+        self.bundle = bundle
+
+    def __iter__(self):
+        return iter(self.bundle)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
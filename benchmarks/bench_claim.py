@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Compare claiming tasks with `modify_test_one` and the server side `claim_one`
+
+A number of worker processes claim tasks from a shared store until no task
+is left. Half of the tasks depend on another task, so the legacy path has to
+load and test candidates that are not ready. Reports claims per second and
+conflicts, i.e. claim attempts lost to another worker.
+
+Usage: python bench_claim.py [n_tasks] [n_workers]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+import time
+import multiprocessing
+
+from common import counter, setup_dburl
+
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+from adaptivemd.task import Task
+from adaptivemd.worker import Worker
+from adaptivemd.logentry import LogEntry
+
+NAME = 'bench-claim'
+
+
+def create(n_tasks):
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('tasks', Task))
+    st.create_store(ObjectStore('workers', Worker))
+    st.create_store(ObjectStore('logs', LogEntry))
+    st.tasks.set_caching(True)
+
+    tasks = []
+    for n in range(n_tasks // 2):
+        blocked = Task()
+        task = Task()
+        task.dependencies = [blocked]
+        tasks.append(task)
+
+    st.tasks.save(tasks)
+    st.close()
+
+
+def run_worker(mode, results):
+    setup_dburl()
+    st = MongoDBStorage(NAME)
+    tasks = st.tasks
+    query = Task.ready_query()
+
+    counter.reset()
+    claims = 0
+    while True:
+        if mode == 'legacy':
+            task = tasks.modify_test_one(
+                lambda x: x.ready, 'state', 'created', 'queued')
+        else:
+            task = tasks.claim_one(query, 'state', 'created', 'queued')
+
+        if task is None:
+            break
+
+        claims += 1
+
+    # every attempt that did not claim a task, except the final empty one
+    conflicts = counter.counts['findAndModify'] - claims - 1
+    results.put((claims, max(conflicts, 0), counter.total))
+    st.close()
+
+
+def run(mode, n_workers):
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(mode, results))
+        for _ in range(n_workers)]
+
+    start = time.time()
+    for w in workers:
+        w.start()
+
+    stats = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+
+    elapsed = time.time() - start
+
+    claims = sum(s[0] for s in stats)
+    print('%-10s %6d claims  %8.3f s  %8.1f claims/s  %6d conflicts  '
+          '%8d round trips' % (
+              mode, claims, elapsed, claims / elapsed,
+              sum(s[1] for s in stats), sum(s[2] for s in stats)))
+
+
+def main(n_tasks=1000, n_workers=8):
+    setup_dburl()
+
+    print('claiming %d tasks with %d workers' % (n_tasks, n_workers))
+
+    for mode in ['legacy', 'claim']:
+        create(n_tasks)
+        run(mode, n_workers)
+
+    MongoDBStorage.delete_storage(NAME)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
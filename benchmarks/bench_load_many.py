@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Compare loading all objects of a store one by one with `ObjectStore.load_many`
+
+Usage: python bench_load_many.py [n_objects] [chunk_size]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+
+from common import Timer, setup_dburl
+
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+from adaptivemd.logentry import LogEntry
+
+
+def main(n_objects=10000, chunk_size=256):
+    setup_dburl()
+
+    name = 'bench-load-many'
+    st = MongoDBStorage(name, 'w')
+    st.create_store(ObjectStore('logs', LogEntry))
+    st.close()
+
+    st = MongoDBStorage(name)
+    st.logs.set_caching(True)
+    st.logs.save([
+        LogEntry('bench', 'entry %d' % n, 'message %d' % n)
+        for n in range(n_objects)])
+    st.close()
+
+    print('loading %d objects, chunk size %d' % (n_objects, chunk_size))
+
+    st = MongoDBStorage(name)
+    index = list(st.logs.index)
+    with Timer('load one by one'):
+        for idx in index:
+            st.logs.load(idx)
+    st.close()
+
+    st = MongoDBStorage(name)
+    index = list(st.logs.index)
+    with Timer('load_many'):
+        st.logs.load_many(index, chunk_size)
+    st.close()
+
+    st = MongoDBStorage(name)
+    st.logs.default_load_chunk_size = chunk_size
+    with Timer('iterate store'):
+        list(st.logs)
+    st.close()
+
+    MongoDBStorage.delete_storage(name)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Compare reading `model.data['msm']['C']` from a monolithic and a sectioned
+`DataDict`
+
+Each access runs in a fresh process, so the reported peak memory increase
+includes everything that had to be loaded to get the count matrix.
+
+Usage: python bench_model_sections.py [n_trajs] [traj_length] [n_states]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+import time
+import resource
+import multiprocessing
+
+import numpy as np
+
+from common import setup_dburl
+
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore, FileStore, \
+    DataDict
+from adaptivemd.model import Model
+
+NAME = 'bench-model-sections'
+
+
+def analysis_data(n_trajs, traj_length, n_states):
+    n_features = 3 * n_states
+    return {
+        'input': {
+            'trajectories': ['traj%06d' % n for n in range(n_trajs)]
+        },
+        'tica': {
+            'lagtime': 2,
+            'dimension': 2,
+            'eigenvectors': np.random.random((n_features, n_features))
+        },
+        'clustering': {
+            'k': n_states,
+            'dtrajs': [
+                np.random.randint(0, n_states, traj_length).astype(np.int32)
+                for _ in range(n_trajs)],
+            'centers': np.random.random((n_states, 2))
+        },
+        'msm': {
+            'lagtime': 2,
+            'C': np.random.randint(0, 100, (n_states, n_states)),
+            'timescales': np.random.random(n_states - 1)
+        }
+    }
+
+
+def create(sectioned, data):
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('models', Model))
+    st.create_store(FileStore('data', DataDict))
+    st.close()
+
+    st = MongoDBStorage(NAME)
+    st.models.set_caching(True)
+    st.data.set_caching(True)
+    DataDict.sectioned = sectioned
+    model = Model(DataDict(data))
+    st.models.save(model)
+    st.close()
+
+    return model.__uuid__
+
+
+def access(uuid, results):
+    setup_dburl()
+    st = MongoDBStorage(NAME)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    c = st.models.load(uuid).data['msm']['C']
+    c.sum()
+    elapsed = time.time() - start
+    results.put((
+        elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss))
+    st.close()
+
+
+def main(n_trajs=200, traj_length=10000, n_states=200):
+    setup_dburl()
+
+    data = analysis_data(n_trajs, traj_length, n_states)
+    print('model with %d trajectories of length %d and %d states' % (
+        n_trajs, traj_length, n_states))
+
+    for mode, sectioned in [('monolithic', False), ('sectioned', True)]:
+        uuid = create(sectioned, data)
+
+        results = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=access, args=(uuid, results))
+        proc.start()
+        elapsed, rss = results.get()
+        proc.join()
+
+        print('%-12s  data[msm][C] in %8.3f s  peak memory +%8d kB' % (
+            mode, elapsed, rss))
+
+    MongoDBStorage.delete_storage(NAME)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Measure the throughput of queueing new tasks that reference stored objects
+
+Every task references the same engine, the initial pdb file and its input
+files, which are all stored already. Tasks are saved one by one, like
+`Project.queue` does, and reported as tasks per second.
+
+Usage: python bench_queue.py [n_tasks]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+
+from common import Timer, setup_dburl
+
+from adaptivemd import File, Trajectory
+from adaptivemd.engine.openmm import OpenMMEngine
+from adaptivemd.generator import TaskGenerator
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+from adaptivemd.task import Task
+from adaptivemd.worker import Worker
+
+NAME = 'bench-queue'
+
+
+def main(n_tasks=2000):
+    setup_dburl()
+
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('generators', TaskGenerator))
+    st.create_store(ObjectStore('files', File))
+    st.create_store(ObjectStore('tasks', Task))
+    st.create_store(ObjectStore('workers', Worker))
+    st.create_store(ObjectStore('logs', LogEntry))
+    st.close()
+
+    st = MongoDBStorage(NAME)
+    for store in st._stores.values():
+        store.set_caching(True)
+
+    pdb = File('file://../files/alanine/alanine.pdb').named('initial_pdb')
+    engine = OpenMMEngine(
+        pdb_file=pdb,
+        system_file=File('file://../files/alanine/system.xml'),
+        integrator_file=File('file://../files/alanine/integrator.xml'),
+        args='-r --report-interval 1 -p CPU'
+    ).named('openmm')
+    engine.add_output_type('master', 'master.dcd', stride=10)
+    st.generators.save(engine)
+    st.files.save(pdb)
+
+    tasks = [
+        engine.run(Trajectory('project:///trajs/%08d' % n, pdb, 100, engine))
+        for n in range(n_tasks)]
+
+    with Timer('queue %d tasks one by one' % n_tasks) as timer:
+        for task in tasks:
+            st.tasks.save(task)
+
+    print('%.1f tasks/s' % (n_tasks / timer.elapsed))
+
+    st.close()
+    MongoDBStorage.delete_storage(NAME)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
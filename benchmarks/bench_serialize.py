@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Measure saving and loading `TrajectoryGenerationTask` objects
+
+Reports the full save and load through the storage and, separately, the
+CPU time spent in the simplifier to encode and decode the task documents.
+
+Usage: python bench_serialize.py [n_tasks]
+"""
+from __future__ import print_function, absolute_import
+
+import sys
+import time
+
+from common import Timer, setup_dburl
+
+from adaptivemd import File, Trajectory
+from adaptivemd.engine.openmm import OpenMMEngine
+from adaptivemd.generator import TaskGenerator
+from adaptivemd.logentry import LogEntry
+from adaptivemd.mongodb import MongoDBStorage, ObjectStore
+from adaptivemd.task import Task
+from adaptivemd.worker import Worker
+
+NAME = 'bench-serialize'
+
+
+def open_storage():
+    st = MongoDBStorage(NAME)
+    for store in st._stores.values():
+        store.set_caching(True)
+
+    return st
+
+
+def main(n_tasks=10000):
+    setup_dburl()
+
+    st = MongoDBStorage(NAME, 'w')
+    st.create_store(ObjectStore('generators', TaskGenerator))
+    st.create_store(ObjectStore('files', File))
+    st.create_store(ObjectStore('tasks', Task))
+    st.create_store(ObjectStore('workers', Worker))
+    st.create_store(ObjectStore('logs', LogEntry))
+    st.close()
+
+    st = open_storage()
+    pdb = File('file://../files/alanine/alanine.pdb').named('initial_pdb')
+    engine = OpenMMEngine(
+        pdb_file=pdb,
+        system_file=File('file://../files/alanine/system.xml'),
+        integrator_file=File('file://../files/alanine/integrator.xml'),
+        args='-r --report-interval 1 -p CPU'
+    ).named('openmm')
+    engine.add_output_type('master', 'master.dcd', stride=10)
+    engine.add_output_type('protein', 'protein.dcd', stride=1)
+    st.generators.save(engine)
+
+    tasks = [
+        engine.run(Trajectory('project:///trajs/%08d' % n, pdb, 100, engine))
+        for n in range(n_tasks)]
+
+    print('%d TrajectoryGenerationTasks' % n_tasks)
+
+    with Timer('save'):
+        st.tasks.save(tasks)
+
+    start = time.time()
+    docs = [st.simplifier.to_simple_dict(task) for task in tasks]
+    print('%-40s %8.3f s' % ('encode only', time.time() - start))
+    st.close()
+
+    st = open_storage()
+    with Timer('load'):
+        list(st.tasks)
+
+    start = time.time()
+    for doc in docs:
+        st.simplifier.from_simple_dict(doc)
+    print('%-40s %8.3f s' % ('decode only', time.time() - start))
+    st.close()
+
+    MongoDBStorage.delete_storage(NAME)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
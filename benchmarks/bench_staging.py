@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Measure staging task inputs into task folders with and without a stage cache
+
+Every task links three files from the staging area, copies one and writes
+a file stored in the DB, like a `TrajectoryGenerationTask` or a
+`PythonTask`. The folders are created below `shared` (the shared
+filesystem of a real worker) and the cache below `local`. Pass other
+directories to measure on the filesystems of a cluster node.
+
+No DB is needed.
+
+Usage: python bench_staging.py [n_tasks] [shared] [local]
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import time
+
+from adaptivemd import File, Task, WorkerScheduler
+from adaptivemd.stagecache import StageCache
+from adaptivemd.task import DummyTask
+
+
+class _Resource(object):
+    def __init__(self, shared_path):
+        self.shared_path = shared_path
+        self.wrapper = DummyTask()
+
+
+class _Project(object):
+    name = 'bench-staging'
+
+
+INPUTS = {
+    'system.xml': 2 << 20,
+    'integrator.xml': 4 << 10,
+    'input.pdb': 1 << 20,
+    '_run_.py': 16 << 10}
+
+
+def make_task(source):
+    task = Task()
+    for name in ['system.xml', 'integrator.xml', '_run_.py']:
+        task.link(File('staging:///' + name))
+
+    task.append(File('staging:///input.pdb').copy('initial.pdb'))
+    task.get(source)
+    return task
+
+
+def stage(scheduler, source, n_tasks):
+    workers = os.path.join(scheduler.path, 'workers')
+    start = time.time()
+    for n in range(n_tasks):
+        folder = os.path.join(workers, 'worker.%d' % n)
+        os.makedirs(folder)
+        os.chdir(folder)
+        script = scheduler.task_to_script(make_task(source))
+        subprocess.check_call(['/bin/bash', '-c', '\n'.join(script)])
+
+    elapsed = time.time() - start
+
+    written = 0
+    for n in range(n_tasks):
+        folder = os.path.join(workers, 'worker.%d' % n)
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            if not os.path.islink(path) and \
+                    os.stat(path).st_nlink == 1:
+                written += os.path.getsize(path)
+
+        shutil.rmtree(folder)
+
+    return elapsed, written
+
+
+def main(n_tasks=200, shared=None, local=None):
+    cwd = os.getcwd()
+    shared = tempfile.mkdtemp(dir=shared)
+    local = tempfile.mkdtemp(dir=local)
+
+    staging = os.path.join(shared, 'workers', 'staging_area')
+    os.makedirs(staging)
+    for name, size in INPUTS.items():
+        with open(os.path.join(staging, name), 'wb') as f:
+            f.write(os.urandom(size))
+
+    source = File('file://model.py')
+    source.set_file('import numpy\n' * 1000)
+
+    scheduler = WorkerScheduler(_Resource(shared))
+    scheduler.project = _Project()
+
+    elapsed, written = stage(scheduler, source, n_tasks)
+    print('%-12s %8.3f s  %10d bytes written to task folders' % (
+        'no cache', elapsed, written))
+
+    cache = StageCache(os.path.join(local, 'cache'))
+    scheduler.stage_cache = cache
+    elapsed, written = stage(scheduler, source, n_tasks)
+    print('%-12s %8.3f s  %10d bytes written to task folders' % (
+        'stage cache', elapsed, written))
+    print('hit rate %.3f, %d bytes not read or written, %d bytes stored' % (
+        cache.hit_rate, cache.stats['bytes_saved'],
+        cache.stats['bytes_stored']))
+
+    os.chdir(cwd)
+    shutil.rmtree(shared)
+    shutil.rmtree(local)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 200, *args[1:])
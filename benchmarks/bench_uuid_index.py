@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Compare the plain list formerly used as store index with `UUIDIndex`
+
+Measures membership tests, appending and random picks for growing index
+sizes. Does not need a database.
+
+Usage: python bench_uuid_index.py [n_operations]
+"""
+from __future__ import print_function, absolute_import
+
+import random
+import sys
+import time
+
+from adaptivemd.mongodb import StorableMixin, UUIDIndex
+
+
+def report(label, fnc, args):
+    start = time.time()
+    fnc(args)
+    elapsed = time.time() - start
+    print('  %-28s %12.3f us / op' % (label, 1e6 * elapsed / len(args)))
+
+
+def main(n_operations=1000):
+    for size in [10 ** 4, 10 ** 5, 10 ** 6]:
+        uuids = [StorableMixin.get_uuid() for _ in range(size)]
+        present = random.sample(uuids, n_operations)
+        missing = [StorableMixin.get_uuid() for _ in range(n_operations)]
+        positions = [random.randint(0, size - 1) for _ in range(n_operations)]
+
+        print('%d entries' % size)
+
+        for name, index in [('list', list(uuids)), ('UUIDIndex', UUIDIndex(uuids))]:
+            def contains(args):
+                for uuid in args:
+                    uuid in index
+
+            def append(args):
+                # the stores only append uuids that are not yet present
+                for uuid in args:
+                    if uuid not in index:
+                        index.append(uuid)
+
+            def pick(args):
+                for pos in args:
+                    index[pos]
+
+            report('%s hit' % name, contains, present)
+            report('%s miss' % name, contains, missing)
+            report('%s append' % name, append,
+                   [StorableMixin.get_uuid() for _ in range(n_operations)])
+            report('%s pick' % name, pick, positions)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Measure the task to task turnaround of a worker with no-op tasks
+
+A project is filled with tasks that only write the time they start and end
+to a file. A single slot worker with the default polling interval of 2
+seconds executes them. The turnaround is the time from the end of one task
+to the start of the next one, which includes noticing the exit, running
+the callbacks, claiming the next task and starting its script. A worker
+that sleeps between iterations has a turnaround of at least its polling
+interval.
+
+Set `ADMD_DBURL` to e.g. `sqlite:///tmp/bench-worker.db` to run it
+without a MongoDB server.
+
+Usage: python bench_worker.py [n_tasks] [sleep]
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+
+from common import setup_dburl
+
+from adaptivemd import Project, Task, Worker
+
+NAME = 'bench-worker'
+
+
+def main(n_tasks=50, sleep=2.0):
+    setup_dburl()
+    path = tempfile.mkdtemp()
+    stamps = os.path.join(path, 'stamps')
+
+    Project.delete(NAME)
+    project = Project(NAME)
+    project.initialize({'shared_path': path})
+
+    tasks = []
+    for n in range(n_tasks):
+        task = Task()
+        task.append('echo start $(date +%%s.%%N) >> %s' % stamps)
+        task.append('echo end $(date +%%s.%%N) >> %s' % stamps)
+        tasks.append(task)
+
+    project.tasks.add(tasks)
+
+    worker = Worker(sleep=sleep, heartbeat=10)
+    project.workers.add(worker)
+    worker.create(project)
+    worker.scheduler._save_log_to_db = False
+
+    start = time.time()
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+
+    while len(project.tasks.m('state', 'success')) < n_tasks:
+        time.sleep(0.1)
+
+    elapsed = time.time() - start
+    worker.execute('kill')
+    thread.join()
+
+    with open(stamps) as f:
+        events = sorted(
+            (float(value), kind) for kind, value in
+            (line.split() for line in f))
+
+    turnaround = sorted(
+        b[0] - a[0] for a, b in zip(events, events[1:])
+        if a[1] == 'end' and b[1] == 'start')
+
+    print('%d tasks in %.3f s, polling interval %.1f s' % (
+        n_tasks, elapsed, sleep))
+    print('turnaround median %.1f ms, 90%% %.1f ms, max %.1f ms' % (
+        1000 * turnaround[len(turnaround) // 2],
+        1000 * turnaround[int(len(turnaround) * 0.9)],
+        1000 * turnaround[-1]))
+
+    project.close()
+    Project.delete(NAME)
+    shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main(*[float(x) if '.' in x else int(x) for x in sys.argv[1:]])
@@ -0,0 +1,76 @@
+"""
+Helpers shared by the storage benchmarks
+
+All benchmarks need a running MongoDB instance. The location is taken from
+the `ADMD_DBURL` environment variable like for a `Project` and defaults to
+`mongodb://localhost:27017/`.
+"""
+from __future__ import print_function, absolute_import
+
+import os
+import time
+from collections import defaultdict
+
+from pymongo import monitoring
+
+from adaptivemd.mongodb import MongoDBStorage
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Count the commands sent to the MongoDB server by command name
+
+    Needs to be registered before the first `MongoClient` is created
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.counts.clear()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+counter = CommandCounter()
+monitoring.register(counter)
+
+
+def setup_dburl():
+    dburl = os.environ.get("ADMD_DBURL")
+    if dburl:
+        MongoDBStorage._db_url = dburl
+
+
+class Timer(object):
+    """
+    Context manager measuring wall time and server commands of a block
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed = None
+        self.commands = None
+
+    def __enter__(self):
+        counter.reset()
+        self._start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.time() - self._start
+        self.commands = dict(counter.counts)
+        print('%-40s %8.3f s  %6d round trips  %s' % (
+            self.name, self.elapsed, counter.total,
+            ', '.join('%s: %d' % kv for kv in sorted(self.commands.items()))))